@@ -0,0 +1,150 @@
+import argparse
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+from ozon_ai.db import Database
+
+
+_NEW_INDEXES = ("idx_reviews_status_keyset", "idx_reviews_published", "idx_reviews_account")
+
+
+def _synthetic_reviews(rows: int, new_ratio: float, accounts: int, seed: int) -> List[Dict]:
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    reviews = []
+    for index in range(rows):
+        published_at = start + timedelta(seconds=rng.randrange(0, 3 * 365 * 24 * 3600))
+        reviews.append(
+            {
+                "uuid": f"bench-{index:08d}",
+                "text": "Отличный товар, всё понравилось " * rng.randint(1, 4),
+                "rating": rng.randint(1, 5),
+                "published_at": published_at.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+                "product": {"title": f"Товар {rng.randrange(500)}", "brand_info": {"name": "Brand"}},
+                "_status": "new" if rng.random() < new_ratio else "completed",
+                "_account": rng.randrange(1, accounts + 1),
+            }
+        )
+    return reviews
+
+
+def _build(path: Path, reviews: List[Dict]) -> None:
+    db = Database(str(path))
+    try:
+        db.ensure_schema()
+        with db.transaction():
+            for status in ("new", "completed"):
+                for account_id in {review["_account"] for review in reviews}:
+                    db.upsert_reviews(
+                        [r for r in reviews if r["_status"] == status and r["_account"] == account_id],
+                        status=status,
+                        account_id=account_id,
+                    )
+    finally:
+        db.close()
+
+
+def _make_baseline(source: Path, target: Path) -> None:
+    # The baseline is the same data without the indexes and in rollback-journal mode.
+    shutil.copyfile(source, target)
+    conn = sqlite3.connect(str(target))
+    try:
+        for name in _NEW_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+class _BaselineDatabase(Database):
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+
+
+def _time_list_reviews(db: Database, repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        db.list_reviews("new")
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def _time_under_writes(db: Database, path: Path, repeat: int, db_cls: type) -> List[float]:
+    stop = threading.Event()
+
+    def writer() -> None:
+        writer_db = db_cls(str(path))
+        index = 0
+        try:
+            while not stop.is_set():
+                with writer_db.transaction():
+                    for _ in range(50):
+                        writer_db.update_review_status(f"bench-{index:08d}", "completed", "ok")
+                        index += 1
+        finally:
+            writer_db.close()
+
+    thread = threading.Thread(target=writer, daemon=True)
+    thread.start()
+    try:
+        return _time_list_reviews(db, repeat)
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _summary(timings: List[float]) -> str:
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"median {statistics.median(ordered):8.2f} ms   p95 {p95:8.2f} ms"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark Database.list_reviews('new') before and after indexing/WAL")
+    parser.add_argument("--rows", type=int, default=100_000, help="Number of reviews to generate")
+    parser.add_argument("--new-ratio", type=float, default=0.02, help="Share of reviews with status 'new'")
+    parser.add_argument("--accounts", type=int, default=5, help="Number of accounts to spread reviews over")
+    parser.add_argument("--repeat", type=int, default=20, help="Queries per measurement")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_db_") as tmp:
+        optimized = Path(tmp) / "optimized.db"
+        baseline = Path(tmp) / "baseline.db"
+        started = time.perf_counter()
+        _build(optimized, _synthetic_reviews(args.rows, args.new_ratio, args.accounts, args.seed))
+        print(f"Built {args.rows} reviews in {time.perf_counter() - started:.1f} s")
+        _make_baseline(optimized, baseline)
+
+        for label, path, db_cls in (
+            ("before", baseline, _BaselineDatabase),
+            ("after", optimized, Database),
+        ):
+            db = db_cls(str(path))
+            try:
+                new_count = len(db.list_reviews("new"))
+                idle = _time_list_reviews(db, args.repeat)
+                busy = _time_under_writes(db, path, args.repeat, db_cls)
+            finally:
+                db.close()
+            print(f"{label:<6} list_reviews('new') -> {new_count} rows")
+            print(f"       idle:          {_summary(idle)}")
+            print(f"       during writes: {_summary(busy)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import argparse
+import copy
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from urllib.request import urlopen
+
+from benchmarks.mock_openai_server import MockOpenAIServer, add_mock_arguments, mock_config_from_args
+from ozon_ai.data.sample_reviews import SAMPLE_REVIEWS
+
+
+_TEXTS = (
+    "",
+    "Отлично",
+    "Всё пришло целым, спасибо",
+    "Качество хорошее, доставка быстрая, буду заказывать ещё",
+    "Упаковка помята, но сам товар в порядке",
+    "Не соответствует описанию, размер меньше заявленного",
+)
+
+
+def _reviews(count: int, seed: int) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    reviews = []
+    for index in range(count):
+        review = copy.deepcopy(SAMPLE_REVIEWS[index % len(SAMPLE_REVIEWS)])
+        review["uuid"] = f"bench-{index:06d}"
+        review["text"] = rng.choice(_TEXTS)
+        review["rating"] = rng.choice((5, 5, 5, 4, 4, 3, 2, 1))
+        reviews.append(review)
+    return reviews
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def _percentile(ordered: List[float], share: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))] if ordered else 0.0
+
+
+def _server_stats(base_url: str, server: Optional[MockOpenAIServer]) -> Counter:
+    if server is not None:
+        return Counter(server.stats())
+    with urlopen(f"{base_url.rsplit('/v1', 1)[0]}/stats", timeout=10) as response:
+        return Counter(json.loads(response.read().decode("utf-8")))
+
+
+def _run(
+    reviews: List[Dict[str, Any]],
+    *,
+    api_key: str,
+    concurrency: int,
+    rpm: int,
+    tpm: int,
+    use_cache: bool,
+) -> Dict[str, Any]:
+    from ozon_ai.ai import generate_ai_response
+    from ozon_ai.openai_client import OpenAIError, set_openai_concurrency
+    from ozon_ai.reply_cache import ReplyCache
+    from ozon_ai.similarity import SimilarityIndex
+
+    # Same wiring as ReviewPipeline._generate: cache first, then the model,
+    # with every accepted reply added to the similarity index and the cache.
+    set_openai_concurrency(concurrency)
+    similarity = SimilarityIndex()
+    cache = ReplyCache() if use_cache else None
+    outcomes: Counter = Counter()
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def generate(review: Dict[str, Any]) -> None:
+        started = time.perf_counter()
+        outcome = "generated"
+        if cache is not None and cache.take(review) is not None:
+            outcome = "cached"
+        else:
+            try:
+                text = generate_ai_response(review, api_key=api_key, similarity=similarity, rpm=rpm, tpm=tpm, timeout=60)
+            except OpenAIError:
+                text, outcome = "", "errors"
+            if text:
+                similarity.add(text)
+                if cache is not None:
+                    cache.offer(review, text)
+            elif outcome != "errors":
+                outcome = "empty"
+        with lock:
+            outcomes[outcome] += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench-generate") as executor:
+        list(executor.map(generate, reviews))
+    elapsed = time.perf_counter() - started
+    ordered = sorted(latencies)
+    return {
+        "elapsed": elapsed,
+        "outcomes": outcomes,
+        "per_minute": (outcomes["generated"] + outcomes["cached"]) * 60 / elapsed if elapsed > 0 else 0.0,
+        "p50": _percentile(ordered, 0.50),
+        "p99": _percentile(ordered, 0.99),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure generations per minute through generate_ai_response")
+    parser.add_argument("--reviews", type=int, default=200, help="Reviews to generate replies for in each run")
+    parser.add_argument("--concurrency", default="1,4,8", help="Comma-separated worker counts to try")
+    parser.add_argument("--rpm", default="500", help="Comma-separated client-side requests/minute limits to try")
+    parser.add_argument("--tpm", type=int, default=200_000, help="Client-side tokens/minute limit")
+    parser.add_argument("--reply-cache", action="store_true", help="Serve trivial reviews from a ReplyCache first")
+    parser.add_argument("--url", help="Use an already running mock server (…/v1) instead of starting one")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    server: Optional[MockOpenAIServer] = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        server = MockOpenAIServer(mock_config_from_args(args)).start()
+        base_url = server.base_url
+    # Must be set before ozon_ai.ai is imported, which reads it once.
+    os.environ["OPENAI_BASE_URL"] = base_url
+
+    reviews = _reviews(max(1, args.reviews), args.seed)
+    print(f"Mock OpenAI API at {base_url}: {len(reviews)} reviews per run, reply cache {'on' if args.reply_cache else 'off'}")
+    print(
+        f"{'workers':>7} {'rpm':>6} {'gen/min':>8} {'generated':>9} {'cached':>6} {'empty':>5} {'errors':>6} "
+        f"{'requests':>8} {'429':>5} {'dupes':>5} {'p50 ms':>8} {'p99 ms':>8}"
+    )
+    try:
+        run = 0
+        for rpm in _int_list(args.rpm):
+            for concurrency in _int_list(args.concurrency):
+                if server is not None:
+                    server.reset()
+                before = _server_stats(base_url, server)
+                run += 1
+                # A fresh key per run gets a fresh client-side limiter.
+                result = _run(
+                    reviews,
+                    api_key=f"bench-key-{run}",
+                    concurrency=max(1, concurrency),
+                    rpm=max(1, rpm),
+                    tpm=max(1, args.tpm),
+                    use_cache=args.reply_cache,
+                )
+                stats = _server_stats(base_url, server)
+                stats.subtract(before)
+                outcomes = result["outcomes"]
+                print(
+                    f"{concurrency:>7} {rpm:>6} {result['per_minute']:>8.1f} {outcomes['generated']:>9} "
+                    f"{outcomes['cached']:>6} {outcomes['empty']:>5} {outcomes['errors']:>6} {stats['requests']:>8} "
+                    f"{stats['rate_limited'] + stats['rate_limited_burst']:>5} {stats['near_duplicates']:>5} "
+                    f"{result['p50']:>8.0f} {result['p99']:>8.0f}"
+                )
+    finally:
+        if server is not None:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from urllib.request import urlopen
+
+from benchmarks.mock_ozon_server import MockOzonServer, add_mock_arguments, mock_config_from_args
+
+
+class _Latencies:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._samples: Dict[str, List[float]] = {}
+
+    def record(self, key: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(key, []).append(seconds * 1000)
+
+    def summary(self, key: str) -> str:
+        with self._lock:
+            ordered = sorted(self._samples.get(key, []))
+        if not ordered:
+            return "no requests"
+
+        def percentile(share: float) -> float:
+            return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+        return f"p50 {percentile(0.50):7.1f} ms   p99 {percentile(0.99):7.1f} ms   ({len(ordered)} requests)"
+
+
+def _write_sessions(directory: Path, accounts: int, host: str) -> List[Path]:
+    # Minimal Playwright storage states: a company id cookie and a token that
+    # has not expired, which is all session_cache needs to call them active.
+    expires = time.time() + 24 * 3600
+    paths = []
+    for index in range(accounts):
+        cookies = [
+            {"name": "sc_company_id", "value": str(900000 + index), "domain": host, "path": "/", "expires": expires},
+            {"name": "__Secure-access-token", "value": f"bench-{index}", "domain": host, "path": "/", "expires": expires},
+        ]
+        path = directory / f"bench_account_{index}.json"
+        path.write_text(json.dumps({"cookies": cookies, "origins": []}), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def _instrument(latencies: _Latencies) -> None:
+    # Times every request the Ozon client makes, keyed by endpoint path.
+    from ozon_ai.ozon_client import OzonApiClient
+
+    original = OzonApiClient.post
+
+    def timed_post(self, url, payload, **kwargs):
+        started = time.perf_counter()
+        try:
+            return original(self, url, payload, **kwargs)
+        finally:
+            latencies.record(urlparse(url).path, time.perf_counter() - started)
+
+    OzonApiClient.post = timed_post
+
+
+def _fetch_all(sessions: List[Path], timeout: int) -> Tuple[Dict[Path, List[Dict]], int, int, float]:
+    from ozon_ai.ozon_reviews import fetch_new_reviews
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(sessions), thread_name_prefix="bench-fetch") as executor:
+        fetches = dict(zip(sessions, executor.map(lambda path: fetch_new_reviews(path, timeout=timeout), sessions)))
+    elapsed = time.perf_counter() - started
+    pages = sum(fetch.pages for fetch in fetches.values())
+    incomplete = sum(1 for fetch in fetches.values() if not fetch.complete)
+    return {path: fetch.reviews for path, fetch in fetches.items()}, pages, incomplete, elapsed
+
+
+def _send_all(reviews: Dict[Path, List[Dict]], interval: float, timeout: int) -> Tuple[int, int, float]:
+    from ozon_ai.ozon_comments import submit_review_comment
+
+    started = time.perf_counter()
+    futures: List[Future] = [
+        submit_review_comment(path, review["uuid"], "Спасибо за отзыв!", timeout=timeout, interval=interval)
+        for path, items in reviews.items()
+        for review in items
+    ]
+    sent = failed = 0
+    for future in futures:
+        try:
+            ok = future.result()
+        except Exception:
+            ok = False
+        if ok:
+            sent += 1
+        else:
+            failed += 1
+    return sent, failed, time.perf_counter() - started
+
+
+def _server_stats(base_url: str, server: Optional[MockOzonServer]) -> Dict[str, int]:
+    if server is not None:
+        return server.stats()
+    with urlopen(f"{base_url}/stats", timeout=10) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+def _rate(count: int, seconds: float) -> float:
+    return count / seconds if seconds > 0 else 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fetch and answer reviews for N accounts against the mock Ozon API")
+    parser.add_argument("--accounts", type=int, default=4, help="Number of seller accounts")
+    parser.add_argument("--send-interval", type=float, default=0.0, help="Per-account pause between sends, seconds")
+    parser.add_argument("--timeout", type=int, default=20, help="Request timeout, seconds")
+    parser.add_argument("--url", help="Use an already running mock server instead of starting one")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+    accounts = max(1, args.accounts)
+
+    server: Optional[MockOzonServer] = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        server = MockOzonServer(mock_config_from_args(args)).start()
+        base_url = server.base_url
+    # Must be set before ozon_ai.ozon_reviews is imported, which reads it once.
+    os.environ["OZON_SELLER_BASE_URL"] = base_url
+
+    from ozon_ai.ozon_client import close_all_clients
+
+    latencies = _Latencies()
+    _instrument(latencies)
+    print(f"Mock Ozon API at {base_url}: {accounts} accounts")
+    try:
+        with tempfile.TemporaryDirectory(prefix="bench_ozon_") as tmp:
+            sessions = _write_sessions(Path(tmp), accounts, urlparse(base_url).hostname or "127.0.0.1")
+
+            reviews, pages, incomplete, fetch_time = _fetch_all(sessions, args.timeout)
+            fetched = sum(len(items) for items in reviews.values())
+            print(
+                f"fetch  {fetched} reviews, {pages} pages in {fetch_time:.2f} s "
+                f"({_rate(fetched, fetch_time):.1f} reviews/s), {incomplete} incomplete"
+            )
+            print(f"       {latencies.summary('/api/v4/review/list')}")
+
+            sent, failed, send_time = _send_all(reviews, args.send_interval, args.timeout)
+            print(f"send   {sent} sent, {failed} failed in {send_time:.2f} s ({_rate(sent, send_time):.1f} replies/s)")
+            print(f"       {latencies.summary('/api/review/comment/create')}")
+
+            remaining, _, _, _ = _fetch_all(sessions, args.timeout)
+            print(f"left   {sum(len(items) for items in remaining.values())} unanswered reviews after sending")
+            close_all_clients()
+        stats = _server_stats(base_url, server)
+        print("server " + ", ".join(f"{key}={value}" for key, value in sorted(stats.items())))
+    finally:
+        if server is not None:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import argparse
+import random
+import time
+from typing import Callable, Dict, List, Tuple
+
+from ozon_ai.similarity import DEFAULT_THRESHOLD, SimilarityIndex, jaccard, normalize_text, shingles
+
+
+# Replies drawn from a large vocabulary rarely share more than an opener and a closer.
+_DIVERSE_WORDS = (
+    "упаковка", "доставка", "курьер", "коробка", "цвет", "размер", "запах", "вкус", "качество", "цена",
+    "инструкция", "комплектация", "материал", "прочность", "вес", "форма", "крышка", "дозатор", "этикетка",
+    "аромат", "текстура", "консистенция", "объём", "фасовка", "пломба", "пакет", "подарок", "скидка", "сроки",
+    "склад", "маркировка", "состав", "сертификат", "гарантия", "ремешок", "застёжка", "шов", "ткань",
+    "батарейка", "зарядка", "кабель", "насадка", "чехол", "крепление", "ножка", "ручка", "колпачок", "флакон",
+    "банка", "тюбик", "вкладыш", "открытка", "наклейка", "бирка", "фурнитура", "подкладка", "молния", "пуговица",
+)
+_DIVERSE_OPENERS = ("Спасибо за отзыв!", "Благодарим за оценку.", "Рады, что заказ понравился.", "Простите за это.")
+_DIVERSE_CLOSERS = ("Ждём вас снова.", "Хорошего дня!", "Поможем с возвратом через маркетплейс.")
+
+# What seller replies actually look like: a handful of stock phrases with a
+# product name and a few words swapped in.
+_TEMPLATE_OPENERS = (
+    "Спасибо за отзыв!",
+    "Спасибо за ваш отзыв!",
+    "Благодарим за отзыв!",
+    "Спасибо за высокую оценку!",
+    "Благодарим за оценку!",
+)
+_TEMPLATE_PRODUCTS = (
+    "кружка", "футболка", "чехол", "крем", "шампунь", "игрушка", "сумка", "рюкзак", "лампа", "коврик",
+    "термос", "зонт", "шарф", "носки", "перчатки",
+)
+_TEMPLATE_WORDS = (
+    "качество", "доставка", "упаковка", "цвет", "размер", "цена", "материал", "удобство", "дизайн", "аромат",
+    "быстро", "аккуратно", "приятно", "отлично", "хорошо", "надёжно", "красиво", "удобно", "мягко", "прочно",
+)
+_TEMPLATE_CLOSERS = (
+    "Ждём вас снова!",
+    "Будем рады видеть вас снова!",
+    "Хорошего дня!",
+    "Приятных покупок!",
+    "Заходите ещё!",
+)
+
+
+def _diverse(rng: random.Random) -> str:
+    details = ", ".join(rng.sample(_DIVERSE_WORDS, 10))
+    return f"{rng.choice(_DIVERSE_OPENERS)} Проверили: {details}. {rng.choice(_DIVERSE_CLOSERS)}"
+
+
+def _template(rng: random.Random) -> str:
+    words = " ".join(rng.sample(_TEMPLATE_WORDS, 4))
+    return (
+        f"{rng.choice(_TEMPLATE_OPENERS)} Рады, что {rng.choice(_TEMPLATE_PRODUCTS)} вам понравилась: "
+        f"{words}. {rng.choice(_TEMPLATE_CLOSERS)}"
+    )
+
+
+def _apology(rng: random.Random) -> str:
+    # Same stock opener and closer as the template replies around a body none
+    # of them has: nearly every band collides, yet nothing should match.
+    reasons = ", ".join(rng.sample(_DIVERSE_WORDS, 6))
+    return (
+        f"{rng.choice(_TEMPLATE_OPENERS)} Нам очень жаль, что возникли проблемы: {reasons}. "
+        f"Напишите в чат продавца, разберёмся. {rng.choice(_TEMPLATE_CLOSERS)}"
+    )
+
+
+_CORPORA: Dict[str, Callable[[random.Random], str]] = {"diverse": _diverse, "template": _template}
+
+
+def _near_duplicate(rng: random.Random, text: str) -> str:
+    # The kind of rewrite the model produces when it repeats itself.
+    words = text.split()
+    index = rng.randrange(len(words))
+    words[index] = words[index].rstrip(".,!:") + rng.choice(("", "!", ","))
+    return " ".join(words)
+
+
+def _percentile(ordered: List[float], share: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def _time_checks(index: SimilarityIndex, probes: List[str]) -> Tuple[List[float], List[bool]]:
+    timings = []
+    results = []
+    for probe in probes:
+        started = time.perf_counter()
+        results.append(index.is_similar(probe))
+        timings.append((time.perf_counter() - started) * 1000)
+    return sorted(timings), results
+
+
+def _exact(stored: List[frozenset], probe: str, threshold: float) -> bool:
+    probe_set = shingles(normalize_text(probe))
+    return any(jaccard(probe_set, item) >= threshold for item in stored)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time SimilarityIndex.is_similar against a full history")
+    parser.add_argument("--replies", type=int, default=10_000, help="Replies stored in the index")
+    parser.add_argument("--probes", type=int, default=200, help="Checks per probe kind")
+    parser.add_argument("--corpus", choices=tuple(_CORPORA) + ("all",), default="all")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-recall", action="store_true", help="Skip the brute-force recall check")
+    args = parser.parse_args()
+
+    corpora = list(_CORPORA) if args.corpus == "all" else [args.corpus]
+    for name in corpora:
+        make = _CORPORA[name]
+        rng = random.Random(args.seed)
+        history = [make(rng) for _ in range(args.replies)]
+        index = SimilarityIndex(capacity=args.replies)
+        started = time.perf_counter()
+        for text in history:
+            index.add(text)
+        print(f"{name}: {len(index)} replies indexed in {time.perf_counter() - started:.1f} s")
+
+        probes = {
+            "near-duplicate": [_near_duplicate(rng, rng.choice(history)) for _ in range(args.probes)],
+            "novel": [make(rng) for _ in range(args.probes)],
+            "stock phrases": [_apology(rng) for _ in range(args.probes)],
+        }
+        stored = [] if args.no_recall else [shingles(normalize_text(text)) for text in history]
+        for kind, items in probes.items():
+            timings, results = _time_checks(index, items)
+            line = (
+                f"  {kind:<15} mean {sum(timings) / len(timings):6.3f} ms   p50 {_percentile(timings, 0.5):6.3f} ms"
+                f"   p99 {_percentile(timings, 0.99):6.3f} ms   flagged {sum(results)}/{len(results)}"
+            )
+            if stored:
+                expected = [_exact(stored, probe, DEFAULT_THRESHOLD) for probe in items]
+                missed = sum(1 for want, got in zip(expected, results) if want and not got)
+                line += f"   missed {missed}/{sum(expected)}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, Optional, Tuple
+
+
+RESPONSES_PATHS = ("/v1/responses", "/responses")
+STATS_PATH = "/stats"
+_RATING_RE = re.compile(r"Rating: (\d)/5")
+_OPENERS = {
+    "positive": ("Спасибо, что нашли время написать!", "Очень приятно читать такой отзыв.", "Рады, что покупка понравилась."),
+    "neutral": ("Благодарим за честную оценку.", "Спасибо за подробный отзыв.", "Ценим, что поделились мнением."),
+    "negative": ("Простите, что так вышло.", "Очень жаль, что товар расстроил.", "Извините за неприятный опыт."),
+}
+_CLOSERS = {
+    "positive": ("Заглядывайте к нам ещё 🙂", "Будем рады видеть вас снова.", "Хорошего дня!"),
+    "neutral": ("Надеемся, следующий заказ порадует больше.", "Будем рады, если дадите нам ещё шанс."),
+    "negative": ("Оформите возврат через маркетплейс, поможем.", "Напишите в поддержку Ozon, там быстро помогут."),
+}
+# Details are drawn from a large vocabulary, so two fresh replies rarely
+# share more than their opener and closer and stay under the similarity threshold.
+_DETAILS = (
+    "упаковка", "доставка", "курьер", "коробка", "цвет", "размер", "запах", "вкус", "качество", "цена",
+    "инструкция", "комплектация", "материал", "прочность", "вес", "форма", "крышка", "дозатор", "этикетка",
+    "срок годности", "аромат", "текстура", "консистенция", "объём", "фасовка", "пломба", "пакет", "подарок",
+    "скидка", "сроки", "склад", "пункт выдачи", "маркировка", "состав", "сертификат", "гарантия", "ремешок",
+    "застёжка", "шов", "ткань", "батарейка", "зарядка", "кабель", "насадка", "чехол", "пленка", "крепление",
+    "ножка", "ручка", "колпачок", "флакон", "банка", "тюбик", "вкладыш", "открытка", "наклейка", "бирка",
+)
+
+
+@dataclass(frozen=True)
+class MockConfig:
+    latency_ms: float = 400.0
+    jitter_ms: float = 150.0
+    rpm: int = 500
+    tpm: int = 200_000
+    burst_every: int = 0
+    burst_length: int = 0
+    burst_retry_ms: int = 1000
+    duplicate_rate: float = 0.0
+    seed: int = 1
+
+
+def _format_reset(seconds: float) -> str:
+    # Go-style durations, as in OpenAI's x-ratelimit-reset-* headers.
+    if seconds < 1:
+        return f"{max(0, int(seconds * 1000))}ms"
+    minutes, rest = divmod(seconds, 60)
+    return f"{int(minutes)}m{rest:.3f}s" if minutes else f"{rest:.3f}s"
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class _Bucket:
+    def __init__(self, per_minute: int) -> None:
+        self.capacity = float(max(1, per_minute))
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def reset_seconds(self) -> float:
+        return (self.capacity - self.level) * 60 / self.capacity
+
+
+class MockOpenAIServer:
+    # A stand-in for POST /v1/responses. Replies are assembled from canned
+    # phrases for the review's rating, in an order fixed by the seed; some of
+    # them can be served again with only punctuation changed, which the
+    # similarity check should reject. Request and token limits are enforced
+    # and reported through the same x-ratelimit-* headers OpenAI sends.
+    def __init__(self, config: MockConfig, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.config = config
+        self._lock = threading.Lock()
+        self._rng = random.Random(config.seed)
+        self._requests = _Bucket(config.rpm)
+        self._token_bucket = _Bucket(config.tpm)
+        self._served = 0
+        self._burst_left = 0
+        self._history: Dict[str, Deque[str]] = {}
+        self._stats: Counter = Counter()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockOpenAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def reset(self) -> None:
+        # Full buckets and empty counters, for back-to-back benchmark runs.
+        with self._lock:
+            self._rng = random.Random(self.config.seed)
+            self._requests = _Bucket(self.config.rpm)
+            self._token_bucket = _Bucket(self.config.tpm)
+            self._served = 0
+            self._burst_left = 0
+            self._history.clear()
+            self._stats.clear()
+
+    def _rate_headers(self) -> Dict[str, str]:
+        return {
+            "x-ratelimit-limit-requests": str(int(self._requests.capacity)),
+            "x-ratelimit-limit-tokens": str(int(self._token_bucket.capacity)),
+            "x-ratelimit-remaining-requests": str(max(0, int(self._requests.level))),
+            "x-ratelimit-remaining-tokens": str(max(0, int(self._token_bucket.level))),
+            "x-ratelimit-reset-requests": _format_reset(self._requests.reset_seconds()),
+            "x-ratelimit-reset-tokens": _format_reset(self._token_bucket.reset_seconds()),
+        }
+
+    def _admit(self, tokens: int) -> Tuple[Optional[float], Dict[str, str]]:
+        # Returns (retry after seconds, headers); None means the request may go ahead.
+        with self._lock:
+            self._stats["requests"] += 1
+            self._requests.refill()
+            self._token_bucket.refill()
+            if self._burst_left > 0:
+                self._burst_left -= 1
+                self._stats["rate_limited_burst"] += 1
+                return self.config.burst_retry_ms / 1000, self._rate_headers()
+            if self._requests.level < 1 or self._token_bucket.level < tokens:
+                self._stats["rate_limited"] += 1
+                wait = max(
+                    (1 - self._requests.level) * 60 / self._requests.capacity,
+                    (tokens - self._token_bucket.level) * 60 / self._token_bucket.capacity,
+                )
+                return max(0.001, wait), self._rate_headers()
+            self._requests.level -= 1
+            self._token_bucket.level -= tokens
+            self._served += 1
+            if self.config.burst_every and self._served % self.config.burst_every == 0:
+                self._burst_left = self.config.burst_length
+            return None, self._rate_headers()
+
+    def _reply_text(self, prompt: str) -> str:
+        match = _RATING_RE.search(prompt)
+        rating = int(match.group(1)) if match else 5
+        group = "positive" if rating >= 4 else "neutral" if rating == 3 else "negative"
+        with self._lock:
+            history = self._history.setdefault(group, deque(maxlen=20))
+            if history and self._rng.random() < self.config.duplicate_rate:
+                self._stats["near_duplicates"] += 1
+                previous = self._rng.choice(list(history))
+                return previous.rstrip(".!🙂 ") + "!"
+            details = ", ".join(self._rng.sample(_DETAILS, 10))
+            text = f"{self._rng.choice(_OPENERS[group])} Проверили: {details}. {self._rng.choice(_CLOSERS[group])}"
+            history.append(text)
+            return text
+
+    def _respond(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        prompt = str(body.get("input") or "")
+        text = self._reply_text(prompt)
+        input_tokens = _tokens(str(body.get("instructions") or "") + prompt)
+        output_tokens = _tokens(text)
+        with self._lock:
+            self._stats["completed"] += 1
+            response_id = f"resp_mock_{self._stats['completed']:08d}"
+        return {
+            "id": response_id,
+            "object": "response",
+            "status": "completed",
+            "model": body.get("model") or "mock",
+            "output": [
+                {
+                    "type": "message",
+                    "role": "assistant",
+                    "content": [{"type": "output_text", "text": text, "annotations": []}],
+                }
+            ],
+            "usage": {
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        }
+
+    def _delay(self) -> None:
+        with self._lock:
+            delay = self._rng.uniform(
+                self.config.latency_ms - self.config.jitter_ms,
+                self.config.latency_ms + self.config.jitter_ms,
+            )
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def _handler_class(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args: Any) -> None:
+                return
+
+            def _reply(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self) -> None:
+                if self.path == STATS_PATH:
+                    self._reply(200, server.stats())
+                else:
+                    self._reply(404, {"error": {"message": "not found"}})
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                if self.path not in RESPONSES_PATHS:
+                    self._reply(404, {"error": {"message": "not found"}})
+                    return
+                if not (self.headers.get("Authorization") or "").startswith("Bearer "):
+                    self._reply(401, {"error": {"message": "missing API key", "type": "invalid_request_error"}})
+                    return
+                try:
+                    body = json.loads(raw or b"{}")
+                except ValueError:
+                    self._reply(400, {"error": {"message": "invalid json", "type": "invalid_request_error"}})
+                    return
+                estimated = _tokens(str(body.get("instructions") or "") + str(body.get("input") or ""))
+                estimated += int(body.get("max_output_tokens") or 0)
+                retry_after, headers = server._admit(estimated)
+                if retry_after is not None:
+                    headers["retry-after-ms"] = str(int(retry_after * 1000))
+                    error = {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}
+                    self._reply(429, {"error": error}, headers)
+                    return
+                server._delay()
+                self._reply(200, server._respond(body), headers)
+
+        return Handler
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = MockConfig()
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms, help="Mean response latency")
+    parser.add_argument("--jitter-ms", type=float, default=defaults.jitter_ms, help="Latency jitter (+/-)")
+    parser.add_argument("--server-rpm", type=int, default=defaults.rpm, help="Requests per minute the mock allows")
+    parser.add_argument("--server-tpm", type=int, default=defaults.tpm, help="Tokens per minute the mock allows")
+    parser.add_argument("--burst-every", type=int, default=0, help="Start a 429 burst after every N replies (0 = off)")
+    parser.add_argument("--burst-length", type=int, default=5, help="Requests rejected in each burst")
+    parser.add_argument("--burst-retry-ms", type=int, default=defaults.burst_retry_ms, help="retry-after-ms in a burst")
+    parser.add_argument("--duplicate-rate", type=float, default=0.0, help="Share of near-duplicate replies")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+
+def mock_config_from_args(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(
+        latency_ms=max(0.0, args.latency_ms),
+        jitter_ms=max(0.0, args.jitter_ms),
+        rpm=max(1, args.server_rpm),
+        tpm=max(1, args.server_tpm),
+        burst_every=max(0, args.burst_every),
+        burst_length=max(0, args.burst_length),
+        burst_retry_ms=max(0, args.burst_retry_ms),
+        duplicate_rate=min(1.0, max(0.0, args.duplicate_rate)),
+        seed=args.seed,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local stub of the OpenAI /v1/responses endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(mock_config_from_args(args), host=args.host, port=args.port)
+    print(f"Mock OpenAI API on {server.base_url} (set OPENAI_BASE_URL to use it)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+import argparse
+import copy
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from ozon_ai.data.sample_reviews import SAMPLE_REVIEWS
+
+
+REVIEW_LIST_PATH = "/api/v4/review/list"
+COMMENT_CREATE_PATH = "/api/review/comment/create"
+STATS_PATH = "/stats"
+PAYLOAD_SHAPES = ("list", "nested", "flat")
+_LOGIN_PAGE = "<!DOCTYPE html><html><head><title>Ozon Seller</title></head><body>Войдите в аккаунт</body></html>"
+_TEXTS = (
+    "",
+    "Отлично",
+    "Всё пришло целым, спасибо",
+    "Качество хорошее, доставка быстрая, буду заказывать ещё",
+    "Упаковка помята, но сам товар в порядке",
+    "Не соответствует описанию, размер меньше заявленного",
+)
+
+
+@dataclass(frozen=True)
+class MockConfig:
+    reviews_per_account: int = 500
+    page_size: int = 50
+    latency_ms: float = 50.0
+    jitter_ms: float = 20.0
+    auth_failure_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    account_rps: float = 0.0
+    payload_shape: str = "list"
+    seed: int = 1
+
+
+class _Company:
+    def __init__(self, company_id: str, config: MockConfig) -> None:
+        rng = random.Random(f"{config.seed}:{company_id}")
+        started = datetime.now(timezone.utc)
+        self.lock = threading.Lock()
+        self.reviews: List[Dict[str, Any]] = []
+        for index in range(config.reviews_per_account):
+            review = copy.deepcopy(SAMPLE_REVIEWS[index % len(SAMPLE_REVIEWS)])
+            review["uuid"] = str(uuid.UUID(int=rng.getrandbits(128)))
+            review["text"] = rng.choice(_TEXTS)
+            review["rating"] = rng.choice((5, 5, 5, 4, 4, 3, 2, 1))
+            review["published_at"] = (started - timedelta(seconds=index * 37)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+            review["interaction_status"] = "NOT_VIEWED"
+            self.reviews.append(review)
+        self.by_uuid = {review["uuid"]: review for review in self.reviews}
+        self.requests: Deque[float] = deque()
+
+
+def _keyset(review: Dict[str, Any]) -> Tuple[str, str]:
+    return review.get("published_at") or "", review.get("uuid") or ""
+
+
+class MockOzonServer:
+    # A stand-in for the two seller.ozon.ru endpoints the app calls. Each
+    # company id gets its own generated reviews on first use; answering a
+    # review takes it out of the NOT_VIEWED list, as on the real site.
+    def __init__(self, config: MockConfig, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.config = config
+        self._companies: Dict[str, _Company] = {}
+        self._companies_lock = threading.Lock()
+        self._stats: Counter = Counter()
+        self._stats_lock = threading.Lock()
+        self._rng = random.Random(config.seed)
+        self._rng_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockOzonServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-ozon", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def _chance(self, rate: float) -> bool:
+        if rate <= 0:
+            return False
+        with self._rng_lock:
+            return self._rng.random() < rate
+
+    def _delay(self) -> None:
+        with self._rng_lock:
+            delay = self._rng.uniform(
+                self.config.latency_ms - self.config.jitter_ms,
+                self.config.latency_ms + self.config.jitter_ms,
+            )
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def _company(self, company_id: str) -> _Company:
+        with self._companies_lock:
+            company = self._companies.get(company_id)
+            if company is None:
+                company = _Company(company_id, self.config)
+                self._companies[company_id] = company
+            return company
+
+    def _over_rate(self, company: _Company) -> bool:
+        if self.config.account_rps <= 0:
+            return False
+        now = time.monotonic()
+        with company.lock:
+            while company.requests and now - company.requests[0] >= 1.0:
+                company.requests.popleft()
+            if len(company.requests) >= self.config.account_rps:
+                return True
+            company.requests.append(now)
+            return False
+
+    def _list_page(self, company: _Company, body: Dict[str, Any]) -> Dict[str, Any]:
+        filter_payload = body.get("filter") or {}
+        since = (filter_payload.get("published_at") or {}).get("from")
+        statuses = filter_payload.get("interaction_status") or []
+        last_review = body.get("last_review") or None
+        with company.lock:
+            matching = [
+                review
+                for review in company.reviews
+                if (not statuses or review["interaction_status"] in statuses)
+                and (not since or review["published_at"] >= since)
+                and (not last_review or _keyset(review) < _keyset(last_review))
+            ]
+            page = copy.deepcopy(matching[:self.config.page_size])
+        has_next = len(matching) > len(page)
+        cursor = {"uuid": page[-1]["uuid"], "published_at": page[-1]["published_at"]} if page else None
+        # The three response layouts ozon_reviews._extract_reviews_payload understands.
+        if self.config.payload_shape == "nested":
+            return {"result": {"reviews": page, "hasNext": has_next, "last_review": cursor}}
+        if self.config.payload_shape == "flat":
+            return {"reviews": page, "has_next": has_next, "last_review": cursor}
+        return {"result": page, "hasNext": has_next, "last_review": cursor}
+
+    def _comment(self, company: _Company, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        if not body.get("text"):
+            return 400, {"code": 3, "message": "text is required"}
+        with company.lock:
+            review = company.by_uuid.get(body.get("review_uuid") or "")
+            if review is None:
+                return 404, {"code": 5, "message": "review not found"}
+            if review["interaction_status"] == "PROCESSED":
+                return 200, {"error": {"code": 9, "message": "review already has a comment"}}
+            review["interaction_status"] = "PROCESSED"
+            review["comments_count"] = int(review.get("comments_count") or 0) + 1
+        return 200, {}
+
+    def _handler_class(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args: Any) -> None:
+                return
+
+            def _reply(self, status: int, payload: Any, content_type: str = "application/json") -> None:
+                data = payload.encode("utf-8") if isinstance(payload, str) else json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                if status == 429:
+                    self.send_header("Retry-After", "1")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self) -> None:
+                if self.path == STATS_PATH:
+                    self._reply(200, server.stats())
+                else:
+                    self._reply(404, {"message": "not found"})
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                if self.path not in (REVIEW_LIST_PATH, COMMENT_CREATE_PATH):
+                    self._reply(404, {"message": "not found"})
+                    return
+                endpoint = "list" if self.path == REVIEW_LIST_PATH else "comment"
+                server._count(f"{endpoint}.requests")
+                server._delay()
+                company_id = self.headers.get("x-o3-company-id")
+                if not company_id or server._chance(server.config.auth_failure_rate):
+                    # Expired sessions show up either as a 401 or as the login page.
+                    server._count(f"{endpoint}.auth_failures")
+                    if company_id and server._chance(0.5):
+                        self._reply(200, _LOGIN_PAGE, "text/html")
+                    else:
+                        self._reply(401, {"code": 16, "message": "unauthenticated"})
+                    return
+                company = server._company(company_id)
+                if server._over_rate(company) or server._chance(server.config.rate_limit_rate):
+                    server._count(f"{endpoint}.rate_limited")
+                    self._reply(429, {"code": 8, "message": "Too many requests"})
+                    return
+                try:
+                    body = json.loads(raw or b"{}")
+                except ValueError:
+                    self._reply(400, {"code": 3, "message": "invalid json"})
+                    return
+                if endpoint == "list":
+                    payload = server._list_page(company, body)
+                    server._count("list.pages")
+                    self._reply(200, payload)
+                    return
+                status, payload = server._comment(company, body)
+                server._count("comment.accepted" if status == 200 and not payload else "comment.rejected")
+                self._reply(status, payload)
+
+        return Handler
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = MockConfig()
+    parser.add_argument("--reviews", type=int, default=defaults.reviews_per_account, help="Reviews per account")
+    parser.add_argument("--page-size", type=int, default=defaults.page_size, help="Reviews per list page")
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms, help="Mean added latency")
+    parser.add_argument("--jitter-ms", type=float, default=defaults.jitter_ms, help="Latency jitter (+/-)")
+    parser.add_argument("--auth-failure-rate", type=float, default=0.0, help="Share of requests failing auth")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--account-rps", type=float, default=0.0, help="Per-account requests/s before 429 (0 = off)")
+    parser.add_argument("--payload-shape", choices=PAYLOAD_SHAPES, default=defaults.payload_shape)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+
+def mock_config_from_args(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(
+        reviews_per_account=max(0, args.reviews),
+        page_size=max(1, args.page_size),
+        latency_ms=max(0.0, args.latency_ms),
+        jitter_ms=max(0.0, args.jitter_ms),
+        auth_failure_rate=args.auth_failure_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        account_rps=args.account_rps,
+        payload_shape=args.payload_shape,
+        seed=args.seed,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local stub of the seller.ozon.ru review endpoints")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockOzonServer(mock_config_from_args(args), host=args.host, port=args.port)
+    print(f"Mock Ozon seller API on {server.base_url} (set OZON_SELLER_BASE_URL to use it)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -6,12 +6,7 @@ from pathlib import Path
 from uuid import uuid4
 
 from ozon_ai.db import Database
-from ozon_ai.ozon_reviews import (
-    _clear_session_needs_relogin,
-    _extract_company_id,
-    _load_storage_state,
-    _session_needs_relogin,
-)
+from ozon_ai.session_cache import _clear_session_needs_relogin, get_session_info
 
 
 DEFAULT_CDP_URL = "http://127.0.0.1:9222"
@@ -64,13 +59,13 @@ def main() -> int:
             print(f"Warning: active page is not seller.ozon.ru: {page.url}")
         contexts[0].storage_state(path=str(session_path))
 
-    storage_state = _load_storage_state(session_path)
-    if not storage_state:
+    session_info = get_session_info(session_path)
+    if not session_info:
         print(f"Session file was written, but could not be read: {session_path}")
         return 2
 
-    company_id = _extract_company_id(storage_state)
-    needs_relogin = _session_needs_relogin(session_path, storage_state)
+    company_id = session_info.company_id
+    needs_relogin = session_info.needs_relogin
     _clear_session_needs_relogin(session_path)
 
     db = Database(args.db)
@@ -1,16 +1,18 @@
-import difflib
 import json
 import logging
 import os
 import random
-import re
 import threading
 import time
 from pathlib import Path
 from typing import Any, Dict, Optional
 
 from .app_paths import env_path
+from .metrics import COUNT_BUCKETS, counter, histogram
+from .openai_client import OpenAIError, get_openai_client
 from .proxy import ProxyConfig
+from .rate_limit import DEFAULT_RPM, DEFAULT_TPM, OpenAIRateLimiter, estimate_tokens, get_rate_limiter
+from .similarity import DEFAULT_THRESHOLD, SimilarityIndex, jaccard, normalize_text, shingles
 
 _DEFAULT_MODEL = "gpt-4o-mini"
 _DEFAULT_TIMEOUT = 30
@@ -18,10 +20,29 @@ _DEFAULT_TEMPERATURE = 1.0
 _DEFAULT_TOP_P = 0.9
 _DEFAULT_PRESENCE_PENALTY = 0.6
 _DEFAULT_FREQUENCY_PENALTY = 0.3
+_MAX_OUTPUT_TOKENS = 200
 _BASE_URL = os.environ.get("OPENAI_BASE_URL") or os.environ.get("OPENAI_API_BASE") or "https://api.openai.com/v1"
 _DOTENV_CACHE: Optional[Dict[str, str]] = None
 _DOTENV_LOCK = threading.Lock()
 
+_OPENAI_SECONDS = histogram("ozonai_openai_request_seconds", "OpenAI /responses latency, retries included", ("model",))
+_OPENAI_ERRORS = counter("ozonai_openai_errors_total", "OpenAI requests that failed after retries", ("model", "status"))
+_OPENAI_TOKENS = counter("ozonai_openai_tokens_total", "Tokens reported in OpenAI usage", ("model", "kind"))
+_RATE_LIMIT_WAIT = histogram(
+    "ozonai_openai_rate_limit_wait_seconds", "Time spent waiting on the client-side rate limiter", ("model",)
+)
+_GENERATION_ATTEMPTS = counter(
+    "ozonai_generation_attempts_total",
+    "Generated replies by what happened to them (accepted, similar, empty)",
+    ("outcome",),
+)
+_GENERATION_TRIES = histogram(
+    "ozonai_generation_tries",
+    "OpenAI calls needed per generate_ai_response",
+    ("result",),
+    COUNT_BUCKETS,
+)
+
 _SYSTEM_PROMPT = (
     "Ты продавец на маркетплейсе. Отвечай по-русски естественно, как человек. "
     "Никаких шаблонов, канцелярита и одинаковых фраз. Не используй клише вроде "
@@ -49,25 +70,6 @@ _STYLE_HINTS = [
 ]
 
 
-class _RateLimiter:
-    def __init__(self) -> None:
-        self._lock = threading.Lock()
-        self._next_time = 0.0
-
-    def throttle(self, min_interval: int, max_interval: int) -> None:
-        min_val = max(0, int(min_interval))
-        max_val = max(min_val, int(max_interval))
-        delay = random.uniform(min_val, max_val) if max_val else 0
-        with self._lock:
-            now = time.monotonic()
-            if now < self._next_time:
-                time.sleep(self._next_time - now)
-            self._next_time = time.monotonic() + delay
-
-
-_rate_limiter = _RateLimiter()
-
-
 def get_openai_base_url() -> str:
     return _BASE_URL
 
@@ -156,29 +158,12 @@ def _build_user_input(
 
 
 
-def _normalize_text(text: str) -> str:
-    cleaned = text.lower().strip()
-    cleaned = re.sub(r"\s+", " ", cleaned)
-    cleaned = re.sub(r"[^\w\s]", "", cleaned, flags=re.UNICODE)
-    return cleaned
-
-
-def _is_too_similar(text: str, recent: list[str], threshold: float = 0.85) -> bool:
-    if not text:
+def _is_too_similar(text: str, recent: list[str], threshold: float = DEFAULT_THRESHOLD) -> bool:
+    # Linear check for small ad-hoc lists; the pipeline uses a SimilarityIndex.
+    candidate = shingles(normalize_text(text))
+    if not candidate:
         return True
-    norm = _normalize_text(text)
-    for item in recent:
-        if not item:
-            continue
-        other = _normalize_text(item)
-        if not other:
-            continue
-        if norm == other:
-            return True
-        ratio = difflib.SequenceMatcher(None, norm, other).ratio()
-        if ratio >= threshold:
-            return True
-    return False
+    return any(jaccard(candidate, shingles(normalize_text(item))) >= threshold for item in recent if item)
 
 
 def _extract_output_text(payload: Dict[str, Any]) -> str:
@@ -210,50 +195,81 @@ def _postprocess(text: str) -> str:
     return cleaned
 
 
+def _sampling_params() -> Dict[str, float]:
+    return {
+        "temperature": float(os.environ.get("OPENAI_TEMPERATURE") or _DEFAULT_TEMPERATURE),
+        "top_p": float(os.environ.get("OPENAI_TOP_P") or _DEFAULT_TOP_P),
+        "presence_penalty": float(os.environ.get("OPENAI_PRESENCE_PENALTY") or _DEFAULT_PRESENCE_PENALTY),
+        "frequency_penalty": float(os.environ.get("OPENAI_FREQUENCY_PENALTY") or _DEFAULT_FREQUENCY_PENALTY),
+    }
+
+
+def _response_payload(model: str, prompt: str, sampling: Dict[str, float]) -> Dict[str, Any]:
+    return {
+        "model": model,
+        "input": prompt,
+        "instructions": _SYSTEM_PROMPT,
+        **sampling,
+        "max_output_tokens": _MAX_OUTPUT_TOKENS,
+    }
+
+
+def build_generation_request(
+    review: Dict[str, Any],
+    *,
+    model: Optional[str] = None,
+    examples: Optional[list[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    # The /responses body generate_ai_response would send for this review,
+    # for callers that submit it some other way (the Batch API).
+    prompt = _build_user_input(
+        review,
+        examples=examples,
+        style_hint=random.choice(_STYLE_HINTS),
+        style_seed=random.randint(1000, 9999),
+    )
+    return _response_payload(model or get_openai_model(), prompt, _sampling_params())
+
+
+def extract_reply(payload: Dict[str, Any]) -> str:
+    return _postprocess(_extract_output_text(payload))
+
+
 def _call_openai(
     api_key: str,
     model: str,
     prompt: str,
     timeout: int,
-    temperature: float,
-    top_p: float,
-    presence_penalty: float,
-    frequency_penalty: float,
+    sampling: Dict[str, float],
     proxy_config: Optional[ProxyConfig] = None,
+    limiter: Optional[OpenAIRateLimiter] = None,
 ) -> str:
-    payload = {
-        "model": model,
-        "input": prompt,
-        "instructions": _SYSTEM_PROMPT,
-        "temperature": temperature,
-        "top_p": top_p,
-        "presence_penalty": presence_penalty,
-        "frequency_penalty": frequency_penalty,
-        "max_output_tokens": 200,
-    }
-    url = f"{_BASE_URL}/responses"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
-    import requests
-
-    proxies = proxy_config.to_requests_proxies() if proxy_config else None
-    resp = requests.post(
-        url,
-        json=payload,
-        headers=headers,
-        timeout=timeout,
-        proxies=proxies,
-    )
-    if not resp.ok:
-        logging.getLogger(__name__).warning(
-            "OpenAI HTTP error: status=%s body=%s",
-            resp.status_code,
-            resp.text,
-        )
-        return ""
-    return _extract_output_text(resp.json())
+    payload = _response_payload(model, prompt, sampling)
+    estimated = estimate_tokens(_SYSTEM_PROMPT + prompt, _MAX_OUTPUT_TOKENS)
+    if limiter is not None:
+        waited = limiter.acquire(estimated)
+        _RATE_LIMIT_WAIT.observe(waited, model=model)
+        if waited >= 1:
+            logging.getLogger(__name__).info("Waited %.1fs for OpenAI rate limit (model=%s)", waited, model)
+    client = get_openai_client(_BASE_URL, proxy_config)
+    started = time.perf_counter()
+    try:
+        data, headers = client.request("POST", "responses", api_key, json_payload=payload, timeout=timeout)
+    except OpenAIError as exc:
+        _OPENAI_ERRORS.inc(model=model, status=exc.status or "network")
+        raise
+    finally:
+        _OPENAI_SECONDS.observe(time.perf_counter() - started, model=model)
+    usage = data.get("usage") if isinstance(data, dict) else None
+    if isinstance(usage, dict):
+        for kind in ("input", "output"):
+            tokens = usage.get(f"{kind}_tokens")
+            if isinstance(tokens, int):
+                _OPENAI_TOKENS.inc(tokens, model=model, kind=kind)
+    if limiter is not None:
+        used = usage.get("total_tokens") if isinstance(usage, dict) else None
+        limiter.observe(headers, estimated, used if isinstance(used, int) else None)
+    return _extract_output_text(data)
 
 
 def test_openai_connection(
@@ -263,9 +279,9 @@ def test_openai_connection(
     timeout: int = _DEFAULT_TIMEOUT,
     proxy_config: Optional[ProxyConfig] = None,
 ) -> Dict[str, Any]:
-    import requests
-
-    proxies = proxy_config.to_requests_proxies() if proxy_config else None
+    # Goes through the same pooled client as generation, so the check sees
+    # its proxy, retries and concurrency cap.
+    client = get_openai_client(get_openai_base_url(), proxy_config)
     model_name = model or get_openai_model()
     result: Dict[str, Any] = {
         "base_url": get_openai_base_url(),
@@ -280,11 +296,7 @@ def test_openai_connection(
     }
 
     try:
-        ip_resp = requests.get(
-            "https://api.ipify.org?format=json",
-            timeout=timeout,
-            proxies=proxies,
-        )
+        ip_resp = client.session.get("https://api.ipify.org?format=json", timeout=timeout)
         if ip_resp.ok:
             result["ipify_ip"] = (ip_resp.json() or {}).get("ip")
         else:
@@ -298,26 +310,17 @@ def test_openai_connection(
         "instructions": "Return exactly the requested phrase.",
         "max_output_tokens": 20,
     }
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
     try:
-        resp = requests.post(
-            f"{get_openai_base_url()}/responses",
-            json=payload,
-            headers=headers,
-            timeout=timeout,
-            proxies=proxies,
-        )
-        result["status_code"] = resp.status_code
-        if not resp.ok:
-            result["error"] = resp.text
-            return result
-        text = _postprocess(_extract_output_text(resp.json()))
+        data, _ = client.request("POST", "responses", api_key, json_payload=payload, timeout=timeout)
+        result["status_code"] = 200
+        text = _postprocess(_extract_output_text(data))
         result["reply"] = text
         result["ok"] = bool(text)
         return result
+    except OpenAIError as exc:
+        result["status_code"] = exc.status
+        result["error"] = exc.body or str(exc)
+        return result
     except Exception as exc:
         result["error"] = repr(exc)
         return result
@@ -330,9 +333,10 @@ def generate_ai_response(
     model: Optional[str] = None,
     examples: Optional[list[Dict[str, Any]]] = None,
     avoid_responses: Optional[list[str]] = None,
+    similarity: Optional[SimilarityIndex] = None,
     max_attempts: int = 5,
-    min_interval: int = 10,
-    max_interval: int = 30,
+    rpm: int = DEFAULT_RPM,
+    tpm: int = DEFAULT_TPM,
     timeout: int = _DEFAULT_TIMEOUT,
     proxy_config: Optional[ProxyConfig] = None,
 ) -> str:
@@ -342,13 +346,13 @@ def generate_ai_response(
 
     model = model or get_openai_model()
     logger = logging.getLogger(__name__)
-    temperature = float(os.environ.get("OPENAI_TEMPERATURE") or _DEFAULT_TEMPERATURE)
-    top_p = float(os.environ.get("OPENAI_TOP_P") or _DEFAULT_TOP_P)
-    presence_penalty = float(os.environ.get("OPENAI_PRESENCE_PENALTY") or _DEFAULT_PRESENCE_PENALTY)
-    frequency_penalty = float(os.environ.get("OPENAI_FREQUENCY_PENALTY") or _DEFAULT_FREQUENCY_PENALTY)
+    sampling = _sampling_params()
     recent = list(avoid_responses or [])
+    limiter = get_rate_limiter(api_key, model, rpm, tpm)
 
+    tries = 0
     for attempt in range(max(1, int(max_attempts))):
+        tries = attempt + 1
         style_hint = random.choice(_STYLE_HINTS)
         style_seed = random.randint(1000, 9999)
         prompt = _build_user_input(
@@ -357,29 +361,29 @@ def generate_ai_response(
             style_hint=style_hint,
             style_seed=style_seed,
         )
-        _rate_limiter.throttle(min_interval, max_interval)
-        try:
-            text = _call_openai(
-                api_key,
-                model,
-                prompt,
-                timeout,
-                temperature=temperature,
-                top_p=top_p,
-                presence_penalty=presence_penalty,
-                frequency_penalty=frequency_penalty,
-                proxy_config=proxy_config,
-            )
-            text = _postprocess(text)
-        except Exception:
-            logger.exception("Failed to generate OpenAI response")
-            return ""
+        # OpenAIError propagates once the client has used up its retries, so
+        # callers can tell a failed request from a reply that was rejected.
+        text = _call_openai(
+            api_key,
+            model,
+            prompt,
+            timeout,
+            sampling,
+            proxy_config=proxy_config,
+            limiter=limiter,
+        )
+        text = _postprocess(text)
 
         if not text:
+            _GENERATION_ATTEMPTS.inc(outcome="empty")
             logger.warning("Empty OpenAI response")
             continue
-        if recent and _is_too_similar(text, recent):
+        if (similarity is not None and similarity.is_similar(text)) or (recent and _is_too_similar(text, recent)):
+            _GENERATION_ATTEMPTS.inc(outcome="similar")
             logger.info("OpenAI response too similar, retrying")
             continue
+        _GENERATION_ATTEMPTS.inc(outcome="accepted")
+        _GENERATION_TRIES.observe(tries, result="accepted")
         return text
+    _GENERATION_TRIES.observe(tries, result="exhausted")
     return ""
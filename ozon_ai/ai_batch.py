@@ -0,0 +1,308 @@
+import argparse
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from uuid import uuid4
+
+from .ai import build_generation_request, extract_reply, get_openai_base_url
+from .db import JOB_BATCHED, JOB_DONE, JOB_FAILED, JOB_PENDING_GENERATION, JOB_PENDING_SEND, Database
+from .example_index import ExampleIndex, get_example_index
+from .openai_client import OpenAIClient, OpenAIError, get_openai_client
+from .pipeline import JOB_MAX_ATTEMPTS, PipelineSettings
+from .similarity import load_similarity_index
+
+
+BATCH_ENDPOINT = "/v1/responses"
+BATCH_COMPLETION_WINDOW = "24h"
+MAX_BATCH_REQUESTS = 50_000
+DEFAULT_POLL_INTERVAL = 60
+_FINAL_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+_REQUEST_TIMEOUT = 120
+
+
+def build_batch_lines(
+    jobs: List[Dict[str, Any]],
+    examples: ExampleIndex,
+    model: Optional[str] = None,
+) -> List[Tuple[str, str]]:
+    # (review uuid, JSONL line) pairs; the uuid doubles as the batch custom_id.
+    lines = []
+    for job in jobs:
+        try:
+            review = json.loads(job["payload"] or "{}")
+        except ValueError:
+            logging.getLogger(__name__).warning("Skipping job %s with unreadable payload", job["review_uuid"])
+            continue
+        request = {
+            "custom_id": job["review_uuid"],
+            "method": "POST",
+            "url": BATCH_ENDPOINT,
+            "body": build_generation_request(review, model=model, examples=examples.top_k(review)),
+        }
+        lines.append((job["review_uuid"], json.dumps(request, ensure_ascii=False)))
+    return lines
+
+
+def iter_batch_results(content: str) -> Iterator[Tuple[str, str, str]]:
+    # Yields (custom_id, reply, error) for each line of a batch output or error file.
+    for line in content.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            logging.getLogger(__name__).warning("Skipping unreadable batch result line")
+            continue
+        custom_id = item.get("custom_id") or ""
+        response = item.get("response") or {}
+        error = item.get("error")
+        if error:
+            yield custom_id, "", str(error.get("message") if isinstance(error, dict) else error)
+        elif response.get("status_code") != 200:
+            yield custom_id, "", f"status={response.get('status_code')}"
+        else:
+            reply = extract_reply(response.get("body") or {})
+            yield custom_id, reply, "" if reply else "empty response"
+
+
+class BatchGenerator:
+    # Backlog mode: pending generation jobs are sent through the OpenAI Batch
+    # API instead of one request at a time. Jobs move to the "batched" state
+    # before the file is built, so the live pipeline leaves them alone, and go
+    # back to pending_generation for anything the batch did not answer.
+    def __init__(
+        self,
+        db_path: Path,
+        *,
+        base_url: Optional[str] = None,
+        model: Optional[str] = None,
+        client: Optional[OpenAIClient] = None,
+    ) -> None:
+        self._db_path = Path(db_path)
+        self._model = model
+        db = Database(str(self._db_path))
+        try:
+            self._settings = PipelineSettings.from_db(db)
+        finally:
+            db.close()
+        if not self._settings.api_key:
+            raise ValueError("OpenAI API key is not configured")
+        base_url = base_url or os.environ.get("OPENAI_BATCH_BASE_URL") or get_openai_base_url()
+        self._client = client or get_openai_client(base_url, self._settings.proxy_config)
+        self._logger = logging.getLogger(__name__)
+
+    def submit(self, limit: int = MAX_BATCH_REQUESTS) -> Optional[str]:
+        limit = max(1, min(int(limit), MAX_BATCH_REQUESTS))
+        # Jobs are claimed under a local id before anything is uploaded: the
+        # live pipeline only generates jobs still in pending_generation, and
+        # jobs it has already picked up are not claimed here.
+        local_id = f"local-{uuid4().hex}"
+        db = Database(str(self._db_path))
+        try:
+            with db.transaction():
+                due = db.list_due_jobs([JOB_PENDING_GENERATION], time.time(), limit=limit)
+                db.assign_jobs_to_batch([job["review_uuid"] for job in due], local_id)
+                jobs = db.list_batch_jobs(local_id)
+            examples = get_example_index(db)
+        finally:
+            db.close()
+        try:
+            lines = build_batch_lines(jobs, examples, self._model)
+            if not lines:
+                self._release(local_id)
+                return None
+            batch, input_file_id = self._upload(lines)
+        except BaseException:
+            self._release(local_id)
+            raise
+        batch_id = batch["id"]
+        db = Database(str(self._db_path))
+        try:
+            with db.transaction():
+                db.save_batch(
+                    batch_id,
+                    status=batch.get("status"),
+                    input_file_id=input_file_id,
+                    request_count=len(lines),
+                )
+                assigned = db.rename_batch_jobs(local_id, batch_id)
+        finally:
+            db.close()
+        self._logger.info("Submitted batch %s with %s reviews (%s assigned)", batch_id, len(lines), assigned)
+        return batch_id
+
+    def _upload(self, lines: List[Tuple[str, str]]) -> Tuple[Dict[str, Any], str]:
+        content = ("\n".join(line for _, line in lines) + "\n").encode("utf-8")
+        uploaded, _ = self._client.request(
+            "POST",
+            "files",
+            self._settings.api_key,
+            timeout=_REQUEST_TIMEOUT,
+            data={"purpose": "batch"},
+            files={"file": ("reviews.jsonl", content, "application/jsonl")},
+        )
+        batch, _ = self._client.request(
+            "POST",
+            "batches",
+            self._settings.api_key,
+            json_payload={
+                "input_file_id": uploaded["id"],
+                "endpoint": BATCH_ENDPOINT,
+                "completion_window": BATCH_COMPLETION_WINDOW,
+                "metadata": {"source": "ozon_ai"},
+            },
+            timeout=_REQUEST_TIMEOUT,
+        )
+        return batch, uploaded["id"]
+
+    def _release(self, batch_id: str) -> None:
+        db = Database(str(self._db_path))
+        try:
+            db.release_batch_jobs(batch_id)
+        finally:
+            db.close()
+
+    def refresh(self) -> int:
+        # Returns how many batches are still open.
+        db = Database(str(self._db_path))
+        try:
+            batches = db.list_open_batches()
+        finally:
+            db.close()
+        still_open = 0
+        for stored in batches:
+            try:
+                if not self._refresh_batch(stored["id"]):
+                    still_open += 1
+            except OpenAIError as exc:
+                self._logger.warning("Failed to refresh batch %s: %s", stored["id"], exc)
+                still_open += 1
+        return still_open
+
+    def run(self, limit: int = MAX_BATCH_REQUESTS, poll_interval: float = DEFAULT_POLL_INTERVAL) -> None:
+        self.submit(limit)
+        while self.refresh():
+            time.sleep(max(1.0, poll_interval))
+
+    def _refresh_batch(self, batch_id: str) -> bool:
+        batch, _ = self._client.request("GET", f"batches/{batch_id}", self._settings.api_key, timeout=_REQUEST_TIMEOUT)
+        status = batch.get("status") or ""
+        db = Database(str(self._db_path))
+        try:
+            db.save_batch(
+                batch_id,
+                status=status,
+                output_file_id=batch.get("output_file_id"),
+                error_file_id=batch.get("error_file_id"),
+            )
+        finally:
+            db.close()
+        if status not in _FINAL_STATUSES:
+            counts = batch.get("request_counts") or {}
+            self._logger.info(
+                "Batch %s is %s (%s/%s done)",
+                batch_id,
+                status,
+                counts.get("completed", 0),
+                counts.get("total", 0),
+            )
+            return False
+
+        # Expired and cancelled batches still carry partial output worth keeping.
+        results: List[Tuple[str, str, str]] = []
+        for file_id in (batch.get("output_file_id"), batch.get("error_file_id")):
+            if file_id:
+                content = self._client.download(
+                    f"files/{file_id}/content",
+                    self._settings.api_key,
+                    timeout=_REQUEST_TIMEOUT,
+                )
+                results.extend(iter_batch_results(content))
+        db = Database(str(self._db_path))
+        try:
+            with db.transaction():
+                stored, failed = self._ingest(db, batch_id, results)
+                released = db.release_batch_jobs(batch_id)
+                db.mark_batch_ingested(batch_id)
+        finally:
+            db.close()
+        self._logger.info(
+            "Batch %s %s: %s replies stored, %s failed, %s returned to the queue",
+            batch_id,
+            status,
+            stored,
+            failed,
+            released,
+        )
+        return True
+
+    def _ingest(self, db: Database, batch_id: str, results: List[Tuple[str, str, str]]) -> Tuple[int, int]:
+        similarity = load_similarity_index(db)
+        stored = failed = 0
+        for uuid, reply, error in results:
+            job = db.get_job(uuid)
+            if not job or job["state"] != JOB_BATCHED or job["batch_id"] != batch_id:
+                continue
+            if not reply:
+                attempts = int(job["attempts"] or 0) + 1
+                state = JOB_FAILED if attempts >= JOB_MAX_ATTEMPTS else JOB_PENDING_GENERATION
+                db.update_job(uuid, state=state, attempts=attempts, last_error=error, batch_id=None)
+                failed += 1
+                continue
+            if similarity.is_similar(reply):
+                # Left in the batch state; release_batch_jobs hands it to the live pipeline.
+                continue
+            review = json.loads(job["payload"] or "{}")
+            send = self._settings.auto_sends(review, reply)
+            db.set_review_ai_response(review, reply, account_id=job["account_id"])
+            db.update_job(
+                uuid,
+                state=JOB_PENDING_SEND if send else JOB_DONE,
+                ai_response=reply,
+                attempts=0,
+                next_attempt_at=0,
+                last_error=None,
+                batch_id=None,
+            )
+            reply_signature = similarity.add(reply)
+            if reply_signature is not None:
+                db.add_reply_signatures([reply_signature])
+            stored += 1
+        return stored, failed
+
+
+def main() -> None:
+    base_dir = Path(__file__).resolve().parent.parent
+    parser = argparse.ArgumentParser(description="Generate replies for a review backlog through the OpenAI Batch API")
+    parser.add_argument("command", choices=("submit", "poll", "run"), help="submit a batch, poll open ones, or both")
+    parser.add_argument(
+        "--db-path",
+        default=str(base_dir / "ozon_ai.db"),
+        help="Path to sqlite database (default: ozon_ai.db in project root)",
+    )
+    parser.add_argument("--base-url", help="OpenAI-compatible base URL (default: OPENAI_BATCH_BASE_URL or the API URL)")
+    parser.add_argument("--model", help="Model to generate with (default: OPENAI_MODEL)")
+    parser.add_argument("--limit", type=int, default=MAX_BATCH_REQUESTS, help="Max reviews per batch")
+    parser.add_argument("--interval", type=float, default=DEFAULT_POLL_INTERVAL, help="Seconds between polls")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    try:
+        generator = BatchGenerator(Path(args.db_path), base_url=args.base_url, model=args.model)
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+    if args.command == "submit":
+        batch_id = generator.submit(args.limit)
+        print(f"Submitted: {batch_id}" if batch_id else "Nothing to submit")
+    elif args.command == "poll":
+        print(f"Open batches: {generator.refresh()}")
+    else:
+        generator.run(args.limit, args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,304 @@
-﻿import sqlite3
-from typing import Any, Dict, List, Optional, Set
+﻿import json
+import logging
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from .metrics import counter, histogram
+
+
+_TRANSACTION_SECONDS = histogram("ozonai_db_transaction_seconds", "Outermost transaction() blocks, commit included")
+_COMMIT_SECONDS = histogram("ozonai_db_commit_seconds", "Time spent in SQLite COMMIT")
+_ROLLBACKS = counter("ozonai_db_rollbacks_total", "Outermost transactions rolled back")
+
+_UPSERT_REVIEW_SQL = """
+    INSERT INTO reviews (
+        uuid, status, account_id, product_title, product_url, offer_id, cover_image, sku,
+        brand_id, brand_name, order_delivery_type, text, interaction_status,
+        rating, photos_count, videos_count, comments_count, published_at,
+        is_pinned, is_quality_control, chat_url, is_delivery_review, ai_response, user_response
+    ) VALUES (
+        ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
+    )
+    ON CONFLICT(uuid) DO UPDATE SET
+        status = CASE
+            WHEN reviews.status = 'completed' THEN reviews.status
+            ELSE excluded.status
+        END,
+        account_id = excluded.account_id,
+        ai_response = excluded.ai_response
+"""
+
+
+def _review_params(
+    review: Dict[str, Any],
+    status: str,
+    ai_response: Optional[str],
+    account_id: Optional[int],
+) -> Tuple[Any, ...]:
+    product = review.get("product", {})
+    brand = product.get("brand_info", {})
+    if account_id is None:
+        account_id = review.get("account_id")
+    ai_response = ai_response or review.get("ai_response")
+    return (
+        review.get("uuid"),
+        status,
+        account_id,
+        product.get("title"),
+        product.get("url"),
+        product.get("offer_id"),
+        product.get("cover_image"),
+        product.get("sku"),
+        brand.get("id"),
+        brand.get("name"),
+        review.get("orderDeliveryType"),
+        review.get("text"),
+        review.get("interaction_status"),
+        review.get("rating"),
+        review.get("photos_count"),
+        review.get("videos_count"),
+        review.get("comments_count"),
+        review.get("published_at"),
+        int(bool(review.get("is_pinned"))),
+        int(bool(review.get("is_quality_control"))),
+        review.get("chat_url"),
+        int(bool(review.get("is_delivery_review"))),
+        ai_response,
+        review.get("user_response"),
+    )
+
+
+JOB_PENDING_GENERATION = "pending_generation"
+JOB_GENERATING = "generating"
+JOB_PENDING_SEND = "pending_send"
+JOB_SENDING = "sending"
+JOB_BATCHED = "batched"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+_JOB_FIELDS = ("state", "ai_response", "attempts", "next_attempt_at", "last_error", "batch_id")
+_BATCH_FIELDS = ("status", "input_file_id", "output_file_id", "error_file_id", "request_count")
+BUSY_TIMEOUT_MS = 5000
+_IN_CHUNK_SIZE = 500
+
+
+@dataclass(frozen=True)
+class ReviewChanges:
+    inserted: Tuple[str, ...] = ()
+    updated: Tuple[str, ...] = ()
+    status_changed: Tuple[str, ...] = ()
+
+    def __bool__(self) -> bool:
+        return bool(self.inserted or self.updated or self.status_changed)
+
+    @property
+    def uuids(self) -> Set[str]:
+        return set(self.inserted) | set(self.updated) | set(self.status_changed)
+
+    @classmethod
+    def merge(cls, changes: Iterable["ReviewChanges"]) -> "ReviewChanges":
+        inserted: Dict[str, None] = {}
+        updated: Dict[str, None] = {}
+        status_changed: Dict[str, None] = {}
+        for change in changes:
+            inserted.update(dict.fromkeys(change.inserted))
+            updated.update(dict.fromkeys(change.updated))
+            status_changed.update(dict.fromkeys(change.status_changed))
+        return cls(tuple(inserted), tuple(updated), tuple(status_changed))
+
+
+_review_listeners: List[Callable[[ReviewChanges], None]] = []
+_review_listeners_lock = threading.Lock()
+
+
+def add_review_listener(listener: Callable[[ReviewChanges], None]) -> None:
+    with _review_listeners_lock:
+        if listener not in _review_listeners:
+            _review_listeners.append(listener)
+
+
+def remove_review_listener(listener: Callable[[ReviewChanges], None]) -> None:
+    with _review_listeners_lock:
+        if listener in _review_listeners:
+            _review_listeners.remove(listener)
+
+
+def _emit_review_changes(changes: ReviewChanges) -> None:
+    # Listeners run on the committing thread; UI code must hop to its own.
+    with _review_listeners_lock:
+        listeners = list(_review_listeners)
+    for listener in listeners:
+        try:
+            listener(changes)
+        except Exception:
+            logging.getLogger(__name__).exception("Review change listener failed")
+
+
+class _ThreadConnection:
+    # Only the thread-local refers to this, so it goes away when its thread exits.
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+
 
 class Database:
+    # One connection per thread: the UI thread, the pipeline writer and any
+    # worker threads each get their own, and WAL lets readers run alongside
+    # the single writer instead of queueing on the file lock.
     def __init__(self, path: str) -> None:
         self.path = path
-        self.conn = sqlite3.connect(self.path)
-        self.conn.row_factory = sqlite3.Row
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._hold_connection()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            holder = self._hold_connection()
+        return holder.conn
+
+    def _hold_connection(self) -> _ThreadConnection:
+        holder = self._local.holder = _ThreadConnection(self._connect())
+        # Short-lived worker threads would otherwise keep their connection open until close().
+        weakref.finalize(holder, self._release, holder.conn)
+        return holder
+
+    @property
+    def _tx_depth(self) -> int:
+        return getattr(self._local, "tx_depth", 0)
+
+    @_tx_depth.setter
+    def _tx_depth(self, value: int) -> None:
+        self._local.tx_depth = value
+
+    @property
+    def _pending_changes(self) -> List[ReviewChanges]:
+        pending = getattr(self._local, "pending_changes", None)
+        if pending is None:
+            pending = self._local.pending_changes = []
+        return pending
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        if self.path != ":memory:":
+            try:
+                conn.execute("PRAGMA journal_mode = WAL")
+            except sqlite3.OperationalError:
+                logging.getLogger(__name__).warning("Could not enable WAL for %s", self.path)
+        conn.execute("PRAGMA synchronous = NORMAL")
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        with self._connections_lock:
+            if conn not in self._connections:
+                # Already closed by close().
+                return
+            self._connections.remove(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            logging.getLogger(__name__).exception("Failed to close connection to %s", self.path)
 
     def close(self) -> None:
-        self.conn.close()
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        self._local = threading.local()
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                logging.getLogger(__name__).exception("Failed to close connection to %s", self.path)
+
+    @contextmanager
+    def transaction(self) -> Iterator["Database"]:
+        # Methods commit through _commit(), which is a no-op inside a unit of
+        # work; the outermost block commits once. Nested blocks are savepoints,
+        # so a failed inner block is undone without losing the outer work.
+        depth = self._tx_depth
+        savepoint = f"tx_{depth}"
+        pending_mark = len(self._pending_changes)
+        started = time.perf_counter()
+        if depth == 0:
+            # IMMEDIATE takes the write lock up front. After a deferred BEGIN the
+            # block reads first, and if another connection writes before our first
+            # write, SQLite fails ours with "database is locked" instead of waiting.
+            if not self.conn.in_transaction:
+                self.conn.execute("BEGIN IMMEDIATE")
+        else:
+            self.conn.execute(f"SAVEPOINT {savepoint}")
+        self._tx_depth = depth + 1
+        try:
+            yield self
+        except BaseException:
+            self._tx_depth = depth
+            del self._pending_changes[pending_mark:]
+            if depth == 0:
+                self.conn.rollback()
+                _ROLLBACKS.inc()
+            else:
+                self.conn.execute(f"ROLLBACK TO {savepoint}")
+                self.conn.execute(f"RELEASE {savepoint}")
+            raise
+        self._tx_depth = depth
+        if depth == 0:
+            self._timed_commit()
+            _TRANSACTION_SECONDS.observe(time.perf_counter() - started)
+            self._flush_changes()
+        else:
+            self.conn.execute(f"RELEASE {savepoint}")
+
+    def _timed_commit(self) -> None:
+        started = time.perf_counter()
+        self.conn.commit()
+        _COMMIT_SECONDS.observe(time.perf_counter() - started)
+
+    def _commit(self) -> None:
+        if self._tx_depth == 0:
+            self._timed_commit()
+            self._flush_changes()
+
+    def _record_changes(self, changes: ReviewChanges) -> None:
+        if changes:
+            self._pending_changes.append(changes)
+
+    def _flush_changes(self) -> None:
+        pending = self._pending_changes
+        if not pending:
+            return
+        changes = ReviewChanges.merge(pending)
+        pending.clear()
+        _emit_review_changes(changes)
+
+    def _review_statuses(self, uuids: Sequence[str]) -> Dict[str, str]:
+        statuses: Dict[str, str] = {}
+        cur = self.conn.cursor()
+        for start in range(0, len(uuids), _IN_CHUNK_SIZE):
+            chunk = uuids[start:start + _IN_CHUNK_SIZE]
+            placeholders = ", ".join("?" for _ in chunk)
+            cur.execute(f"SELECT uuid, status FROM reviews WHERE uuid IN ({placeholders})", list(chunk))
+            statuses.update({row[0]: row[1] for row in cur.fetchall()})
+        return statuses
+
+    def _upsert_changes(self, uuids: Sequence[str], status: str, before: Dict[str, str]) -> ReviewChanges:
+        inserted = tuple(uuid for uuid in uuids if uuid not in before)
+        status_changed = tuple(
+            uuid for uuid in uuids if uuid in before and before[uuid] not in {status, "completed"}
+        )
+        moved = set(status_changed)
+        updated = tuple(uuid for uuid in uuids if uuid in before and uuid not in moved)
+        return ReviewChanges(inserted=inserted, updated=updated, status_changed=status_changed)
 
     def ensure_schema(self) -> None:
         cur = self.conn.cursor()
@@ -28,7 +318,9 @@ class Database:
                 session_path TEXT,
                 profile_dir TEXT,
                 created_at TEXT,
-                session_version INTEGER DEFAULT 2
+                session_version INTEGER DEFAULT 2,
+                reviews_cursor_at TEXT,
+                reviews_cursor_uuid TEXT
             )
             """
         )
@@ -42,6 +334,10 @@ class Database:
             cur.execute("ALTER TABLE accounts ADD COLUMN created_at TEXT")
         if "session_version" not in columns:
             cur.execute("ALTER TABLE accounts ADD COLUMN session_version INTEGER DEFAULT 2")
+        if "reviews_cursor_at" not in columns:
+            cur.execute("ALTER TABLE accounts ADD COLUMN reviews_cursor_at TEXT")
+        if "reviews_cursor_uuid" not in columns:
+            cur.execute("ALTER TABLE accounts ADD COLUMN reviews_cursor_uuid TEXT")
         cur.execute("UPDATE accounts SET session_version = 2 WHERE session_version IS NULL")
         cur.execute(
             """
@@ -77,6 +373,70 @@ class Database:
         review_columns = {row["name"] for row in cur.fetchall()}
         if "account_id" not in review_columns:
             cur.execute("ALTER TABLE reviews ADD COLUMN account_id INTEGER")
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                review_uuid TEXT PRIMARY KEY,
+                account_id INTEGER,
+                state TEXT NOT NULL,
+                payload TEXT,
+                ai_response TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at TEXT,
+                batch_id TEXT
+            )
+            """
+        )
+        cur.execute("PRAGMA table_info(jobs)")
+        job_columns = {row["name"] for row in cur.fetchall()}
+        if "batch_id" not in job_columns:
+            cur.execute("ALTER TABLE jobs ADD COLUMN batch_id TEXT")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state_next ON jobs (state, next_attempt_at)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs (batch_id)")
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ai_batches (
+                id TEXT PRIMARY KEY,
+                status TEXT,
+                input_file_id TEXT,
+                output_file_id TEXT,
+                error_file_id TEXT,
+                request_count INTEGER,
+                created_at TEXT,
+                updated_at TEXT,
+                ingested_at TEXT
+            )
+            """
+        )
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_reviews_status_keyset ON reviews (status, published_at DESC, uuid DESC)"
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_reviews_published ON reviews (published_at DESC)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_reviews_account ON reviews (account_id)")
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS reply_signatures (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                text TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                created_at TEXT
+            )
+            """
+        )
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS reply_cache (
+                signature TEXT NOT NULL,
+                text TEXT NOT NULL,
+                uses INTEGER NOT NULL DEFAULT 0,
+                last_used_at REAL NOT NULL DEFAULT 0,
+                created_at TEXT,
+                PRIMARY KEY (signature, text)
+            )
+            """
+        )
         cur.execute(
             """
             CREATE TABLE IF NOT EXISTS ai_examples (
@@ -109,7 +469,7 @@ class Database:
             )
             """
         )
-        self.conn.commit()
+        self._commit()
 
     def get_setting(self, key: str) -> Optional[str]:
         cur = self.conn.cursor()
@@ -126,13 +486,14 @@ class Database:
             """,
             (key, value),
         )
-        self.conn.commit()
+        self._commit()
 
     def list_accounts(self) -> List[sqlite3.Row]:
         cur = self.conn.cursor()
         cur.execute(
             """
-            SELECT id, name, session_path, profile_dir, created_at, session_version
+            SELECT id, name, session_path, profile_dir, created_at, session_version,
+                   reviews_cursor_at, reviews_cursor_uuid
             FROM accounts
             ORDER BY id
             """
@@ -155,12 +516,12 @@ class Database:
             """,
             (name, session_path, profile_dir, created_at, session_version),
         )
-        self.conn.commit()
+        self._commit()
 
     def delete_account(self, account_id: int) -> None:
         cur = self.conn.cursor()
         cur.execute("DELETE FROM accounts WHERE id = ?", (account_id,))
-        self.conn.commit()
+        self._commit()
 
     def update_account_session(
         self,
@@ -175,7 +536,8 @@ class Database:
             cur.execute(
                 """
                 UPDATE accounts
-                SET session_path = ?, profile_dir = ?, session_version = ?
+                SET session_path = ?, profile_dir = ?, session_version = ?,
+                    reviews_cursor_at = NULL, reviews_cursor_uuid = NULL
                 WHERE id = ?
                 """,
                 (session_path, profile_dir, session_version, account_id),
@@ -184,12 +546,25 @@ class Database:
             cur.execute(
                 """
                 UPDATE accounts
-                SET session_path = ?, profile_dir = ?, created_at = ?, session_version = ?
+                SET session_path = ?, profile_dir = ?, created_at = ?, session_version = ?,
+                    reviews_cursor_at = NULL, reviews_cursor_uuid = NULL
                 WHERE id = ?
                 """,
                 (session_path, profile_dir, created_at, session_version, account_id),
             )
-        self.conn.commit()
+        self._commit()
+
+    def set_review_cursor(self, account_id: int, published_at: str, uuid: Optional[str]) -> None:
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            UPDATE accounts
+            SET reviews_cursor_at = ?, reviews_cursor_uuid = ?
+            WHERE id = ?
+            """,
+            (published_at, uuid, account_id),
+        )
+        self._commit()
 
     def count_reviews(self) -> int:
         cur = self.conn.cursor()
@@ -208,58 +583,31 @@ class Database:
         ai_response: Optional[str] = None,
         account_id: Optional[int] = None,
     ) -> None:
-        product = review.get("product", {})
-        brand = product.get("brand_info", {})
-        if account_id is None:
-            account_id = review.get("account_id")
-        ai_response = ai_response or review.get("ai_response")
+        params = _review_params(review, status, ai_response, account_id)
+        uuid = params[0]
+        before = self._review_statuses([uuid]) if uuid else {}
         cur = self.conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO reviews (
-                uuid, status, account_id, product_title, product_url, offer_id, cover_image, sku,
-                brand_id, brand_name, order_delivery_type, text, interaction_status,
-                rating, photos_count, videos_count, comments_count, published_at,
-                is_pinned, is_quality_control, chat_url, is_delivery_review, ai_response, user_response
-            ) VALUES (
-                ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
-            )
-            ON CONFLICT(uuid) DO UPDATE SET
-                status = CASE
-                    WHEN reviews.status = 'completed' THEN reviews.status
-                    ELSE excluded.status
-                END,
-                account_id = excluded.account_id,
-                ai_response = excluded.ai_response
-            """,
-            (
-                review.get("uuid"),
-                status,
-                account_id,
-                product.get("title"),
-                product.get("url"),
-                product.get("offer_id"),
-                product.get("cover_image"),
-                product.get("sku"),
-                brand.get("id"),
-                brand.get("name"),
-                review.get("orderDeliveryType"),
-                review.get("text"),
-                review.get("interaction_status"),
-                review.get("rating"),
-                review.get("photos_count"),
-                review.get("videos_count"),
-                review.get("comments_count"),
-                review.get("published_at"),
-                int(bool(review.get("is_pinned"))),
-                int(bool(review.get("is_quality_control"))),
-                review.get("chat_url"),
-                int(bool(review.get("is_delivery_review"))),
-                ai_response,
-                review.get("user_response"),
-            ),
-        )
-        self.conn.commit()
+        cur.execute(_UPSERT_REVIEW_SQL, params)
+        if uuid:
+            self._record_changes(self._upsert_changes([uuid], status, before))
+        self._commit()
+
+    def upsert_reviews(
+        self,
+        reviews: Iterable[Dict[str, Any]],
+        status: str = "new",
+        account_id: Optional[int] = None,
+    ) -> int:
+        rows = [_review_params(review, status, None, account_id) for review in reviews if review.get("uuid")]
+        if not rows:
+            return 0
+        uuids = list(dict.fromkeys(row[0] for row in rows))
+        before = self._review_statuses(uuids)
+        cur = self.conn.cursor()
+        cur.executemany(_UPSERT_REVIEW_SQL, rows)
+        self._record_changes(self._upsert_changes(uuids, status, before))
+        self._commit()
+        return len(rows)
 
     def list_reviews(self, status: str) -> List[Dict[str, Any]]:
         cur = self.conn.cursor()
@@ -271,6 +619,37 @@ class Database:
         )
         return [dict(row) for row in cur.fetchall()]
 
+    def list_reviews_page(
+        self,
+        status: str,
+        *,
+        limit: int = 100,
+        before: Optional[Tuple[Optional[str], str]] = None,
+    ) -> List[Dict[str, Any]]:
+        # Keyset pagination on (published_at, uuid); NULL dates sort last.
+        params: List[Any] = [status]
+        where = ""
+        if before is not None:
+            published_at, uuid = before
+            if published_at is None:
+                where = "AND published_at IS NULL AND uuid < ?"
+                params.append(uuid)
+            else:
+                where = "AND (published_at < ? OR (published_at = ? AND uuid < ?) OR published_at IS NULL)"
+                params.extend([published_at, published_at, uuid])
+        params.append(limit)
+        cur = self.conn.cursor()
+        cur.execute(
+            f"""
+            SELECT * FROM reviews
+            WHERE status = ? {where}
+            ORDER BY published_at DESC, uuid DESC
+            LIMIT ?
+            """,
+            params,
+        )
+        return [dict(row) for row in cur.fetchall()]
+
     def list_recent_ai_responses(self, limit: int = 100) -> List[str]:
         cur = self.conn.cursor()
         cur.execute(
@@ -285,7 +664,71 @@ class Database:
         )
         return [row[0] for row in cur.fetchall() if row[0]]
 
+    def list_review_drafts(self, status: str = "new") -> List[Tuple[str, str]]:
+        # (uuid, ai_response) for every review in ``status`` that has a reply ready.
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            SELECT uuid, ai_response
+            FROM reviews
+            WHERE status = ? AND ai_response IS NOT NULL AND ai_response != ''
+            ORDER BY published_at DESC, uuid DESC
+            """,
+            (status,),
+        )
+        return [(row[0], row[1]) for row in cur.fetchall()]
+
+    def add_reply_signatures(self, signatures: Iterable[Any]) -> None:
+        # Items are similarity.ReplySignature; the DB only stores their text and packed bytes.
+        now = datetime.now().isoformat(timespec="seconds")
+        rows = [(item.text, item.packed(), now) for item in signatures]
+        if not rows:
+            return
+        cur = self.conn.cursor()
+        cur.executemany("INSERT INTO reply_signatures (text, signature, created_at) VALUES (?, ?, ?)", rows)
+        self._commit()
+
+    def list_reply_signatures(self, limit: int) -> List[Tuple[str, bytes]]:
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            SELECT text, signature FROM (
+                SELECT id, text, signature FROM reply_signatures ORDER BY id DESC LIMIT ?
+            ) ORDER BY id
+            """,
+            (limit,),
+        )
+        return [(row[0], bytes(row[1])) for row in cur.fetchall()]
+
+    def prune_reply_signatures(self, keep: int) -> None:
+        cur = self.conn.cursor()
+        cur.execute(
+            "DELETE FROM reply_signatures WHERE id <= (SELECT MAX(id) FROM reply_signatures) - ?",
+            (keep,),
+        )
+        self._commit()
+
+    def list_cached_replies(self) -> List[Dict[str, Any]]:
+        cur = self.conn.cursor()
+        cur.execute("SELECT signature, text, uses, last_used_at FROM reply_cache")
+        return [dict(row) for row in cur.fetchall()]
+
+    def save_cached_reply(self, signature: str, text: str, uses: int, last_used_at: float) -> None:
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO reply_cache (signature, text, uses, last_used_at, created_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(signature, text) DO UPDATE SET
+                uses = excluded.uses,
+                last_used_at = excluded.last_used_at
+            """,
+            (signature, text, uses, last_used_at, datetime.now().isoformat(timespec="seconds")),
+        )
+        self._commit()
+
     def update_review_status(self, uuid: str, status: str, response: str) -> None:
+        before = self._review_statuses([uuid])
         cur = self.conn.cursor()
         cur.execute(
             """
@@ -293,7 +736,39 @@ class Database:
             """,
             (status, response, uuid),
         )
-        self.conn.commit()
+        if uuid in before:
+            if before[uuid] != status:
+                self._record_changes(ReviewChanges(status_changed=(uuid,)))
+            else:
+                self._record_changes(ReviewChanges(updated=(uuid,)))
+        self._commit()
+
+    def set_review_ai_response(
+        self,
+        review: Dict[str, Any],
+        ai_response: str,
+        account_id: Optional[int] = None,
+    ) -> None:
+        # Fills in the generated reply without touching the review's status.
+        uuid = review.get("uuid")
+        cur = self.conn.cursor()
+        cur.execute("UPDATE reviews SET ai_response = ? WHERE uuid = ?", (ai_response, uuid))
+        if not cur.rowcount:
+            # The review was not stored on fetch (that write failed).
+            self.upsert_review(review, status="new", ai_response=ai_response, account_id=account_id)
+            return
+        self._record_changes(ReviewChanges(updated=(uuid,)))
+        self._commit()
+
+    def get_reviews(self, uuids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        reviews: Dict[str, Dict[str, Any]] = {}
+        cur = self.conn.cursor()
+        for start in range(0, len(uuids), _IN_CHUNK_SIZE):
+            chunk = list(uuids[start:start + _IN_CHUNK_SIZE])
+            placeholders = ", ".join("?" for _ in chunk)
+            cur.execute(f"SELECT * FROM reviews WHERE uuid IN ({placeholders})", chunk)
+            reviews.update({row["uuid"]: dict(row) for row in cur.fetchall()})
+        return reviews
 
     def get_review(self, uuid: str) -> Optional[Dict[str, Any]]:
         cur = self.conn.cursor()
@@ -313,6 +788,176 @@ class Database:
         )
         return cur.fetchone()
 
+    def add_generation_jobs(self, reviews: Iterable[Dict[str, Any]], account_id: Optional[int]) -> None:
+        now = datetime.now().isoformat(timespec="seconds")
+        rows = [
+            (review["uuid"], account_id, JOB_PENDING_GENERATION, json.dumps(review, ensure_ascii=False), now)
+            for review in reviews
+            if review.get("uuid")
+        ]
+        if not rows:
+            return
+        cur = self.conn.cursor()
+        cur.executemany(
+            """
+            INSERT OR IGNORE INTO jobs (review_uuid, account_id, state, payload, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
+        self._commit()
+
+    def update_job(self, uuid: str, **fields: Any) -> None:
+        unknown = set(fields) - set(_JOB_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown job fields: {', '.join(sorted(unknown))}")
+        fields["updated_at"] = datetime.now().isoformat(timespec="seconds")
+        cur = self.conn.cursor()
+        cur.execute(
+            f"UPDATE jobs SET {', '.join(f'{name} = ?' for name in fields)} WHERE review_uuid = ?",
+            list(fields.values()) + [uuid],
+        )
+        self._commit()
+
+    def claim_job_for_manual_send(self, uuid: str) -> Tuple[bool, Optional[str]]:
+        # A reply sent by hand takes its review's job over, so the pipeline
+        # neither generates nor sends it again. Returns (claimed, previous
+        # state); a job the pipeline is generating or sending is left alone.
+        with self.transaction():
+            job = self.get_job(uuid)
+            if job is None:
+                return True, None
+            if job["state"] in (JOB_GENERATING, JOB_SENDING):
+                return False, job["state"]
+            self.update_job(uuid, state=JOB_SENDING, batch_id=None)
+            return True, job["state"]
+
+    def get_job(self, uuid: str) -> Optional[Dict[str, Any]]:
+        cur = self.conn.cursor()
+        cur.execute("SELECT * FROM jobs WHERE review_uuid = ?", (uuid,))
+        row = cur.fetchone()
+        return dict(row) if row else None
+
+    def list_due_jobs(self, states: Sequence[str], now: float, limit: int = 500) -> List[Dict[str, Any]]:
+        placeholders = ", ".join("?" for _ in states)
+        cur = self.conn.cursor()
+        cur.execute(
+            f"""
+            SELECT * FROM jobs
+            WHERE state IN ({placeholders}) AND next_attempt_at <= ?
+            ORDER BY next_attempt_at
+            LIMIT ?
+            """,
+            list(states) + [now, limit],
+        )
+        return [dict(row) for row in cur.fetchall()]
+
+    def list_job_uuids(self) -> Set[str]:
+        cur = self.conn.cursor()
+        cur.execute("SELECT review_uuid FROM jobs")
+        return {row[0] for row in cur.fetchall()}
+
+    def reset_interrupted_jobs(self) -> int:
+        cur = self.conn.cursor()
+        cur.execute("UPDATE jobs SET state = ? WHERE state = ?", (JOB_PENDING_SEND, JOB_SENDING))
+        reset = cur.rowcount
+        cur.execute("UPDATE jobs SET state = ? WHERE state = ?", (JOB_PENDING_GENERATION, JOB_GENERATING))
+        reset += cur.rowcount
+        # Jobs claimed for a batch whose upload never finished.
+        cur.execute(
+            """
+            UPDATE jobs SET state = ?, batch_id = NULL
+            WHERE state = ? AND batch_id NOT IN (SELECT id FROM ai_batches)
+            """,
+            (JOB_PENDING_GENERATION, JOB_BATCHED),
+        )
+        reset += cur.rowcount
+        self._commit()
+        return reset
+
+    def count_jobs(self, state: str) -> int:
+        cur = self.conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM jobs WHERE state = ?", (state,))
+        return int(cur.fetchone()[0])
+
+    def assign_jobs_to_batch(self, uuids: Sequence[str], batch_id: str) -> int:
+        # Only jobs still waiting for generation move over; anything the live
+        # pipeline already picked up stays with it.
+        now = datetime.now().isoformat(timespec="seconds")
+        cur = self.conn.cursor()
+        assigned = 0
+        for start in range(0, len(uuids), _IN_CHUNK_SIZE):
+            chunk = list(uuids[start:start + _IN_CHUNK_SIZE])
+            placeholders = ", ".join("?" for _ in chunk)
+            cur.execute(
+                f"""
+                UPDATE jobs SET state = ?, batch_id = ?, updated_at = ?
+                WHERE state = ? AND review_uuid IN ({placeholders})
+                """,
+                [JOB_BATCHED, batch_id, now, JOB_PENDING_GENERATION] + chunk,
+            )
+            assigned += cur.rowcount
+        self._commit()
+        return assigned
+
+    def list_batch_jobs(self, batch_id: str) -> List[Dict[str, Any]]:
+        cur = self.conn.cursor()
+        cur.execute("SELECT * FROM jobs WHERE state = ? AND batch_id = ?", (JOB_BATCHED, batch_id))
+        return [dict(row) for row in cur.fetchall()]
+
+    def rename_batch_jobs(self, batch_id: str, new_batch_id: str) -> int:
+        cur = self.conn.cursor()
+        cur.execute(
+            "UPDATE jobs SET batch_id = ?, updated_at = ? WHERE state = ? AND batch_id = ?",
+            (new_batch_id, datetime.now().isoformat(timespec="seconds"), JOB_BATCHED, batch_id),
+        )
+        self._commit()
+        return cur.rowcount
+
+    def release_batch_jobs(self, batch_id: str) -> int:
+        cur = self.conn.cursor()
+        cur.execute(
+            "UPDATE jobs SET state = ?, batch_id = NULL, updated_at = ? WHERE state = ? AND batch_id = ?",
+            (JOB_PENDING_GENERATION, datetime.now().isoformat(timespec="seconds"), JOB_BATCHED, batch_id),
+        )
+        self._commit()
+        return cur.rowcount
+
+    def save_batch(self, batch_id: str, **fields: Any) -> None:
+        unknown = set(fields) - set(_BATCH_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown batch fields: {', '.join(sorted(unknown))}")
+        now = datetime.now().isoformat(timespec="seconds")
+        cur = self.conn.cursor()
+        cur.execute(
+            "INSERT OR IGNORE INTO ai_batches (id, created_at, updated_at) VALUES (?, ?, ?)",
+            (batch_id, now, now),
+        )
+        fields["updated_at"] = now
+        cur.execute(
+            f"UPDATE ai_batches SET {', '.join(f'{name} = ?' for name in fields)} WHERE id = ?",
+            list(fields.values()) + [batch_id],
+        )
+        self._commit()
+
+    def mark_batch_ingested(self, batch_id: str) -> None:
+        cur = self.conn.cursor()
+        cur.execute(
+            "UPDATE ai_batches SET ingested_at = ? WHERE id = ?",
+            (datetime.now().isoformat(timespec="seconds"), batch_id),
+        )
+        self._commit()
+
+    def list_open_batches(self) -> List[Dict[str, Any]]:
+        cur = self.conn.cursor()
+        cur.execute("SELECT * FROM ai_batches WHERE ingested_at IS NULL ORDER BY created_at")
+        return [dict(row) for row in cur.fetchall()]
+
+    def count_jobs_by_state(self) -> Dict[str, int]:
+        cur = self.conn.cursor()
+        cur.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state")
+        return {row[0]: int(row[1]) for row in cur.fetchall()}
+
     def list_examples(self) -> List[Dict[str, Any]]:
         cur = self.conn.cursor()
         cur.execute("SELECT * FROM ai_examples ORDER BY id DESC")
@@ -362,16 +1007,16 @@ class Database:
                 f"INSERT INTO ai_examples ({', '.join(fields)}) VALUES ({placeholders})",
                 values,
             )
-            self.conn.commit()
+            self._commit()
             return int(cur.lastrowid)
         cur.execute(
             f"UPDATE ai_examples SET {', '.join(f'{field} = ?' for field in fields)} WHERE id = ?",
             values + [example_id],
         )
-        self.conn.commit()
+        self._commit()
         return example_id
 
     def delete_example(self, example_id: int) -> None:
         cur = self.conn.cursor()
         cur.execute("DELETE FROM ai_examples WHERE id = ?", (example_id,))
-        self.conn.commit()
+        self._commit()
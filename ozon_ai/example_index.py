@@ -0,0 +1,140 @@
+import math
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List
+
+from .similarity import normalize_text
+
+if TYPE_CHECKING:
+    from .db import Database
+
+
+DEFAULT_TOP_K = 3
+BM25_K1 = 1.5
+BM25_B = 0.75
+_STEM_LENGTH = 5
+_WORD_RE = re.compile(r"\w{2,}", re.UNICODE)
+
+
+def _tokens(text: str) -> List[str]:
+    # Russian inflects heavily; cutting words to a short prefix is a crude
+    # stemmer, but it makes "наушники"/"наушников" and "доставка"/"доставку" meet.
+    words = _WORD_RE.findall(normalize_text(text).replace("ё", "е"))
+    return [word[:_STEM_LENGTH] for word in words if not word.isdigit()]
+
+
+def _example_terms(example: Dict[str, Any]) -> List[str]:
+    return _tokens(" ".join(str(example.get(field) or "") for field in ("product_title", "brand_name", "text")))
+
+
+def _review_terms(review: Dict[str, Any]) -> List[str]:
+    product = review.get("product", {}) or {}
+    brand = (product.get("brand_info") or {}).get("name") or ""
+    return _tokens(" ".join((product.get("title") or "", brand, review.get("text") or "")))
+
+
+class ExampleIndex:
+    # BM25 over ai_examples (product title, brand and review text). Lookups
+    # stay within the review's rating, as before, but rank by relevance; the
+    # newest examples only fill the remaining slots when nothing matches.
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._examples: Dict[int, Dict[str, Any]] = {}
+        self._lengths: Dict[int, int] = {}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._examples)
+
+    def load(self, db: "Database") -> "ExampleIndex":
+        examples = db.list_examples()
+        with self._lock:
+            self._examples.clear()
+            self._lengths.clear()
+            self._postings.clear()
+            self._total_length = 0
+            for example in examples:
+                self._add(example)
+        return self
+
+    def upsert(self, example: Dict[str, Any]) -> None:
+        with self._lock:
+            self._remove(int(example["id"]))
+            self._add(example)
+
+    def remove(self, example_id: int) -> None:
+        with self._lock:
+            self._remove(int(example_id))
+
+    def top_k(self, review: Dict[str, Any], k: int = DEFAULT_TOP_K) -> List[Dict[str, Any]]:
+        rating = int(review.get("rating") or 0)
+        terms = set(_review_terms(review))
+        with self._lock:
+            count = len(self._examples)
+            if not count:
+                return []
+            avg_length = self._total_length / count
+            scores: Dict[int, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for example_id, freq in postings.items():
+                    if int(self._examples[example_id].get("rating") or 0) != rating:
+                        continue
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[example_id] / avg_length)
+                    scores[example_id] = scores.get(example_id, 0.0) + idf * freq * (BM25_K1 + 1) / (freq + norm)
+            ranked = sorted(scores, key=lambda example_id: (-scores[example_id], -example_id))[:k]
+            if len(ranked) < k:
+                newest = sorted(
+                    (
+                        example_id
+                        for example_id, example in self._examples.items()
+                        if int(example.get("rating") or 0) == rating and example_id not in scores
+                    ),
+                    reverse=True,
+                )
+                ranked.extend(newest[:k - len(ranked)])
+            return [self._examples[example_id] for example_id in ranked]
+
+    def _add(self, example: Dict[str, Any]) -> None:
+        example_id = int(example["id"])
+        terms = _example_terms(example)
+        self._examples[example_id] = dict(example)
+        self._lengths[example_id] = len(terms)
+        self._total_length += len(terms)
+        for term, freq in Counter(terms).items():
+            self._postings.setdefault(term, {})[example_id] = freq
+
+    def _remove(self, example_id: int) -> None:
+        example = self._examples.pop(example_id, None)
+        if example is None:
+            return
+        self._total_length -= self._lengths.pop(example_id, 0)
+        for term in set(_example_terms(example)):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(example_id, None)
+                if not postings:
+                    del self._postings[term]
+
+
+_indexes: Dict[str, ExampleIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_example_index(db: "Database") -> ExampleIndex:
+    # One index per database file, shared by the examples tab and the pipeline,
+    # built on first use and kept current through upsert/remove afterwards.
+    key = str(Path(db.path).resolve())
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            return index
+        index = ExampleIndex().load(db)
+        _indexes[key] = index
+        return index
@@ -1,60 +1,168 @@
+import argparse
 import base64
 import json
 import logging
+import re
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional
 
 
 REVIEW_LIST_URL = "https://seller.ozon.ru/api/v4/review/list"
+DEFAULT_CHUNK_SIZE = 1 << 20
+_ENTRIES_RE = re.compile(r'"entries"\s*:\s*\[')
+
+
+def iter_har_entries(har_path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    # Memory stays bounded by the largest single entry rather than the file size.
+    decoder = json.JSONDecoder()
+    with har_path.open("r", encoding="utf-8", errors="replace") as fh:
+        buffer = ""
+        while True:
+            match = _ENTRIES_RE.search(buffer)
+            if match:
+                buffer = buffer[match.end():]
+                break
+            chunk = fh.read(chunk_size)
+            if not chunk:
+                return
+            buffer = buffer[-64:] + chunk
+
+        pos = 0
+        eof = False
+        while True:
+            while True:
+                while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    break
+                chunk = fh.read(chunk_size)
+                eof = not chunk
+                buffer, pos = buffer[pos:] + chunk, 0
+            if pos >= len(buffer) or buffer[pos] == "]":
+                return
+            try:
+                entry, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = fh.read(max(chunk_size, len(buffer) - pos))
+                eof = not chunk
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+            pos = end
+            if pos >= chunk_size:
+                buffer, pos = buffer[pos:], 0
+            if isinstance(entry, dict):
+                yield entry
+
+
+def _entry_reviews(entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+    request = entry.get("request", {})
+    url = request.get("url")
+    if not url or not url.startswith(REVIEW_LIST_URL):
+        return []
+    response = entry.get("response", {})
+    if response.get("status") and response.get("status") >= 400:
+        return []
+    content = response.get("content", {})
+    text = content.get("text")
+    if not text:
+        return []
+    if content.get("encoding") == "base64":
+        try:
+            text = base64.b64decode(text).decode("utf-8", errors="ignore")
+        except Exception:
+            logging.getLogger(__name__).exception("Failed to decode base64 HAR payload")
+            return []
+    try:
+        payload = json.loads(text)
+    except Exception:
+        logging.getLogger(__name__).exception("Failed to parse HAR JSON payload")
+        return []
+
+    result = payload.get("result") if isinstance(payload, dict) else None
+    if not isinstance(result, list):
+        return []
+    return [review for review in result if isinstance(review, dict) and review.get("uuid")]
+
+
+def iter_reviews_from_har(har_path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    for entry in iter_har_entries(har_path, chunk_size=chunk_size):
+        reviews = _entry_reviews(entry)
+        if reviews:
+            yield reviews
 
 
 def load_reviews_from_har(har_path: Path) -> List[Dict[str, Any]]:
     if not har_path.exists():
         return []
 
+    reviews: Dict[str, Dict[str, Any]] = {}
     try:
-        har_data = json.loads(har_path.read_text(encoding="utf-8"))
+        for page in iter_reviews_from_har(har_path):
+            for review in page:
+                reviews[review["uuid"]] = review
     except Exception:
         logging.getLogger(__name__).exception("Failed to read HAR: %s", har_path)
-        return []
+    return list(reviews.values())
 
-    entries = har_data.get("log", {}).get("entries", [])
-    if not isinstance(entries, list):
-        return []
 
-    reviews: Dict[str, Dict[str, Any]] = {}
-    for entry in entries:
-        request = entry.get("request", {})
-        url = request.get("url")
-        if not url or not url.startswith(REVIEW_LIST_URL):
-            continue
-        response = entry.get("response", {})
-        if response.get("status") and response.get("status") >= 400:
-            continue
-        content = response.get("content", {})
-        text = content.get("text")
-        if not text:
-            continue
-        if content.get("encoding") == "base64":
-            try:
-                text = base64.b64decode(text).decode("utf-8", errors="ignore")
-            except Exception:
-                logging.getLogger(__name__).exception("Failed to decode base64 HAR payload")
-                continue
-        try:
-            payload = json.loads(text)
-        except Exception:
-            logging.getLogger(__name__).exception("Failed to parse HAR JSON payload")
-            continue
-
-        result = payload.get("result")
-        if not isinstance(result, list):
-            continue
-        for review in result:
-            if not isinstance(review, dict):
-                continue
-            uuid = review.get("uuid")
-            if uuid:
-                reviews[uuid] = review
+def import_reviews_from_har(
+    db_path: Path,
+    har_path: Path,
+    *,
+    account_id: Optional[int] = None,
+    status: str = "new",
+    batch_size: int = 500,
+) -> int:
+    from .db import Database
 
-    return list(reviews.values())
+    db = Database(str(db_path))
+    try:
+        db.ensure_schema()
+        imported = 0
+        batch: Dict[str, Dict[str, Any]] = {}
+        with db.transaction():
+            for page in iter_reviews_from_har(har_path):
+                for review in page:
+                    batch[review["uuid"]] = review
+                if len(batch) >= batch_size:
+                    imported += db.upsert_reviews(batch.values(), status=status, account_id=account_id)
+                    batch.clear()
+            if batch:
+                imported += db.upsert_reviews(batch.values(), status=status, account_id=account_id)
+        return imported
+    finally:
+        db.close()
+
+
+def main() -> None:
+    base_dir = Path(__file__).resolve().parent.parent
+    parser = argparse.ArgumentParser(description="Import Ozon reviews from a HAR export into ozon_ai.db")
+    parser.add_argument("har_path", help="Path to the HAR file")
+    parser.add_argument(
+        "--db-path",
+        default=str(base_dir / "ozon_ai.db"),
+        help="Path to sqlite database (default: ozon_ai.db in project root)",
+    )
+    parser.add_argument("--account-id", type=int, help="Account id to attach imported reviews to")
+    parser.add_argument("--status", default="new", help="Status for imported reviews (default: new)")
+    parser.add_argument("--batch-size", type=int, default=500, help="Reviews per executemany batch")
+    args = parser.parse_args()
+
+    har_path = Path(args.har_path)
+    if not har_path.exists():
+        raise SystemExit(f"HAR not found: {har_path}")
+
+    imported = import_reviews_from_har(
+        Path(args.db_path),
+        har_path,
+        account_id=args.account_id,
+        status=args.status,
+        batch_size=max(1, args.batch_size),
+    )
+    print(f"Imported: {imported}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import json
+import logging
+import threading
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .har_import import REVIEW_LIST_URL, iter_har_entries
+
+
+TEMPLATE_SUFFIX = ".template.json"
+_TEMPLATE_HEADER_NAMES = {
+    "accept",
+    "accept-language",
+    "content-type",
+    "origin",
+    "referer",
+    "user-agent",
+    "sec-ch-ua",
+    "sec-ch-ua-platform",
+    "sec-ch-ua-mobile",
+    "sec-fetch-site",
+    "sec-fetch-mode",
+    "sec-fetch-dest",
+    "dnt",
+    "pragma",
+    "cache-control",
+    "priority",
+}
+
+
+@dataclass(frozen=True)
+class ReviewTemplate:
+    headers: Dict[str, str] = field(default_factory=dict)
+    payload: Dict[str, Any] = field(default_factory=dict)
+    company_id: Optional[str] = None
+    user_agent: Optional[str] = None
+
+
+EMPTY_TEMPLATE = ReviewTemplate()
+
+
+def _file_signature(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _har_search_dirs(session_path: Path) -> List[Path]:
+    bases = [session_path.parent]
+    bases.extend(list(session_path.parents[:4]))
+    dirs: List[Path] = []
+    for base in bases:
+        dirs.append(base)
+        dirs.append(base / "data")
+    return dirs
+
+
+class HarDirectoryWatcher:
+    # Directory mtimes change when entries are added, removed or renamed, so a
+    # directory is only re-globbed after such a change.
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._listings: Dict[str, Tuple[int, List[Path]]] = {}
+
+    def har_files(self, directory: Path) -> List[Path]:
+        try:
+            dir_mtime = directory.stat().st_mtime_ns
+        except OSError:
+            with self._lock:
+                self._listings.pop(str(directory), None)
+            return []
+        key = str(directory)
+        with self._lock:
+            listing = self._listings.get(key)
+            if listing is not None and listing[0] == dir_mtime:
+                return listing[1]
+        files = sorted(directory.glob("*.har"))
+        with self._lock:
+            self._listings[key] = (dir_mtime, files)
+        return files
+
+    def latest_har(self, session_path: Path) -> Optional[Path]:
+        latest: Optional[Path] = None
+        latest_mtime = -1
+        seen: Set[str] = set()
+        for directory in _har_search_dirs(session_path):
+            for path in self.har_files(directory):
+                if str(path) in seen:
+                    continue
+                seen.add(str(path))
+                signature = _file_signature(path)
+                if signature and signature[0] > latest_mtime:
+                    latest, latest_mtime = path, signature[0]
+        return latest
+
+
+def _extract_template(entries: Iterable[Dict[str, Any]]) -> ReviewTemplate:
+    for entry in entries:
+        request = entry.get("request", {})
+        if request.get("url") != REVIEW_LIST_URL:
+            continue
+        headers: Dict[str, str] = {}
+        payload: Dict[str, Any] = {}
+        for header in request.get("headers", []):
+            name = header.get("name")
+            value = header.get("value")
+            if not name or value is None:
+                continue
+            lower_name = name.lower()
+            if lower_name.startswith("x-o3-") or lower_name in _TEMPLATE_HEADER_NAMES:
+                headers[name] = value
+        user_agent = headers.get("user-agent") or headers.get("User-Agent")
+        post_data = request.get("postData", {}) or {}
+        text = post_data.get("text")
+        if text:
+            try:
+                payload = json.loads(text)
+            except Exception:
+                logging.getLogger(__name__).exception("Failed to parse HAR payload")
+        if not isinstance(payload, dict):
+            payload = {}
+        company_id = (
+            payload.get("company_id")
+            or payload.get("companyId")
+            or headers.get("x-o3-company-id")
+            or headers.get("X-O3-Company-Id")
+        )
+        return ReviewTemplate(
+            headers=headers,
+            payload=payload,
+            company_id=str(company_id) if company_id else None,
+            user_agent=user_agent,
+        )
+    return EMPTY_TEMPLATE
+
+
+def _sidecar_path(har_path: Path) -> Path:
+    return har_path.with_name(har_path.name + TEMPLATE_SUFFIX)
+
+
+def _read_sidecar(har_path: Path, signature: Tuple[int, int]) -> Optional[ReviewTemplate]:
+    sidecar = _sidecar_path(har_path)
+    if not sidecar.exists():
+        return None
+    try:
+        data = json.loads(sidecar.read_text(encoding="utf-8"))
+    except Exception:
+        logging.getLogger(__name__).warning("Ignoring unreadable HAR template: %s", sidecar)
+        return None
+    if [data.get("har_mtime_ns"), data.get("har_size")] != list(signature):
+        return None
+    template = data.get("template") or {}
+    return ReviewTemplate(
+        headers=dict(template.get("headers") or {}),
+        payload=dict(template.get("payload") or {}),
+        company_id=template.get("company_id"),
+        user_agent=template.get("user_agent"),
+    )
+
+
+def _write_sidecar(har_path: Path, signature: Tuple[int, int], template: ReviewTemplate) -> None:
+    data = {"har_mtime_ns": signature[0], "har_size": signature[1], "template": asdict(template)}
+    try:
+        _sidecar_path(har_path).write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    except Exception:
+        logging.getLogger(__name__).warning("Failed to write HAR template for %s", har_path)
+
+
+class HarTemplateStore:
+    def __init__(self, watcher: Optional[HarDirectoryWatcher] = None) -> None:
+        self.watcher = watcher or HarDirectoryWatcher()
+        self._lock = threading.Lock()
+        self._templates: Dict[str, Tuple[Tuple[int, int], ReviewTemplate]] = {}
+
+    def template_for_har(self, har_path: Path) -> ReviewTemplate:
+        signature = _file_signature(har_path)
+        if signature is None:
+            return EMPTY_TEMPLATE
+        key = str(har_path)
+        with self._lock:
+            cached = self._templates.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        template = _read_sidecar(har_path, signature)
+        if template is None:
+            try:
+                template = _extract_template(iter_har_entries(har_path))
+            except Exception:
+                logging.getLogger(__name__).exception("Failed to read HAR: %s", har_path)
+                return EMPTY_TEMPLATE
+            _write_sidecar(har_path, signature, template)
+        with self._lock:
+            self._templates[key] = (signature, template)
+        return template
+
+    def template_for_session(self, session_path: Path) -> ReviewTemplate:
+        har_path = self.watcher.latest_har(session_path)
+        if har_path is None:
+            return EMPTY_TEMPLATE
+        return self.template_for_har(har_path)
+
+
+_store = HarTemplateStore()
+
+
+def load_review_template(session_path: Path) -> ReviewTemplate:
+    return _store.template_for_session(session_path)
@@ -49,21 +49,21 @@ def import_examples(db_path: Path, json_path: Path, replace: bool = False) -> in
 
     db = Database(str(db_path))
     try:
-        if replace:
-            cur = db.conn.cursor()
-            cur.execute("DELETE FROM ai_examples")
-            db.conn.commit()
-
         inserted = 0
-        for raw in examples:
-            if not isinstance(raw, dict):
-                continue
-            ok, data, error = _normalize_example(raw)
-            if not ok:
-                print(f"skip: {error}: {raw}")
-                continue
-            db.save_example(data)
-            inserted += 1
+        with db.transaction():
+            if replace:
+                cur = db.conn.cursor()
+                cur.execute("DELETE FROM ai_examples")
+
+            for raw in examples:
+                if not isinstance(raw, dict):
+                    continue
+                ok, data, error = _normalize_example(raw)
+                if not ok:
+                    print(f"skip: {error}: {raw}")
+                    continue
+                db.save_example(data)
+                inserted += 1
         return inserted
     finally:
         db.close()
@@ -10,6 +10,9 @@ from .com_runtime import initialize_main_thread
 from .app_paths import app_root, db_path as app_db_path
 from .db import Database
 from .logging_utils import setup_logging
+from .metrics import start_metrics_server, stop_metrics_server
+from .openai_client import close_openai_clients
+from .ozon_client import close_all_clients
 from .ui.dialogs import ApiKeyDialog
 from .ui.main_window import MainWindow
 from .ui.styles import APP_STYLESHEET
@@ -24,6 +27,28 @@ def ensure_defaults(db: Database) -> None:
         db.set_setting("auto_send_enabled", "0")
     if db.get_setting("send_interval") is None:
         db.set_setting("send_interval", "5")
+    if db.get_setting("send_global_limit") is None:
+        db.set_setting("send_global_limit", "0")
+    if db.get_setting("fetch_workers") is None:
+        db.set_setting("fetch_workers", "4")
+    if db.get_setting("generate_workers") is None:
+        db.set_setting("generate_workers", "2")
+    if db.get_setting("send_workers") is None:
+        db.set_setting("send_workers", "1")
+    if db.get_setting("openai_concurrency") is None:
+        db.set_setting("openai_concurrency", "4")
+    if db.get_setting("openai_rpm") is None:
+        db.set_setting("openai_rpm", "500")
+    if db.get_setting("openai_tpm") is None:
+        db.set_setting("openai_tpm", "200000")
+    if db.get_setting("batch_threshold") is None:
+        db.set_setting("batch_threshold", "0")
+    if db.get_setting("metrics_port") is None:
+        db.set_setting("metrics_port", "0")
+    if db.get_setting("human_delay_enabled") is None:
+        db.set_setting("human_delay_enabled", "1")
+    if db.get_setting("reply_cache_enabled") is None:
+        db.set_setting("reply_cache_enabled", "1")
     if db.get_setting("proxy_enabled") is None:
         db.set_setting("proxy_enabled", "0")
     if db.get_setting("proxy_type") is None:
@@ -72,9 +97,16 @@ def main() -> None:
         else:
             sys.exit(0)
 
+    metrics_port = int(db.get_setting("metrics_port") or 0)
+    if metrics_port:
+        start_metrics_server(metrics_port)
+
     window = MainWindow(db)
     window.show()
     app.exec()
+    stop_metrics_server()
+    close_all_clients()
+    close_openai_clients()
     db.close()
 
 
@@ -0,0 +1,218 @@
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from .proxy import ProxyConfig
+
+
+DEFAULT_POOL_SIZE = 8
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BACKOFF_BASE = 1.0
+DEFAULT_BACKOFF_MAX = 60.0
+RETRY_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+class OpenAIError(Exception):
+    def __init__(self, message: str, *, status: Optional[int] = None, body: str = "") -> None:
+        super().__init__(message)
+        self.status = status
+        self.body = body
+
+
+class _ConcurrencyLimit:
+    # A semaphore whose size can change while requests are in flight.
+    def __init__(self, limit: int) -> None:
+        self._condition = threading.Condition()
+        self._limit = max(1, int(limit))
+        self._active = 0
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    def set_limit(self, limit: int) -> None:
+        with self._condition:
+            self._limit = max(1, int(limit))
+            self._condition.notify_all()
+
+    def __enter__(self) -> "_ConcurrencyLimit":
+        with self._condition:
+            self._condition.wait_for(lambda: self._active < self._limit)
+            self._active += 1
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        with self._condition:
+            self._active -= 1
+            self._condition.notify()
+
+
+_concurrency = _ConcurrencyLimit(DEFAULT_CONCURRENCY)
+
+
+def set_openai_concurrency(limit: int) -> None:
+    _concurrency.set_limit(limit)
+
+
+def _retry_after_seconds(headers: Mapping[str, str]) -> Optional[float]:
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class OpenAIClient:
+    # One pooled requests.Session per base URL and proxy, so connections (and
+    # the TLS handshake through the proxy) are reused across generations.
+    def __init__(
+        self,
+        base_url: str,
+        *,
+        proxy_config: Optional[ProxyConfig] = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_base: float = DEFAULT_BACKOFF_BASE,
+        backoff_max: float = DEFAULT_BACKOFF_MAX,
+    ) -> None:
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size), max_retries=0)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        proxies = proxy_config.to_requests_proxies() if proxy_config else None
+        if proxies:
+            self._session.proxies.update(proxies)
+        self._logger = logging.getLogger(__name__)
+
+    @property
+    def session(self) -> Any:
+        # For requests to other hosts that must leave the same way, through
+        # the pool and proxy, without the OpenAI key or retries.
+        return self._session
+
+    def close(self) -> None:
+        self._session.close()
+
+    def post(self, path: str, api_key: str, payload: Dict[str, Any], *, timeout: float) -> Dict[str, Any]:
+        return self.request("POST", path, api_key, json_payload=payload, timeout=timeout)[0]
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        api_key: str,
+        *,
+        json_payload: Optional[Dict[str, Any]] = None,
+        timeout: float,
+        **kwargs: Any,
+    ) -> Tuple[Dict[str, Any], Mapping[str, str]]:
+        resp = self._perform(method, path, api_key, json_payload=json_payload, timeout=timeout, **kwargs)
+        try:
+            return resp.json(), resp.headers
+        except ValueError as exc:
+            raise OpenAIError("OpenAI returned invalid JSON", status=resp.status_code) from exc
+
+    def download(self, path: str, api_key: str, *, timeout: float) -> str:
+        # File contents (batch output) are JSONL rather than a JSON document.
+        return self._perform("GET", path, api_key, timeout=timeout).text
+
+    def _perform(
+        self,
+        method: str,
+        path: str,
+        api_key: str,
+        *,
+        json_payload: Optional[Dict[str, Any]] = None,
+        timeout: float,
+        **kwargs: Any,
+    ) -> Any:
+        import requests
+
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        headers = {"Authorization": f"Bearer {api_key}"}
+        headers.update(kwargs.pop("headers", {}) or {})
+        attempt = 0
+        while True:
+            with _concurrency:
+                try:
+                    resp = self._session.request(
+                        method,
+                        url,
+                        json=json_payload,
+                        headers=headers,
+                        timeout=timeout,
+                        **kwargs,
+                    )
+                except (requests.ConnectionError, requests.Timeout) as exc:
+                    error: OpenAIError = OpenAIError(f"OpenAI request failed: {exc}")
+                    retry_after = None
+                else:
+                    if resp.ok:
+                        return resp
+                    error = OpenAIError(
+                        f"OpenAI HTTP error: status={resp.status_code}",
+                        status=resp.status_code,
+                        body=resp.text,
+                    )
+                    if resp.status_code not in RETRY_STATUSES:
+                        raise error
+                    retry_after = _retry_after_seconds(resp.headers)
+            if attempt >= self.max_retries:
+                raise error
+            delay = retry_after
+            if delay is None:
+                delay = min(self.backoff_max, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.0)
+            self._logger.warning("%s; retrying in %.1fs (%s/%s)", error, delay, attempt + 1, self.max_retries)
+            time.sleep(delay)
+            attempt += 1
+
+
+_clients: Dict[Tuple[str, Optional[ProxyConfig]], OpenAIClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_openai_client(base_url: str, proxy_config: Optional[ProxyConfig] = None) -> OpenAIClient:
+    if proxy_config is not None and not proxy_config.enabled:
+        proxy_config = None
+    key = (base_url, proxy_config)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OpenAIClient(base_url, proxy_config=proxy_config)
+            _clients[key] = client
+        return client
+
+
+def close_openai_clients() -> None:
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
@@ -0,0 +1,218 @@
+import json
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .proxy import ProxyConfig
+from .session_cache import get_session_info
+
+
+class OzonClientError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class ApiResponse:
+    status: int
+    ok: bool
+    headers: Dict[str, str]
+    text: str
+
+    @property
+    def content_type(self) -> Optional[str]:
+        return self.headers.get("content-type") or self.headers.get("Content-Type")
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+
+class OzonApiClient:
+    # Playwright's sync API is bound to the thread that started it, so every
+    # driver call is executed on the client's own thread.
+    def __init__(self, session_path: Path, proxy_config: Optional[ProxyConfig] = None) -> None:
+        self.session_path = Path(session_path)
+        self._proxy_config = proxy_config
+        self._tasks: "queue.Queue[Optional[Tuple[Callable[[], Any], Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self._playwright = None
+        self._context = None
+        self._context_key: Optional[Tuple[Any, ...]] = None
+        self._logger = logging.getLogger(__name__)
+
+    @property
+    def is_open(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def open(self) -> None:
+        with self._lock:
+            if self._closed:
+                raise OzonClientError(f"Client for {self.session_path} is closed")
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run,
+                name=f"ozon-client-{self.session_path.stem}",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def set_proxy_config(self, proxy_config: Optional[ProxyConfig]) -> None:
+        self._proxy_config = proxy_config
+
+    def refresh(self) -> None:
+        self._call(self._dispose_context)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread and thread.is_alive():
+            self._tasks.put(None)
+            thread.join(timeout=10)
+
+    def post(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        *,
+        headers: Dict[str, str],
+        user_agent: Optional[str] = None,
+        timeout: int = 20,
+    ) -> ApiResponse:
+        return self._call(lambda: self._post(url, payload, headers, user_agent, timeout))
+
+    def _call(self, fn: Callable[[], Any]) -> Any:
+        self.open()
+        future: Future = Future()
+        self._tasks.put((fn, future))
+        return future.result()
+
+    def _run(self) -> None:
+        try:
+            while True:
+                task = self._tasks.get()
+                if task is None:
+                    break
+                fn, future = task
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(fn())
+                except BaseException as exc:
+                    future.set_exception(exc)
+        finally:
+            self._shutdown()
+
+    def _post(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        headers: Dict[str, str],
+        user_agent: Optional[str],
+        timeout: int,
+    ) -> ApiResponse:
+        try:
+            from playwright.sync_api import Error as PlaywrightError
+        except Exception as exc:
+            raise OzonClientError("Playwright not available") from exc
+
+        try:
+            context = self._ensure_context(user_agent)
+            response = context.post(url, data=json.dumps(payload), headers=headers, timeout=timeout * 1000)
+            try:
+                return ApiResponse(
+                    status=response.status,
+                    ok=response.ok,
+                    headers=dict(response.headers),
+                    text=response.text(),
+                )
+            finally:
+                response.dispose()
+        except PlaywrightError as exc:
+            self._shutdown()
+            raise OzonClientError(str(exc)) from exc
+
+    def _ensure_context(self, user_agent: Optional[str]):
+        session_info = get_session_info(self.session_path)
+        if session_info is None:
+            raise OzonClientError(f"Session file is missing or unreadable: {self.session_path}")
+        key = (session_info.signature, self._proxy_config, user_agent)
+        if self._context is not None and key == self._context_key:
+            return self._context
+        if self._context is not None:
+            self._logger.info("Session changed, rebuilding API context for %s", self.session_path)
+            self._dispose_context()
+        if self._playwright is None:
+            from playwright.sync_api import sync_playwright
+
+            self._playwright = sync_playwright().start()
+        proxy = self._proxy_config.to_playwright_proxy() if self._proxy_config else None
+        self._context = self._playwright.request.new_context(
+            storage_state=session_info.storage_state,
+            user_agent=user_agent,
+            proxy=proxy,
+        )
+        self._context_key = key
+        return self._context
+
+    def _dispose_context(self) -> None:
+        context, self._context, self._context_key = self._context, None, None
+        if context is None:
+            return
+        try:
+            context.dispose()
+        except Exception:
+            self._logger.exception("Failed to dispose API context for %s", self.session_path)
+
+    def _shutdown(self) -> None:
+        self._dispose_context()
+        playwright, self._playwright = self._playwright, None
+        if playwright is None:
+            return
+        try:
+            playwright.stop()
+        except Exception:
+            self._logger.exception("Failed to stop Playwright for %s", self.session_path)
+
+
+_clients: Dict[str, OzonApiClient] = {}
+_clients_lock = threading.Lock()
+
+
+def _client_key(session_path: Path) -> str:
+    return str(Path(session_path).resolve())
+
+
+def get_client(session_path: Path, proxy_config: Optional[ProxyConfig] = None) -> OzonApiClient:
+    key = _client_key(session_path)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OzonApiClient(Path(session_path), proxy_config)
+            _clients[key] = client
+        else:
+            client.set_proxy_config(proxy_config)
+    return client
+
+
+def close_client(session_path: Path) -> None:
+    with _clients_lock:
+        client = _clients.pop(_client_key(session_path), None)
+    if client:
+        client.close()
+
+
+def close_all_clients() -> None:
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
@@ -1,80 +1,112 @@
-import json
 import logging
-import threading
+import random
 import time
+from concurrent.futures import Future
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Optional, Tuple
 
+from .har_templates import load_review_template
+from .metrics import counter, histogram
+from .ozon_client import OzonClientError, get_client
 from .ozon_reviews import (
+    _OZON_REQUEST_SECONDS,
+    _OZON_REQUESTS,
+    OZON_SELLER_BASE_URL,
     _build_headers,
-    _extract_company_id,
-    _find_latest_har,
     _is_auth_failure,
-    _mark_session_needs_relogin,
-    _load_review_template,
-    _load_storage_state,
-    _clear_session_needs_relogin,
 )
 from .proxy import ProxyConfig
+from .send_dispatcher import get_send_dispatcher
+from .session_cache import _clear_session_needs_relogin, _mark_session_needs_relogin, get_session_info
 
 
-REVIEW_COMMENT_URL = "https://seller.ozon.ru/api/review/comment/create"
+REVIEW_COMMENT_URL = f"{OZON_SELLER_BASE_URL}/api/review/comment/create"
 
+_SEND_SECONDS = histogram("ozonai_send_seconds", "Time to post one reply, session lookup included", ("account",))
+_SENDS = counter("ozonai_sends_total", "Replies posted, by outcome", ("account", "result"))
 
-class _SendRateLimiter:
-    def __init__(self) -> None:
-        self._lock = threading.Lock()
-        self._next_time = 0.0
 
-    def throttle(self, interval: int) -> None:
-        delay = max(0, int(interval))
-        if delay <= 0:
-            return
-        with self._lock:
-            now = time.monotonic()
-            if now < self._next_time:
-                time.sleep(self._next_time - now)
-            self._next_time = time.monotonic() + delay
+def _send_spacing(interval: float, human_delay: Tuple[int, int]) -> float:
+    # Sends are spaced by at least ``interval``; the optional human-like
+    # pause draws a random gap from ``human_delay`` on top of that floor.
+    delay = max(0.0, float(interval))
+    low = max(0, int(human_delay[0]))
+    high = max(low, int(human_delay[1]))
+    if high:
+        delay = max(delay, random.uniform(low, high))
+    return delay
 
 
-_rate_limiter = _SendRateLimiter()
+def _account_key(session_path: Path) -> str:
+    # Ozon limits replies per seller, so sessions of one company share a queue.
+    session_info = get_session_info(session_path)
+    if session_info and session_info.company_id:
+        return f"company:{session_info.company_id}"
+    return f"session:{Path(session_path).resolve()}"
 
 
-def send_review_comment(
+def set_send_ceiling(per_minute: int) -> None:
+    get_send_dispatcher().set_global_limit(per_minute)
+
+
+def submit_review_comment(
     session_path: Path,
     review_uuid: str,
     text: str,
     *,
     timeout: int = 20,
-    throttle_interval: int = 0,
+    interval: float = 0,
+    human_delay: Tuple[int, int] = (0, 0),
     proxy_config: Optional[ProxyConfig] = None,
-) -> bool:
-    if not session_path.exists() or not review_uuid or not text:
-        return False
+) -> "Future[bool]":
+    # Queues the reply on its account's send queue; manual and automatic
+    # sends share the queues, so both respect the same per-account spacing.
+    return get_send_dispatcher().submit(
+        _account_key(session_path),
+        lambda: send_review_comment(session_path, review_uuid, text, timeout=timeout, proxy_config=proxy_config),
+        interval=_send_spacing(interval, human_delay),
+    )
 
-    storage_state = _load_storage_state(session_path)
-    if not storage_state:
-        return False
 
-    company_id = _extract_company_id(storage_state)
-    template_headers: Dict[str, str] = {}
-    template_payload: Dict[str, Any] = {}
-    template_company_id: Optional[str] = None
-    template_user_agent: Optional[str] = None
+def send_review_comment(
+    session_path: Path,
+    review_uuid: str,
+    text: str,
+    *,
+    timeout: int = 20,
+    proxy_config: Optional[ProxyConfig] = None,
+) -> bool:
+    started = time.perf_counter()
+    result, company_id = _post_comment(session_path, review_uuid, text, timeout, proxy_config)
+    account = company_id or "unknown"
+    _SEND_SECONDS.observe(time.perf_counter() - started, account=account)
+    _SENDS.inc(account=account, result=result)
+    return result == "ok"
 
-    har_path = _find_latest_har(session_path)
-    if har_path:
-        template_headers, template_payload, template_company_id, template_user_agent = _load_review_template(har_path)
 
-    company_id = company_id or template_company_id
+def _post_comment(
+    session_path: Path,
+    review_uuid: str,
+    text: str,
+    timeout: int,
+    proxy_config: Optional[ProxyConfig],
+) -> Tuple[str, Optional[str]]:
+    # Returns the outcome ("ok" or why not) and the company the reply was for.
+    if not review_uuid or not text:
+        return "invalid", None
+
+    session_info = get_session_info(session_path)
+    if not session_info:
+        return "no_session", None
+
+    template = load_review_template(session_path)
+    company_id = session_info.company_id or template.company_id
     if not company_id:
         logging.getLogger(__name__).warning("Missing company id for comment request (%s)", session_path)
-        return False
+        return "no_company", None
 
-    headers, user_agent = _build_headers(company_id, template_headers, template_user_agent)
-    company_type = "seller"
-    if isinstance(template_payload, dict):
-        company_type = str(template_payload.get("company_type") or template_payload.get("companyType") or company_type)
+    headers, user_agent = _build_headers(company_id, template.headers, template.user_agent)
+    company_type = str(template.payload.get("company_type") or template.payload.get("companyType") or "seller")
 
     payload = {
         "company_id": company_id,
@@ -84,59 +116,46 @@ def send_review_comment(
     }
 
     try:
-        from playwright.sync_api import Error as PlaywrightError
-        from playwright.sync_api import sync_playwright
-    except Exception:
-        logging.getLogger(__name__).exception("Playwright not available")
-        return False
-
-    if throttle_interval > 0:
-        _rate_limiter.throttle(throttle_interval)
-
-    try:
-        with sync_playwright() as playwright:
-            proxy = proxy_config.to_playwright_proxy() if proxy_config else None
-            request_context = playwright.request.new_context(
-                storage_state=str(session_path),
-                extra_http_headers=headers,
+        with _OZON_REQUEST_SECONDS.time(endpoint="comment_create"):
+            response = get_client(session_path, proxy_config).post(
+                REVIEW_COMMENT_URL,
+                payload,
+                headers=headers,
                 user_agent=user_agent,
-                proxy=proxy,
+                timeout=timeout,
             )
-            try:
-                response = request_context.post(
-                    REVIEW_COMMENT_URL,
-                    data=json.dumps(payload),
-                    timeout=timeout * 1000,
-                )
-                content_type = response.headers.get("content-type") or response.headers.get("Content-Type")
-                body_text: Optional[str] = None
-                if not response.ok:
-                    body_text = response.text()
-                    if _is_auth_failure(response.status, body_text, content_type):
-                        _mark_session_needs_relogin(session_path, f"comment_status={response.status}")
-                    logging.getLogger(__name__).warning(
-                        "Comment request failed: status=%s body=%s",
-                        response.status,
-                        body_text,
-                    )
-                    return False
-                try:
-                    payload = response.json()
-                except Exception:
-                    body_text = body_text or response.text()
-                    if _is_auth_failure(response.status, body_text, content_type):
-                        _mark_session_needs_relogin(session_path, "comment_invalid_json_html")
-                        return False
-                    return True
-                if isinstance(payload, dict) and payload.get("error"):
-                    logging.getLogger(__name__).warning("Comment request error: %s", payload.get("error"))
-                    return False
-                _clear_session_needs_relogin(session_path)
-                return True
-            finally:
-                request_context.dispose()
-    except PlaywrightError as exc:
+    except OzonClientError as exc:
         logging.getLogger(__name__).warning("Playwright comment request failed: %s", exc)
+        return _request_result("client_error"), company_id
     except Exception:
         logging.getLogger(__name__).exception("Failed to send comment via Playwright")
-    return False
+        return _request_result("client_error"), company_id
+
+    if not response.ok:
+        result = "http_error"
+        if _is_auth_failure(response.status, response.text, response.content_type):
+            result = "auth_failure"
+            _mark_session_needs_relogin(session_path, f"comment_status={response.status}")
+        logging.getLogger(__name__).warning(
+            "Comment request failed: status=%s body=%s",
+            response.status,
+            response.text,
+        )
+        return _request_result(result), company_id
+    try:
+        result = response.json()
+    except Exception:
+        if _is_auth_failure(response.status, response.text, response.content_type):
+            _mark_session_needs_relogin(session_path, "comment_invalid_json_html")
+            return _request_result("auth_failure"), company_id
+        return _request_result("ok"), company_id
+    if isinstance(result, dict) and result.get("error"):
+        logging.getLogger(__name__).warning("Comment request error: %s", result.get("error"))
+        return _request_result("rejected"), company_id
+    _clear_session_needs_relogin(session_path)
+    return _request_result("ok"), company_id
+
+
+def _request_result(result: str) -> str:
+    _OZON_REQUESTS.inc(endpoint="comment_create", result=result)
+    return result
@@ -1,15 +1,31 @@
-import json
 import logging
+import os
 import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
 from .browser_profile import USER_AGENT
+from .har_templates import load_review_template
+from .metrics import COUNT_BUCKETS, counter, histogram
+from .ozon_client import OzonClientError, get_client
 from .proxy import ProxyConfig
+from .session_cache import (
+    _clear_session_needs_relogin,
+    _mark_session_needs_relogin,
+    get_session_info,
+)
 
 
-REVIEW_LIST_URL = "https://seller.ozon.ru/api/v4/review/list"
+# OZON_SELLER_BASE_URL points the API calls elsewhere, e.g. at benchmarks/mock_ozon_server.py.
+OZON_SELLER_BASE_URL = (os.environ.get("OZON_SELLER_BASE_URL") or "https://seller.ozon.ru").rstrip("/")
+REVIEW_LIST_URL = f"{OZON_SELLER_BASE_URL}/api/v4/review/list"
 DEFAULT_FILTER = {"published_at": {}, "interaction_status": ["NOT_VIEWED"]}
+MAX_PAGES = 100
+# Reviews can show up in the list slightly after their published_at, so the
+# cursor filter reaches back a little and relies on uuid dedupe for the overlap.
+CURSOR_OVERLAP = timedelta(minutes=10)
 DEFAULT_HEADERS = {
     "Accept": "application/json, text/plain, */*",
     "Accept-Language": "ru",
@@ -22,25 +38,67 @@ DEFAULT_XO3_HEADERS = {
     "x-o3-language": "ru",
     "x-o3-page-type": "review",
 }
-AUTH_MARKER_SUFFIX = ".relogin"
 
+_FETCH_SECONDS = histogram("ozonai_fetch_seconds", "Time to fetch new reviews for one account", ("account",))
+_FETCH_PAGES = histogram(
+    "ozonai_fetch_pages",
+    "Review list pages read per poll of one account",
+    ("account",),
+    COUNT_BUCKETS,
+)
+_REVIEWS_FETCHED = counter("ozonai_reviews_fetched_total", "Reviews returned by the review list", ("account",))
+# Shared with ozon_comments, labelled by endpoint.
+_OZON_REQUEST_SECONDS = histogram("ozonai_ozon_request_seconds", "Latency of seller API requests", ("endpoint",))
+_OZON_REQUESTS = counter("ozonai_ozon_requests_total", "Seller API requests by outcome", ("endpoint", "result"))
+
+
+@dataclass
+class ReviewFetch:
+    reviews: List[Dict[str, Any]] = field(default_factory=list)
+    complete: bool = False
+    pages: int = 0
+
+    def newest(self) -> Optional[Dict[str, Any]]:
+        newest: Optional[Dict[str, Any]] = None
+        newest_at: Optional[datetime] = None
+        for review in self.reviews:
+            published_at = _parse_published_at(review.get("published_at"))
+            if published_at and (newest_at is None or published_at > newest_at):
+                newest, newest_at = review, published_at
+        return newest
+
+
+def _parse_published_at(value: Any) -> Optional[datetime]:
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
 
-def _auth_marker_path(session_path: Path) -> Path:
-    return session_path.with_suffix(session_path.suffix + AUTH_MARKER_SUFFIX)
 
+def _format_published_at(value: datetime) -> str:
+    return value.isoformat().replace("+00:00", "Z")
 
-def _mark_session_needs_relogin(session_path: Path, reason: str) -> None:
-    try:
-        _auth_marker_path(session_path).write_text(reason, encoding="utf-8")
-    except Exception:
-        logging.getLogger(__name__).exception("Failed to write relogin marker for %s", session_path)
 
+def _build_filter(template_filter: Any, since: Optional[datetime]) -> Dict[str, Any]:
+    filter_payload = dict(template_filter if isinstance(template_filter, dict) else DEFAULT_FILTER)
+    if since is not None:
+        published_at = dict(filter_payload.get("published_at") or {})
+        published_at["from"] = _format_published_at(since - CURSOR_OVERLAP)
+        filter_payload["published_at"] = published_at
+    return filter_payload
 
-def _clear_session_needs_relogin(session_path: Path) -> None:
-    try:
-        _auth_marker_path(session_path).unlink(missing_ok=True)
-    except Exception:
-        logging.getLogger(__name__).exception("Failed to remove relogin marker for %s", session_path)
+
+def _reached_cursor(page_reviews: List[Any], since: Optional[datetime], since_uuid: Optional[str]) -> bool:
+    if since is None:
+        return False
+    for review in page_reviews:
+        if isinstance(review, dict) and since_uuid and review.get("uuid") == since_uuid:
+            return True
+    oldest = page_reviews[-1] if page_reviews else None
+    published_at = _parse_published_at(oldest.get("published_at")) if isinstance(oldest, dict) else None
+    return published_at is not None and published_at <= since
 
 
 def _looks_like_html(text: str) -> bool:
@@ -60,141 +118,6 @@ def _is_auth_failure(status: int, body: Optional[str], content_type: Optional[st
     return False
 
 
-def _session_needs_relogin(session_path: Path, storage_state: Optional[Dict[str, Any]] = None) -> bool:
-    if _auth_marker_path(session_path).exists():
-        return True
-    if storage_state is None:
-        storage_state = _load_storage_state(session_path) or {}
-    cookies = storage_state.get("cookies") or []
-    token_names = {"__Secure-access-token", "__Secure-refresh-token"}
-    now = time.time()
-    found_token = False
-    for cookie in cookies:
-        if cookie.get("name") not in token_names:
-            continue
-        found_token = True
-        expires = cookie.get("expires")
-        try:
-            expires_value = float(expires)
-        except (TypeError, ValueError):
-            continue
-        if expires_value > 0 and expires_value < now:
-            return True
-    return not found_token
-
-
-def _load_storage_state(session_path: Path) -> Optional[Dict[str, Any]]:
-    try:
-        return json.loads(session_path.read_text(encoding="utf-8"))
-    except Exception:
-        logging.getLogger(__name__).exception("Failed to read session: %s", session_path)
-        return None
-
-
-def _extract_company_id(storage_state: Dict[str, Any]) -> Optional[str]:
-    cookies = storage_state.get("cookies") or []
-    for cookie in cookies:
-        if cookie.get("name") == "sc_company_id" and cookie.get("value"):
-            return str(cookie["value"])
-
-    origins = storage_state.get("origins") or []
-    for origin in origins:
-        if origin.get("origin") != "https://seller.ozon.ru":
-            continue
-        for item in origin.get("localStorage") or []:
-            if item.get("name") != "vuex":
-                continue
-            try:
-                payload = json.loads(item.get("value") or "{}")
-            except Exception:
-                continue
-            user = payload.get("user") or {}
-            content_id = user.get("contentId") or user.get("content_id")
-            if content_id:
-                return str(content_id)
-            company = payload.get("company") or {}
-            content_id = company.get("contentId") or company.get("content_id")
-            if content_id:
-                return str(content_id)
-    return None
-
-
-def _find_latest_har(session_path: Path) -> Optional[Path]:
-    candidates: List[Path] = []
-    bases = [session_path.parent]
-    bases.extend(list(session_path.parents[:4]))
-    for base in bases:
-        if base.exists():
-            candidates.extend(base.glob("*.har"))
-            har_dir = base / "data"
-            if har_dir.exists():
-                candidates.extend(har_dir.glob("*.har"))
-    if not candidates:
-        return None
-    return max(candidates, key=lambda p: p.stat().st_mtime)
-
-
-def _load_review_template(har_path: Path) -> Tuple[Dict[str, str], Dict[str, Any], Optional[str], Optional[str]]:
-    headers: Dict[str, str] = {}
-    payload: Dict[str, Any] = {}
-    company_id: Optional[str] = None
-    user_agent: Optional[str] = None
-
-    try:
-        har_data = json.loads(har_path.read_text(encoding="utf-8"))
-    except Exception:
-        logging.getLogger(__name__).exception("Failed to read HAR: %s", har_path)
-        return headers, payload, company_id, user_agent
-
-    entries = har_data.get("log", {}).get("entries", [])
-    for entry in entries:
-        request = entry.get("request", {})
-        if request.get("url") != REVIEW_LIST_URL:
-            continue
-        for header in request.get("headers", []):
-            name = header.get("name")
-            value = header.get("value")
-            if not name or value is None:
-                continue
-            lower_name = name.lower()
-            if lower_name.startswith("x-o3-") or lower_name in {
-                "accept",
-                "accept-language",
-                "content-type",
-                "origin",
-                "referer",
-                "user-agent",
-                "sec-ch-ua",
-                "sec-ch-ua-platform",
-                "sec-ch-ua-mobile",
-                "sec-fetch-site",
-                "sec-fetch-mode",
-                "sec-fetch-dest",
-                "dnt",
-                "pragma",
-                "cache-control",
-                "priority",
-            }:
-                headers[name] = value
-        user_agent = headers.get("user-agent") or headers.get("User-Agent")
-        post_data = request.get("postData", {}) or {}
-        text = post_data.get("text")
-        if text:
-            try:
-                payload = json.loads(text)
-            except Exception:
-                logging.getLogger(__name__).exception("Failed to parse HAR payload")
-        company_id = (
-            payload.get("company_id")
-            or payload.get("companyId")
-            or headers.get("x-o3-company-id")
-            or headers.get("X-O3-Company-Id")
-        )
-        break
-
-    return headers, payload, str(company_id) if company_id else None, user_agent
-
-
 def _build_headers(
     company_id: str,
     template_headers: Dict[str, str],
@@ -254,105 +177,106 @@ def _extract_reviews_payload(payload: Dict[str, Any]) -> Tuple[List[Dict[str, An
     return reviews, has_next, last_review
 
 
-def fetch_all_new_reviews(
+def fetch_new_reviews(
     session_path: Path,
+    *,
+    since: Optional[str] = None,
+    since_uuid: Optional[str] = None,
     timeout: int = 20,
     proxy_config: Optional[ProxyConfig] = None,
-) -> List[Dict[str, Any]]:
-    if not session_path.exists():
-        return []
-
-    storage_state = _load_storage_state(session_path)
-    if not storage_state:
-        return []
-
-    company_id = _extract_company_id(storage_state)
-    template_headers: Dict[str, str] = {}
-    template_payload: Dict[str, Any] = {}
-    template_company_id: Optional[str] = None
-    template_user_agent: Optional[str] = None
-
-    har_path = _find_latest_har(session_path)
-    if har_path:
-        template_headers, template_payload, template_company_id, template_user_agent = _load_review_template(har_path)
-
-    company_id = company_id or template_company_id
+) -> ReviewFetch:
+    fetch = ReviewFetch()
+    started = time.perf_counter()
+    session_info = get_session_info(session_path)
+    if not session_info:
+        return fetch
+
+    template = load_review_template(session_path)
+    company_id = session_info.company_id or template.company_id
     if not company_id:
         logging.getLogger(__name__).warning("Missing company id in %s", session_path)
-        return []
+        return fetch
 
-    headers, user_agent = _build_headers(company_id, template_headers, template_user_agent)
-    filter_payload = template_payload.get("filter") if isinstance(template_payload, dict) else None
+    since_at = _parse_published_at(since)
+    headers, user_agent = _build_headers(company_id, template.headers, template.user_agent)
     base_payload: Dict[str, Any] = {
         "company_id": company_id,
-        "company_type": template_payload.get("company_type", "seller"),
-        "filter": filter_payload if isinstance(filter_payload, dict) else DEFAULT_FILTER,
+        "company_type": template.payload.get("company_type", "seller"),
+        "filter": _build_filter(template.payload.get("filter"), since_at),
     }
 
     reviews: Dict[str, Dict[str, Any]] = {}
     last_review: Optional[Dict[str, Any]] = None
 
     try:
-        from playwright.sync_api import Error as PlaywrightError
-        from playwright.sync_api import sync_playwright
-    except Exception:
-        logging.getLogger(__name__).exception("Playwright not available")
-        return []
-
-    try:
-        with sync_playwright() as playwright:
-            proxy = proxy_config.to_playwright_proxy() if proxy_config else None
-            request_context = playwright.request.new_context(
-                storage_state=str(session_path),
-                extra_http_headers=headers,
-                user_agent=user_agent,
-                proxy=proxy,
-            )
+        client = get_client(session_path, proxy_config)
+        for _ in range(MAX_PAGES):
+            payload = dict(base_payload)
+            if last_review:
+                payload["last_review"] = last_review
+            with _OZON_REQUEST_SECONDS.time(endpoint="review_list"):
+                response = client.post(
+                    REVIEW_LIST_URL,
+                    payload,
+                    headers=headers,
+                    user_agent=user_agent,
+                    timeout=timeout,
+                )
+            fetch.pages += 1
+            if not response.ok:
+                result = "http_error"
+                if _is_auth_failure(response.status, response.text, response.content_type):
+                    result = "auth_failure"
+                    _mark_session_needs_relogin(session_path, f"status={response.status}")
+                _OZON_REQUESTS.inc(endpoint="review_list", result=result)
+                logging.getLogger(__name__).warning(
+                    "Review request failed: status=%s body=%s",
+                    response.status,
+                    response.text,
+                )
+                break
             try:
-                for _ in range(100):
-                    payload = dict(base_payload)
-                    if last_review:
-                        payload["last_review"] = last_review
-                    response = request_context.post(
-                        REVIEW_LIST_URL,
-                        data=json.dumps(payload),
-                        timeout=timeout * 1000,
-                    )
-                    content_type = response.headers.get("content-type") or response.headers.get("Content-Type")
-                    body_text: Optional[str] = None
-                    if not response.ok:
-                        body_text = response.text()
-                        if _is_auth_failure(response.status, body_text, content_type):
-                            _mark_session_needs_relogin(session_path, f"status={response.status}")
-                        logging.getLogger(__name__).warning(
-                            "Review request failed: status=%s body=%s",
-                            response.status,
-                            body_text,
-                        )
-                        break
-                    try:
-                        page = response.json()
-                    except Exception:
-                        body_text = body_text or response.text()
-                        if _is_auth_failure(response.status, body_text, content_type):
-                            _mark_session_needs_relogin(session_path, "invalid_json_html")
-                        logging.getLogger(__name__).exception("Failed to parse review response JSON")
-                        break
-                    _clear_session_needs_relogin(session_path)
-                    page_reviews, has_next, last_review = _extract_reviews_payload(page)
-                    for review in page_reviews:
-                        if not isinstance(review, dict):
-                            continue
-                        uuid = review.get("uuid")
-                        if uuid:
-                            reviews[uuid] = review
-                    if not page_reviews or not has_next or not last_review:
-                        break
-            finally:
-                request_context.dispose()
-    except PlaywrightError as exc:
+                page = response.json()
+            except Exception:
+                result = "invalid_json"
+                if _is_auth_failure(response.status, response.text, response.content_type):
+                    result = "auth_failure"
+                    _mark_session_needs_relogin(session_path, "invalid_json_html")
+                _OZON_REQUESTS.inc(endpoint="review_list", result=result)
+                logging.getLogger(__name__).exception("Failed to parse review response JSON")
+                break
+            _OZON_REQUESTS.inc(endpoint="review_list", result="ok")
+            _clear_session_needs_relogin(session_path)
+            page_reviews, has_next, last_review = _extract_reviews_payload(page)
+            for review in page_reviews:
+                if not isinstance(review, dict):
+                    continue
+                uuid = review.get("uuid")
+                if uuid:
+                    reviews[uuid] = review
+            if not page_reviews or not has_next or not last_review:
+                fetch.complete = True
+                break
+            if _reached_cursor(page_reviews, since_at, since_uuid):
+                fetch.complete = True
+                break
+    except OzonClientError as exc:
+        _OZON_REQUESTS.inc(endpoint="review_list", result="client_error")
         logging.getLogger(__name__).warning("Playwright request failed: %s", exc)
     except Exception:
+        _OZON_REQUESTS.inc(endpoint="review_list", result="client_error")
         logging.getLogger(__name__).exception("Failed to fetch reviews via Playwright")
 
-    return list(reviews.values())
+    fetch.reviews = list(reviews.values())
+    _FETCH_SECONDS.observe(time.perf_counter() - started, account=company_id)
+    _FETCH_PAGES.observe(fetch.pages, account=company_id)
+    _REVIEWS_FETCHED.inc(len(fetch.reviews), account=company_id)
+    return fetch
+
+
+def fetch_all_new_reviews(
+    session_path: Path,
+    timeout: int = 20,
+    proxy_config: Optional[ProxyConfig] = None,
+) -> List[Dict[str, Any]]:
+    return fetch_new_reviews(session_path, timeout=timeout, proxy_config=proxy_config).reviews
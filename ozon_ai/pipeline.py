@@ -0,0 +1,722 @@
+import json
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .ai import generate_ai_response, get_openai_api_key
+from .example_index import ExampleIndex, get_example_index
+from .openai_client import DEFAULT_CONCURRENCY, set_openai_concurrency
+from .db import (
+    JOB_DONE,
+    JOB_FAILED,
+    JOB_GENERATING,
+    JOB_PENDING_GENERATION,
+    JOB_PENDING_SEND,
+    JOB_SENDING,
+    Database,
+)
+from .ozon_comments import set_send_ceiling, submit_review_comment
+from .ozon_reviews import ReviewFetch, _parse_published_at, fetch_new_reviews
+from .poll_scheduler import PollScheduler
+from .proxy import ProxyConfig
+from .rate_limit import DEFAULT_RPM, DEFAULT_TPM
+from .reply_cache import CachedReply, ReplyCache
+from .similarity import ReplySignature, SimilarityIndex, load_similarity_index
+
+
+DEFAULT_FETCH_WORKERS = 4
+DEFAULT_GENERATE_WORKERS = 2
+DEFAULT_SEND_WORKERS = 1
+DEFAULT_QUEUE_SIZE = 100
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BASE_DELAY = 30.0
+JOB_RETRY_MAX_DELAY = 3600.0
+BATCH_POLL_INTERVAL = 60.0
+_POLL_TIMEOUT = 0.5
+_WRITE_BATCH_SIZE = 200
+
+
+@dataclass(frozen=True)
+class PipelineSettings:
+    api_key: Optional[str]
+    min_interval: int
+    max_interval: int
+    send_interval: int
+    send_global_limit: int
+    human_delay_enabled: bool
+    reply_cache_enabled: bool
+    auto_send_enabled: bool
+    proxy_config: ProxyConfig
+    fetch_workers: int
+    generate_workers: int
+    send_workers: int
+    openai_concurrency: int
+    openai_rpm: int
+    openai_tpm: int
+    batch_threshold: int
+
+    @classmethod
+    def from_db(cls, db: Database) -> "PipelineSettings":
+        min_interval = int(db.get_setting("min_interval") or 10)
+        max_interval = max(min_interval, int(db.get_setting("max_interval") or 30))
+        proxy_config = ProxyConfig.from_db(db)
+        proxy_config.validate()
+        return cls(
+            api_key=get_openai_api_key() or db.get_setting("openai_api_key"),
+            min_interval=min_interval,
+            max_interval=max_interval,
+            send_interval=int(db.get_setting("send_interval") or 5),
+            send_global_limit=max(0, int(db.get_setting("send_global_limit") or 0)),
+            human_delay_enabled=(db.get_setting("human_delay_enabled") or "1").lower() in {"1", "true", "yes", "on"},
+            reply_cache_enabled=(db.get_setting("reply_cache_enabled") or "1").lower() in {"1", "true", "yes", "on"},
+            auto_send_enabled=(db.get_setting("auto_send_enabled") or "0").lower() in {"1", "true", "yes", "on"},
+            proxy_config=proxy_config,
+            fetch_workers=max(1, int(db.get_setting("fetch_workers") or DEFAULT_FETCH_WORKERS)),
+            generate_workers=max(1, int(db.get_setting("generate_workers") or DEFAULT_GENERATE_WORKERS)),
+            send_workers=max(1, int(db.get_setting("send_workers") or DEFAULT_SEND_WORKERS)),
+            openai_concurrency=max(1, int(db.get_setting("openai_concurrency") or DEFAULT_CONCURRENCY)),
+            openai_rpm=max(1, int(db.get_setting("openai_rpm") or DEFAULT_RPM)),
+            openai_tpm=max(1, int(db.get_setting("openai_tpm") or DEFAULT_TPM)),
+            batch_threshold=max(0, int(db.get_setting("batch_threshold") or 0)),
+        )
+
+    def auto_sends(self, review: Dict[str, Any], ai_response: str) -> bool:
+        return bool(self.auto_send_enabled and int(review.get("rating") or 0) >= 4 and ai_response)
+
+
+@dataclass(frozen=True)
+class GenerationTask:
+    account_id: int
+    session_file: Path
+    review: Dict[str, Any]
+
+
+@dataclass(frozen=True)
+class SendTask:
+    account_id: int
+    session_file: Path
+    uuid: str
+    text: str
+
+
+class ReviewPipeline:
+    # fetch -> generate -> send, with bounded queues between the stages so a
+    # slow stage pushes back on the one before it. Every DB write goes through
+    # a single writer thread that owns the connection. Each review is backed by
+    # a row in the jobs table, so work interrupted by a restart is picked up
+    # from there instead of being fetched and generated again.
+    def __init__(
+        self,
+        db_path: Path,
+        *,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        on_synced: Optional[Callable[[int], None]] = None,
+        scheduler: Optional[PollScheduler] = None,
+    ) -> None:
+        self._db_path = Path(db_path)
+        self._queue_size = queue_size
+        self._send_slots = threading.BoundedSemaphore(queue_size)
+        self._on_synced = on_synced
+        self._scheduler = scheduler
+        self._generate_queue: "queue.Queue[GenerationTask]" = queue.Queue(maxsize=queue_size)
+        self._send_queue: "queue.Queue[SendTask]" = queue.Queue(maxsize=queue_size)
+        self._writes: "queue.Queue[Optional[Tuple[Callable[[Database], Any], Future]]]" = queue.Queue()
+        self._fetch_executor: Optional[ThreadPoolExecutor] = None
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._started = False
+        self._settings: Optional[PipelineSettings] = None
+        self._examples = ExampleIndex()
+        self._lock = threading.Lock()
+        self._known_uuids: Set[str] = set()
+        self._fetching: Set[int] = set()
+        self._active_jobs: Set[str] = set()
+        self._defer_generation = False
+        self._open_batches = 0
+        self._batch_busy = False
+        self._batch_polled_at: Optional[float] = None
+        self._similarity = SimilarityIndex()
+        self._reply_cache = ReplyCache()
+        self._stored = 0
+        self._dirty = False
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._logger = logging.getLogger(__name__)
+
+    @property
+    def settings(self) -> Optional[PipelineSettings]:
+        return self._settings
+
+    def start(self) -> None:
+        if self._started:
+            return
+        db = Database(str(self._db_path))
+        try:
+            settings = PipelineSettings.from_db(db)
+            resumed = db.reset_interrupted_jobs()
+            if resumed:
+                self._logger.info("Resuming %s interrupted jobs", resumed)
+            self._known_uuids = db.list_review_uuids() | db.list_job_uuids()
+            self._similarity = load_similarity_index(db)
+            self._reply_cache.load(db)
+            self._examples = get_example_index(db)
+        finally:
+            db.close()
+        self._settings = settings
+        set_openai_concurrency(settings.openai_concurrency)
+        set_send_ceiling(settings.send_global_limit)
+        self._send_slots = threading.BoundedSemaphore(self._queue_size)
+        self._stop.clear()
+        self._fetch_executor = ThreadPoolExecutor(
+            max_workers=settings.fetch_workers,
+            thread_name_prefix="pipeline-fetch",
+        )
+        self._spawn("pipeline-writer", self._run_writer)
+        for index in range(settings.generate_workers):
+            self._spawn(f"pipeline-generate-{index}", self._run_generator)
+        for index in range(settings.send_workers):
+            self._spawn(f"pipeline-send-{index}", self._run_sender)
+        self._started = True
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if not self._started:
+            return
+        self._stop.set()
+        if self._fetch_executor:
+            self._fetch_executor.shutdown(wait=False, cancel_futures=True)
+        self._writes.put(None)
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads.clear()
+        self._started = False
+
+    @property
+    def open_batches(self) -> int:
+        return self._open_batches
+
+    def poll(self) -> None:
+        self._submit_write(self._dispatch_poll)
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def queue_depths(self) -> Dict[str, int]:
+        with self._lock:
+            fetching = len(self._fetching)
+        return {
+            "fetch": fetching,
+            "generate": self._generate_queue.qsize(),
+            "send": self._send_queue.qsize(),
+            "write": self._writes.qsize(),
+        }
+
+    def _spawn(self, name: str, target: Callable[[], None]) -> None:
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _begin(self) -> None:
+        with self._idle:
+            self._pending += 1
+
+    def _end(self) -> None:
+        with self._idle:
+            self._pending -= 1
+            if self._pending <= 0:
+                self._idle.notify_all()
+
+    def _put(self, target: "queue.Queue[Any]", item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=_POLL_TIMEOUT)
+                return True
+            except queue.Full:
+                continue
+        self._end()
+        return False
+
+    def _submit_write(self, task: Callable[[Database], Any]) -> Future:
+        future: Future = Future()
+        self._begin()
+        self._writes.put((task, future))
+        return future
+
+    def _write(self, task: Callable[[Database], Any]) -> Any:
+        future = self._submit_write(task)
+        while not self._stop.is_set():
+            try:
+                return future.result(timeout=_POLL_TIMEOUT)
+            except FutureTimeoutError:
+                continue
+        raise RuntimeError("Pipeline stopped")
+
+    def _claim_job(self, uuid: str) -> bool:
+        with self._lock:
+            if uuid in self._active_jobs:
+                return False
+            self._active_jobs.add(uuid)
+            return True
+
+    def _release_job(self, uuid: str) -> None:
+        with self._lock:
+            self._active_jobs.discard(uuid)
+
+    def _dispatch_poll(self, db: Database) -> None:
+        try:
+            settings = PipelineSettings.from_db(db)
+        except ValueError as exc:
+            self._logger.warning("Skipping poll: %s", exc)
+            return
+        self._settings = settings
+        set_openai_concurrency(settings.openai_concurrency)
+        set_send_ceiling(settings.send_global_limit)
+        accounts = [
+            account
+            for account in db.list_accounts()
+            if account["session_path"] and Path(account["session_path"]).exists()
+        ]
+        if self._scheduler is not None:
+            self._scheduler.sync_accounts(int(account["id"]) for account in accounts)
+            due = set(self._scheduler.due())
+            accounts = [account for account in accounts if int(account["id"]) in due]
+        with self._lock:
+            accounts = [account for account in accounts if int(account["id"]) not in self._fetching]
+            self._fetching.update(int(account["id"]) for account in accounts)
+        for account in accounts:
+            account_id = int(account["id"])
+            session_file = Path(account["session_path"])
+            self._begin()
+            cursor = account["reviews_cursor_at"]
+            future = self._fetch_executor.submit(
+                fetch_new_reviews,
+                session_file,
+                since=cursor,
+                since_uuid=account["reviews_cursor_uuid"],
+                proxy_config=settings.proxy_config,
+            )
+            future.add_done_callback(
+                lambda done, acc_id=account_id, path=session_file, since=cursor: self._on_fetched(
+                    acc_id, path, since, done
+                )
+            )
+        self._open_batches = len(db.list_open_batches())
+        self._defer_generation = self._generation_deferred(db, settings)
+        self._dispatch_batches()
+        self._dispatch_due_jobs(db, settings)
+
+    def _generation_deferred(self, db: Database, settings: PipelineSettings) -> bool:
+        # Once more jobs wait for a reply than batch_threshold, that backlog is
+        # submitted to ai_batch instead of being resumed live. Fresh reviews
+        # are still generated live, and batched jobs are never listed as due.
+        return bool(settings.batch_threshold) and db.count_jobs(JOB_PENDING_GENERATION) > settings.batch_threshold
+
+    def _dispatch_batches(self) -> None:
+        if not self._open_batches and not self._defer_generation:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self._batch_busy:
+                return
+            if self._batch_polled_at is not None and now - self._batch_polled_at < BATCH_POLL_INTERVAL:
+                return
+            self._batch_busy = True
+            self._batch_polled_at = now
+        # Batch uploads and downloads are network calls, which the writer thread must never make.
+        self._begin()
+        self._fetch_executor.submit(self._run_batches, self._defer_generation)
+
+    def _run_batches(self, submit: bool) -> None:
+        from .ai_batch import BatchGenerator
+
+        try:
+            generator = BatchGenerator(self._db_path)
+            if submit:
+                generator.submit()
+            # Finished batches are ingested here; their jobs are sent on a later tick.
+            self._open_batches = generator.refresh()
+        except Exception:
+            self._logger.exception("Failed to submit or refresh OpenAI batches")
+        finally:
+            with self._lock:
+                self._batch_busy = False
+            self._end()
+
+    def _dispatch_due_jobs(self, db: Database, settings: PipelineSettings) -> None:
+        states = [JOB_PENDING_SEND] if self._defer_generation else [JOB_PENDING_GENERATION, JOB_PENDING_SEND]
+        jobs = []
+        for job in db.list_due_jobs(states, time.time()):
+            if job["state"] == JOB_PENDING_SEND and not settings.auto_send_enabled:
+                # The reply is already stored on the review; it is left for a manual send.
+                db.update_job(job["review_uuid"], state=JOB_DONE)
+                continue
+            if self._claim_job(job["review_uuid"]):
+                jobs.append(job)
+        if not jobs:
+            return
+        sessions = {
+            int(account["id"]): Path(account["session_path"])
+            for account in db.list_accounts()
+            if account["session_path"]
+        }
+        # Queue puts may block on backpressure, which the writer thread must never do.
+        self._begin()
+        self._fetch_executor.submit(self._resume_jobs, jobs, sessions)
+
+    def _resume_jobs(self, jobs: List[Dict[str, Any]], sessions: Dict[int, Path]) -> None:
+        try:
+            for index, job in enumerate(jobs):
+                uuid = job["review_uuid"]
+                session_file = sessions.get(int(job["account_id"] or 0))
+                if session_file is None or not session_file.exists():
+                    self._release_job(uuid)
+                    continue
+                if job["state"] == JOB_PENDING_SEND:
+                    target: "queue.Queue[Any]" = self._send_queue
+                    item: Any = SendTask(
+                        account_id=int(job["account_id"]),
+                        session_file=session_file,
+                        uuid=uuid,
+                        text=job["ai_response"] or "",
+                    )
+                else:
+                    try:
+                        review = json.loads(job["payload"] or "{}")
+                    except ValueError:
+                        self._logger.warning("Dropping job %s with unreadable payload", uuid)
+                        self._release_job(uuid)
+                        continue
+                    target = self._generate_queue
+                    item = GenerationTask(account_id=int(job["account_id"]), session_file=session_file, review=review)
+                self._begin()
+                if not self._put(target, item):
+                    for rest in jobs[index:]:
+                        self._release_job(rest["review_uuid"])
+                    break
+        finally:
+            self._end()
+
+    def _on_fetched(self, account_id: int, session_file: Path, since: Optional[str], future: Future) -> None:
+        try:
+            fetch = ReviewFetch() if future.cancelled() else future.result()
+        except Exception:
+            self._logger.exception("Failed to fetch reviews for account %s", account_id)
+            fetch = ReviewFetch()
+        fresh: List[Dict[str, Any]] = []
+        try:
+            for review in fetch.reviews:
+                uuid = review.get("uuid")
+                if not uuid:
+                    continue
+                with self._lock:
+                    if uuid in self._known_uuids:
+                        continue
+                    self._known_uuids.add(uuid)
+                fresh.append(review)
+            # A partial fetch may have skipped older pages, so only a complete one moves the cursor.
+            newest = fetch.newest() if fetch.complete else None
+            if newest is not None:
+                newest_at = _parse_published_at(newest.get("published_at"))
+                since_at = _parse_published_at(since)
+                if since_at is not None and newest_at <= since_at:
+                    newest = None
+            if fresh or newest is not None:
+                # The jobs are durable before any in-memory work is queued for them.
+                try:
+                    self._write(lambda db: self._persist_fetch(db, account_id, fresh, newest))
+                except Exception:
+                    self._logger.exception("Failed to persist jobs for account %s", account_id)
+            for review in fresh:
+                if not self._claim_job(review["uuid"]):
+                    continue
+                task = GenerationTask(account_id=account_id, session_file=session_file, review=review)
+                if review.get("ai_response"):
+                    if not self._finish_generation(task, review["ai_response"]):
+                        self._release_job(review["uuid"])
+                    continue
+                # Blocking here is the backpressure from the generation stage.
+                self._begin()
+                if not self._put(self._generate_queue, task):
+                    self._release_job(review["uuid"])
+                    break
+        finally:
+            with self._lock:
+                self._fetching.discard(account_id)
+            if self._scheduler is not None:
+                delay = self._scheduler.record(account_id, len(fresh))
+                self._logger.debug("Account %s: %s new reviews, next poll in %.0fs", account_id, len(fresh), delay)
+            self._submit_write(self._mark_dirty)
+            self._end()
+
+    def _run_generator(self) -> None:
+        while not self._stop.is_set():
+            try:
+                task = self._generate_queue.get(timeout=_POLL_TIMEOUT)
+            except queue.Empty:
+                continue
+            uuid = task.review.get("uuid")
+            forwarded = False
+            try:
+                forwarded = self._generate(task)
+            except Exception as exc:
+                self._logger.exception("Failed to generate reply for review %s", uuid)
+                self._submit_write(
+                    lambda db, error=str(exc): self._record_failure(db, uuid, JOB_PENDING_GENERATION, error)
+                )
+            finally:
+                if not forwarded:
+                    self._release_job(uuid)
+                self._end()
+
+    def _generate(self, task: GenerationTask) -> bool:
+        settings = self._settings
+        # The job may have been handed to a batch since it was queued.
+        if not self._write(lambda db: self._claim_generation(db, task.review["uuid"])):
+            self._logger.debug("Skipping review %s, generated elsewhere", task.review.get("uuid"))
+            return False
+        if settings.reply_cache_enabled:
+            cached = self._reply_cache.take(task.review)
+            if cached is not None:
+                self._logger.debug("Reply for review %s served from cache", task.review.get("uuid"))
+                return self._finish_generation(task, cached.text, cached=cached)
+        ai_response = generate_ai_response(
+            task.review,
+            api_key=settings.api_key,
+            examples=self._examples.top_k(task.review),
+            rpm=settings.openai_rpm,
+            tpm=settings.openai_tpm,
+            similarity=self._similarity,
+            proxy_config=settings.proxy_config,
+        )
+        return self._finish_generation(task, ai_response)
+
+    def _finish_generation(self, task: GenerationTask, ai_response: str, cached: Optional[CachedReply] = None) -> bool:
+        settings = self._settings
+        reply_signature = None
+        if ai_response and cached is None:
+            reply_signature = self._similarity.add(ai_response)
+            if settings.reply_cache_enabled:
+                cached = self._reply_cache.offer(task.review, ai_response)
+        send = settings.auto_sends(task.review, ai_response)
+        self._submit_write(
+            lambda db: self._complete_generation(db, task, ai_response, send, reply_signature, cached)
+        )
+        if not send:
+            return False
+        self._begin()
+        return self._put(
+            self._send_queue,
+            SendTask(
+                account_id=task.account_id,
+                session_file=task.session_file,
+                uuid=task.review["uuid"],
+                text=ai_response,
+            ),
+        )
+
+    def _run_sender(self) -> None:
+        while not self._stop.is_set():
+            try:
+                task = self._send_queue.get(timeout=_POLL_TIMEOUT)
+            except queue.Empty:
+                continue
+            try:
+                submitted = self._send(task)
+            except Exception as exc:
+                self._logger.exception("Failed to send reply for review %s", task.uuid)
+                self._submit_write(
+                    lambda db, error=str(exc): self._record_failure(db, task.uuid, JOB_PENDING_SEND, error)
+                )
+                submitted = False
+            if not submitted:
+                self._release_job(task.uuid)
+                self._end()
+
+    def _send(self, task: SendTask) -> bool:
+        # Hands the reply to the per-account send queues and returns; the
+        # outcome is recorded in _on_sent. The slots bound how many replies
+        # can wait there, which keeps the backpressure on the send stage.
+        settings = self._settings
+        if not self._write(lambda db: self._claim_send(db, task.uuid)):
+            return False
+        while not self._send_slots.acquire(timeout=_POLL_TIMEOUT):
+            if self._stop.is_set():
+                raise RuntimeError("Pipeline stopped")
+        try:
+            future = submit_review_comment(
+                task.session_file,
+                task.uuid,
+                task.text,
+                interval=settings.send_interval,
+                human_delay=(settings.min_interval, settings.max_interval) if settings.human_delay_enabled else (0, 0),
+                proxy_config=settings.proxy_config,
+            )
+        except Exception:
+            self._send_slots.release()
+            raise
+        future.add_done_callback(lambda done: self._on_sent(task, done))
+        return True
+
+    def _on_sent(self, task: SendTask, future: Future) -> None:
+        self._send_slots.release()
+        try:
+            try:
+                success = bool(future.result())
+                error = "send failed"
+            except Exception as exc:
+                self._logger.exception("Failed to send reply for review %s", task.uuid)
+                success, error = False, str(exc)
+            if success:
+                self._submit_write(lambda db: self._complete_send(db, task))
+            else:
+                self._logger.warning("Auto-send failed for review %s", task.uuid)
+                self._submit_write(lambda db: self._record_failure(db, task.uuid, JOB_PENDING_SEND, error))
+        finally:
+            self._release_job(task.uuid)
+            self._end()
+
+    def _run_writer(self) -> None:
+        db = Database(str(self._db_path))
+        try:
+            running = True
+            while running:
+                try:
+                    task = self._writes.get(timeout=_POLL_TIMEOUT)
+                except queue.Empty:
+                    continue
+                batch = []
+                while task is not None:
+                    batch.append(task)
+                    if len(batch) >= _WRITE_BATCH_SIZE:
+                        break
+                    try:
+                        task = self._writes.get_nowait()
+                    except queue.Empty:
+                        break
+                running = task is not None
+                if batch:
+                    self._write_batch(db, batch)
+                if self._writes.empty():
+                    self._notify()
+        finally:
+            db.close()
+
+    def _write_batch(self, db: Database, batch: List[Tuple[Callable[[Database], Any], Future]]) -> None:
+        # Whatever is queued is written in one transaction. Each task runs in its
+        # own savepoint, and futures are resolved only once the batch is committed.
+        outcomes: List[Tuple[Future, bool, Any]] = []
+        try:
+            with db.transaction():
+                for fn, future in batch:
+                    try:
+                        with db.transaction():
+                            outcomes.append((future, True, fn(db)))
+                    except Exception as exc:
+                        self._logger.exception("Pipeline DB write failed")
+                        outcomes.append((future, False, exc))
+        except Exception as exc:
+            self._logger.exception("Pipeline DB batch commit failed")
+            outcomes = [(future, False, exc) for _, future in batch]
+        for future, ok, value in outcomes:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+            self._end()
+
+    def _persist_fetch(
+        self,
+        db: Database,
+        account_id: int,
+        reviews: List[Dict[str, Any]],
+        newest: Optional[Dict[str, Any]],
+    ) -> None:
+        if reviews:
+            # Stored right away without a reply, so a review is visible even while generation keeps failing.
+            self._stored += db.upsert_reviews(reviews, status="new", account_id=account_id)
+            db.add_generation_jobs(reviews, account_id)
+        if newest is not None:
+            db.set_review_cursor(account_id, newest["published_at"], newest.get("uuid"))
+
+    def _complete_generation(
+        self,
+        db: Database,
+        task: GenerationTask,
+        ai_response: str,
+        send: bool,
+        reply_signature: Optional[ReplySignature] = None,
+        cached: Optional[CachedReply] = None,
+    ) -> None:
+        db.set_review_ai_response(task.review, ai_response, account_id=task.account_id)
+        if reply_signature is not None:
+            db.add_reply_signatures([reply_signature])
+        if cached is not None:
+            db.save_cached_reply(cached.signature, cached.text, cached.uses, cached.last_used_at)
+        db.update_job(
+            task.review["uuid"],
+            state=JOB_PENDING_SEND if send else JOB_DONE,
+            ai_response=ai_response,
+            attempts=0,
+            next_attempt_at=0,
+            last_error=None,
+        )
+
+    def _claim_generation(self, db: Database, uuid: str) -> bool:
+        job = db.get_job(uuid)
+        if job is None:
+            # Jobs are persisted before they are queued; a failed persist still gets a reply.
+            return True
+        if job["state"] != JOB_PENDING_GENERATION:
+            return False
+        db.update_job(uuid, state=JOB_GENERATING)
+        return True
+
+    def _claim_send(self, db: Database, uuid: str) -> bool:
+        job = db.get_job(uuid)
+        if job is not None and job["state"] != JOB_PENDING_SEND:
+            # Already sent by hand, or being sent right now.
+            return False
+        review = db.get_review(uuid)
+        if review and review.get("status") == "completed":
+            db.update_job(uuid, state=JOB_DONE)
+            return False
+        db.update_job(uuid, state=JOB_SENDING)
+        return True
+
+    def _complete_send(self, db: Database, task: SendTask) -> None:
+        db.update_review_status(task.uuid, "completed", task.text)
+        db.update_job(task.uuid, state=JOB_DONE, last_error=None)
+
+    def _record_failure(self, db: Database, uuid: str, retry_state: str, error: str) -> None:
+        job = db.get_job(uuid)
+        attempts = (int(job["attempts"]) if job else 0) + 1
+        if attempts >= JOB_MAX_ATTEMPTS:
+            self._logger.warning("Giving up on review %s after %s attempts: %s", uuid, attempts, error)
+            db.update_job(uuid, state=JOB_FAILED, attempts=attempts, last_error=error)
+            return
+        delay = min(JOB_RETRY_MAX_DELAY, JOB_RETRY_BASE_DELAY * 2 ** (attempts - 1))
+        db.update_job(
+            uuid,
+            state=retry_state,
+            attempts=attempts,
+            next_attempt_at=time.time() + delay,
+            last_error=error,
+        )
+
+    def _mark_dirty(self, db: Database) -> None:
+        self._dirty = True
+
+    def _notify(self) -> None:
+        if not self._dirty and not self._stored:
+            return
+        stored, self._stored, self._dirty = self._stored, 0, False
+        if self._on_synced:
+            try:
+                self._on_synced(stored)
+            except Exception:
+                self._logger.exception("Pipeline sync callback failed")
@@ -0,0 +1,98 @@
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+DEFAULT_BUSY_INTERVAL = 30.0
+DEFAULT_MIN_INTERVAL = 60.0
+DEFAULT_MAX_INTERVAL = 600.0
+DEFAULT_BACKOFF = 2.0
+DEFAULT_JITTER = 0.15
+DEFAULT_INITIAL_SPREAD = 10.0
+
+
+@dataclass
+class AccountSchedule:
+    interval: float
+    next_poll_at: float
+    quiet_polls: int = 0
+
+
+class PollScheduler:
+    # Quiet accounts back off geometrically up to max_interval; an account that
+    # just returned new reviews drops to busy_interval. Every delay is jittered
+    # so accounts added together do not keep polling in lockstep.
+    def __init__(
+        self,
+        *,
+        busy_interval: float = DEFAULT_BUSY_INTERVAL,
+        min_interval: float = DEFAULT_MIN_INTERVAL,
+        max_interval: float = DEFAULT_MAX_INTERVAL,
+        backoff: float = DEFAULT_BACKOFF,
+        jitter: float = DEFAULT_JITTER,
+        initial_spread: float = DEFAULT_INITIAL_SPREAD,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Optional[random.Random] = None,
+    ) -> None:
+        self.busy_interval = busy_interval
+        self.min_interval = max(busy_interval, min_interval)
+        self.max_interval = max(self.min_interval, max_interval)
+        self.backoff = max(1.0, backoff)
+        self.jitter = max(0.0, min(jitter, 0.5))
+        self.initial_spread = max(0.0, initial_spread)
+        self._clock = clock
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._schedules: Dict[int, AccountSchedule] = {}
+
+    def sync_accounts(self, account_ids: Iterable[int]) -> None:
+        now = self._clock()
+        ids = set(account_ids)
+        with self._lock:
+            for account_id in list(self._schedules):
+                if account_id not in ids:
+                    del self._schedules[account_id]
+            for account_id in ids:
+                if account_id not in self._schedules:
+                    self._schedules[account_id] = AccountSchedule(
+                        interval=self.min_interval,
+                        next_poll_at=now + self._rng.uniform(0.0, self.initial_spread),
+                    )
+
+    def due(self) -> List[int]:
+        now = self._clock()
+        with self._lock:
+            return [account_id for account_id, item in self._schedules.items() if item.next_poll_at <= now]
+
+    def record(self, account_id: int, new_reviews: int) -> float:
+        now = self._clock()
+        with self._lock:
+            item = self._schedules.get(account_id)
+            if item is None:
+                item = AccountSchedule(interval=self.min_interval, next_poll_at=now)
+                self._schedules[account_id] = item
+            if new_reviews > 0:
+                item.interval = self.busy_interval
+                item.quiet_polls = 0
+            else:
+                item.quiet_polls += 1
+                item.interval = min(self.max_interval, max(self.min_interval, item.interval * self.backoff))
+            delay = item.interval * self._rng.uniform(1.0 - self.jitter, 1.0 + self.jitter)
+            item.next_poll_at = now + delay
+            return delay
+
+    def seconds_until_next(self) -> Optional[float]:
+        now = self._clock()
+        with self._lock:
+            if not self._schedules:
+                return None
+            return max(0.0, min(item.next_poll_at for item in self._schedules.values()) - now)
+
+    def snapshot(self) -> Dict[int, AccountSchedule]:
+        with self._lock:
+            return {
+                account_id: AccountSchedule(item.interval, item.next_poll_at, item.quiet_polls)
+                for account_id, item in self._schedules.items()
+            }
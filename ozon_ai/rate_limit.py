@@ -0,0 +1,152 @@
+import re
+import threading
+import time
+from typing import Callable, Dict, Mapping, Optional, Tuple
+
+
+DEFAULT_RPM = 500
+DEFAULT_TPM = 200_000
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def _parse_reset(value: Optional[str]) -> Optional[float]:
+    # OpenAI reports resets as Go-style durations: "1s", "6m0s", "20ms".
+    if not value:
+        return None
+    matches = _DURATION_RE.findall(value)
+    if not matches:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in matches)
+
+
+def _parse_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, per_seconds: float = 60.0, clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self._per_seconds = per_seconds
+        self.capacity = max(1.0, float(capacity))
+        self._tokens = self.capacity
+        self._updated = clock()
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self._per_seconds
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def set_capacity(self, capacity: float) -> None:
+        self._refill()
+        self.capacity = max(1.0, float(capacity))
+        self._tokens = min(self._tokens, self.capacity)
+
+    def wait_time(self, amount: float) -> float:
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self._tokens >= amount:
+            return 0.0
+        return (amount - self._tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self._tokens -= min(amount, self.capacity)
+
+    def adjust(self, delta: float) -> None:
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens - delta)
+
+    def sync(self, remaining: Optional[int], reset_seconds: Optional[float]) -> None:
+        # The server's view wins when it is stricter than ours.
+        if remaining is None:
+            return
+        self._refill()
+        if remaining < self._tokens:
+            self._tokens = float(remaining)
+        if remaining <= 0 and reset_seconds:
+            self._tokens = min(self._tokens, -reset_seconds * self.rate)
+
+
+class OpenAIRateLimiter:
+    # Requests-per-minute and tokens-per-minute buckets for one API key and
+    # model. Limits start from settings and follow x-ratelimit-* headers.
+    def __init__(
+        self,
+        rpm: int = DEFAULT_RPM,
+        tpm: int = DEFAULT_TPM,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._lock = threading.Lock()
+        self._clock = clock
+        self._configured = (rpm, tpm)
+        self.requests = TokenBucket(rpm, clock=clock)
+        self.tokens = TokenBucket(tpm, clock=clock)
+
+    def configure(self, rpm: int, tpm: int) -> None:
+        with self._lock:
+            if (rpm, tpm) == self._configured:
+                return
+            self._configured = (rpm, tpm)
+            self.requests.set_capacity(rpm)
+            self.tokens.set_capacity(tpm)
+
+    def acquire(self, estimated_tokens: int) -> float:
+        waited = 0.0
+        while True:
+            with self._lock:
+                delay = max(self.requests.wait_time(1), self.tokens.wait_time(estimated_tokens))
+                if delay <= 0:
+                    self.requests.take(1)
+                    self.tokens.take(estimated_tokens)
+                    return waited
+            time.sleep(min(delay, 5.0))
+            waited += min(delay, 5.0)
+
+    def observe(self, headers: Mapping[str, str], estimated_tokens: int, used_tokens: Optional[int]) -> None:
+        with self._lock:
+            if used_tokens is not None:
+                self.tokens.adjust(used_tokens - estimated_tokens)
+            limit_requests = _parse_int(headers.get("x-ratelimit-limit-requests"))
+            limit_tokens = _parse_int(headers.get("x-ratelimit-limit-tokens"))
+            if limit_requests:
+                self.requests.set_capacity(min(limit_requests, self._configured[0]))
+            if limit_tokens:
+                self.tokens.set_capacity(min(limit_tokens, self._configured[1]))
+            self.requests.sync(
+                _parse_int(headers.get("x-ratelimit-remaining-requests")),
+                _parse_reset(headers.get("x-ratelimit-reset-requests")),
+            )
+            self.tokens.sync(
+                _parse_int(headers.get("x-ratelimit-remaining-tokens")),
+                _parse_reset(headers.get("x-ratelimit-reset-tokens")),
+            )
+
+
+_limiters: Dict[Tuple[str, str], OpenAIRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(api_key: str, model: str, rpm: int = DEFAULT_RPM, tpm: int = DEFAULT_TPM) -> OpenAIRateLimiter:
+    key = (api_key, model)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = OpenAIRateLimiter(rpm, tpm)
+            _limiters[key] = limiter
+    limiter.configure(rpm, tpm)
+    return limiter
+
+
+def estimate_tokens(text: str, max_output_tokens: int) -> int:
+    # Cyrillic averages roughly three characters per token; this only has to
+    # be close enough to keep the bucket honest until usage comes back.
+    return len(text) // 3 + max_output_tokens
+
@@ -11,12 +11,7 @@ from uuid import uuid4
 from .app_paths import app_root, browser_profiles_dir, db_path as app_db_path, sessions_dir as app_sessions_dir
 from .browser_profile import find_chrome_executable
 from .db import Database
-from .ozon_reviews import (
-    _clear_session_needs_relogin,
-    _extract_company_id,
-    _load_storage_state,
-    _session_needs_relogin,
-)
+from .session_cache import _clear_session_needs_relogin, get_session_info
 
 OZON_LOGIN_URL = (
     "https://seller.ozon.ru/app/registration/signin?"
@@ -130,12 +125,12 @@ def import_session_from_browser(
             raise RuntimeError("Откройте seller.ozon.ru в этом браузере и повторите импорт.")
         context.storage_state(path=str(session_file))
 
-    storage_state = _load_storage_state(session_file)
-    if not storage_state:
+    session_info = get_session_info(session_file)
+    if not session_info:
         raise RuntimeError(f"Не удалось прочитать сохраненную сессию: {session_file}")
 
-    company_id = _extract_company_id(storage_state)
-    needs_relogin = _session_needs_relogin(session_file, storage_state)
+    company_id = session_info.company_id
+    needs_relogin = session_info.needs_relogin
     _clear_session_needs_relogin(session_file)
 
     selected_account_id: Optional[int] = None
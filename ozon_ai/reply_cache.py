@@ -0,0 +1,110 @@
+import random
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from .ai import _is_too_similar
+from .similarity import normalize_text
+
+if TYPE_CHECKING:
+    from .db import Database
+
+
+TRIVIAL_MAX_WORDS = 3
+MIN_POOL_SIZE = 5
+MAX_POOL_SIZE = 30
+REUSE_COOLDOWN = 3600.0
+RECENT_SERVED_LIMIT = 20
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def review_signature(review: Dict[str, Any]) -> Optional[str]:
+    # Only rating-only and few-word reviews are cacheable; anything longer
+    # deserves a reply written for it. Reviews with photos or video are left
+    # to the model too, since a good reply usually mentions them.
+    if int(review.get("photos_count") or 0) or int(review.get("videos_count") or 0):
+        return None
+    words = _WORD_RE.findall(normalize_text(review.get("text") or "").replace("ё", "е"))
+    if len(words) > TRIVIAL_MAX_WORDS:
+        return None
+    product = review.get("product", {}) or {}
+    brand = ((product.get("brand_info") or {}).get("name") or "").strip().lower()
+    # The review has no category field; the first word of the title
+    # ("Сода", "Наушники") is a close enough stand-in.
+    title_words = _WORD_RE.findall((product.get("title") or "").lower())
+    category = title_words[0] if title_words else ""
+    rating = int(review.get("rating") or 0)
+    return "|".join((str(rating), " ".join(sorted(set(words))), brand, category))
+
+
+@dataclass(frozen=True)
+class CachedReply:
+    signature: str
+    text: str
+    uses: int = 0
+    last_used_at: float = 0.0
+
+
+class ReplyCache:
+    # A pool of accepted replies per review signature. A signature is served
+    # from the pool only once it has MIN_POOL_SIZE different replies; replies
+    # rotate least-recently-used first, each rests REUSE_COOLDOWN seconds
+    # between uses and must not resemble anything served just before it.
+    def __init__(self, clock: Callable[[], float] = time.time) -> None:
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._pools: Dict[str, List[CachedReply]] = {}
+        self._recent: Deque[Tuple[float, str]] = deque(maxlen=RECENT_SERVED_LIMIT)
+
+    def load(self, db: "Database") -> "ReplyCache":
+        with self._lock:
+            self._pools.clear()
+            for row in db.list_cached_replies():
+                reply = CachedReply(
+                    signature=row["signature"],
+                    text=row["text"],
+                    uses=int(row["uses"] or 0),
+                    last_used_at=float(row["last_used_at"] or 0),
+                )
+                self._pools.setdefault(reply.signature, []).append(reply)
+        return self
+
+    def take(self, review: Dict[str, Any]) -> Optional[CachedReply]:
+        signature = review_signature(review)
+        if signature is None:
+            return None
+        now = self._clock()
+        with self._lock:
+            pool = self._pools.get(signature)
+            if not pool or len(pool) < MIN_POOL_SIZE:
+                return None
+            recent = [text for served_at, text in self._recent if now - served_at < REUSE_COOLDOWN]
+            candidates = sorted(pool, key=lambda item: (item.last_used_at, random.random()))
+            for reply in candidates:
+                if now - reply.last_used_at < REUSE_COOLDOWN:
+                    break
+                others = [text for text in recent if text != reply.text]
+                if others and _is_too_similar(reply.text, others):
+                    continue
+                used = replace(reply, uses=reply.uses + 1, last_used_at=now)
+                pool[pool.index(reply)] = used
+                self._recent.append((now, used.text))
+                return used
+        return None
+
+    def offer(self, review: Dict[str, Any], text: str) -> Optional[CachedReply]:
+        # Returns the new pool entry, or None if the reply was not added.
+        signature = review_signature(review)
+        if signature is None or not text:
+            return None
+        with self._lock:
+            pool = self._pools.setdefault(signature, [])
+            if len(pool) >= MAX_POOL_SIZE or _is_too_similar(text, [item.text for item in pool]):
+                return None
+            reply = CachedReply(signature=signature, text=text, uses=1, last_used_at=self._clock())
+            pool.append(reply)
+            self._recent.append((reply.last_used_at, text))
+            return reply
@@ -1,121 +1,98 @@
 import logging
-import threading
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
 from PyQt6.QtCore import QObject, QTimer, pyqtSignal
 
-from .ai import generate_ai_response, get_openai_api_key
-from .db import Database
-from .ozon_comments import send_review_comment
-from .ozon_reviews import fetch_all_new_reviews
-from .proxy import ProxyConfig
+from .metrics import counter, gauge
+from .pipeline import ReviewPipeline
+from .poll_scheduler import PollScheduler
+from .send_dispatcher import get_send_dispatcher
+
+
+_QUEUE_DEPTH = gauge("ozonai_queue_depth", "Items waiting in each pipeline stage", ("stage",))
+_SEND_PENDING = gauge("ozonai_send_pending", "Replies queued or in flight per seller account", ("account",))
+_REVIEWS_STORED = counter("ozonai_reviews_stored_total", "New reviews written to the database by the poller")
 
 
 class ReviewsPoller(QObject):
     synced = pyqtSignal(int)
+    batches_changed = pyqtSignal(int)
 
-    def __init__(self, db_path: Path, interval_ms: int = 60_000, parent: Optional[QObject] = None) -> None:
+    def __init__(
+        self,
+        db_path: Path,
+        tick_ms: int = 5_000,
+        scheduler: Optional[PollScheduler] = None,
+        parent: Optional[QObject] = None,
+    ) -> None:
         super().__init__(parent)
         self._db_path = Path(db_path)
+        # The timer only ticks the scheduler; each account is fetched when it is due.
         self._timer = QTimer(self)
-        self._timer.setInterval(interval_ms)
+        self._timer.setInterval(tick_ms)
         self._timer.timeout.connect(self.poll)
-        self._lock = threading.Lock()
-        self._inflight = False
+        self._scheduler = scheduler or PollScheduler()
+        self._pipeline = ReviewPipeline(self._db_path, on_synced=self._on_synced, scheduler=self._scheduler)
+        self._open_batches = 0
         self._logger = logging.getLogger("reviews.poller")
 
+    @property
+    def pipeline(self) -> ReviewPipeline:
+        return self._pipeline
+
+    @property
+    def scheduler(self) -> PollScheduler:
+        return self._scheduler
+
     def start(self, immediate: bool = True) -> None:
+        try:
+            self._pipeline.start()
+        except Exception:
+            self._logger.exception("Failed to start review pipeline")
+            return
         self._timer.start()
         if immediate:
             self.poll()
 
+    def stop(self) -> None:
+        self._timer.stop()
+        self._pipeline.stop()
+
+    def _on_synced(self, stored: int) -> None:
+        _REVIEWS_STORED.inc(stored)
+        self.synced.emit(stored)
+
     def poll(self) -> None:
-        with self._lock:
-            if self._inflight:
-                return
-            self._inflight = True
-        threading.Thread(target=self._run_sync, daemon=True).start()
-
-    def _run_sync(self) -> None:
-        new_count = 0
-        try:
-            new_count = sync_new_reviews(self._db_path)
-        except Exception:
-            self._logger.exception("Failed to sync reviews")
-        finally:
-            with self._lock:
-                self._inflight = False
-        self.synced.emit(new_count)
+        depths = self._pipeline.queue_depths()
+        # Gauges are sampled on every tick, which is often enough for the stats tab and a scraper.
+        _QUEUE_DEPTH.replace({(stage,): depth for stage, depth in depths.items()})
+        _SEND_PENDING.replace({(account,): pending for account, pending in get_send_dispatcher().pending().items()})
+        if any(depths.values()):
+            self._logger.debug(
+                "Pipeline queues: fetch=%s generate=%s send=%s write=%s",
+                depths["fetch"],
+                depths["generate"],
+                depths["send"],
+                depths["write"],
+            )
+        self._pipeline.poll()
+        open_batches = self._pipeline.open_batches
+        if open_batches != self._open_batches:
+            self._open_batches = open_batches
+            self.batches_changed.emit(open_batches)
 
 
-def sync_new_reviews(db_path: Path) -> int:
+def sync_new_reviews(db_path: Path, timeout: Optional[float] = None) -> int:
     if not db_path.exists():
         return 0
 
-    db = Database(str(db_path))
+    synced: List[int] = []
+    pipeline = ReviewPipeline(db_path, on_synced=synced.append)
+    pipeline.start()
     try:
-        api_key = get_openai_api_key() or db.get_setting("openai_api_key")
-        min_interval = int(db.get_setting("min_interval") or 10)
-        max_interval = int(db.get_setting("max_interval") or 30)
-        if max_interval < min_interval:
-            max_interval = min_interval
-        send_interval = int(db.get_setting("send_interval") or 5)
-        auto_send_enabled = (db.get_setting("auto_send_enabled") or "0").lower() in {"1", "true", "yes", "on"}
-        proxy_config = ProxyConfig.from_db(db)
-        proxy_config.validate()
-        accounts = db.list_accounts()
-        if not accounts:
-            return 0
-        known_uuids = db.list_review_uuids()
-        recent_responses = db.list_recent_ai_responses(limit=200)
-        new_count = 0
-        for account in accounts:
-            session_path = account["session_path"]
-            if not session_path:
-                continue
-            session_file = Path(session_path)
-            if not session_file.exists():
-                continue
-            reviews = fetch_all_new_reviews(session_file, proxy_config=proxy_config)
-            for review in reviews:
-                uuid = review.get("uuid")
-                if not uuid or uuid in known_uuids:
-                    continue
-                ai_response = review.get("ai_response")
-                if not ai_response:
-                    rating = int(review.get("rating") or 0)
-                    examples = db.list_examples_for_rating(rating)
-                    ai_response = generate_ai_response(
-                        review,
-                        api_key=api_key,
-                        examples=examples,
-                        min_interval=min_interval,
-                        max_interval=max_interval,
-                        avoid_responses=recent_responses,
-                        proxy_config=proxy_config,
-                    )
-                rating = int(review.get("rating") or 0)
-                db.upsert_review(review, status="new", ai_response=ai_response, account_id=account["id"])
-                if ai_response:
-                    recent_responses.insert(0, ai_response)
-                    if len(recent_responses) > 200:
-                        del recent_responses[200:]
-                known_uuids.add(uuid)
-                new_count += 1
-
-                if auto_send_enabled and rating >= 4 and ai_response:
-                    success = send_review_comment(
-                        session_file,
-                        uuid,
-                        ai_response,
-                        throttle_interval=send_interval,
-                        proxy_config=proxy_config,
-                    )
-                    if success:
-                        db.update_review_status(uuid, "completed", ai_response)
-                    else:
-                        logging.getLogger(__name__).warning("Auto-send failed for review %s", uuid)
-        return new_count
+        pipeline.poll()
+        pipeline.wait_idle(timeout)
     finally:
-        db.close()
+        pipeline.stop()
+    return sum(synced)
@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+
+DEFAULT_SEND_WORKERS = 8
+
+
+@dataclass
+class _AccountQueue:
+    tasks: Deque[Tuple[Callable[[], bool], Future, float]] = field(default_factory=deque)
+    next_at: float = 0.0
+    busy: bool = False
+
+
+class SendDispatcher:
+    # Replies are queued per seller account (company id). An account sends one
+    # reply at a time and waits its own interval before the next, while other
+    # accounts go ahead on the shared workers, so total throughput grows with
+    # the number of accounts. An optional global ceiling caps sends per minute
+    # across all of them.
+    def __init__(self, workers: int = DEFAULT_SEND_WORKERS, clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self._workers = max(1, int(workers))
+        self._condition = threading.Condition()
+        self._queues: Dict[str, _AccountQueue] = {}
+        self._threads: List[threading.Thread] = []
+        self._global_interval = 0.0
+        self._global_next_at = 0.0
+
+    def set_global_limit(self, per_minute: int) -> None:
+        with self._condition:
+            self._global_interval = 60.0 / per_minute if per_minute and per_minute > 0 else 0.0
+            self._condition.notify_all()
+
+    def submit(self, key: str, send: Callable[[], bool], *, interval: float = 0.0) -> Future:
+        # ``interval`` is how long this account rests after the send finishes.
+        future: Future = Future()
+        with self._condition:
+            self._queues.setdefault(key, _AccountQueue()).tasks.append((send, future, max(0.0, interval)))
+            if len(self._threads) < self._workers:
+                thread = threading.Thread(
+                    target=self._run,
+                    name=f"send-dispatcher-{len(self._threads)}",
+                    daemon=True,
+                )
+                thread.start()
+                self._threads.append(thread)
+            self._condition.notify()
+        return future
+
+    def pending(self) -> Dict[str, int]:
+        with self._condition:
+            return {
+                key: len(item.tasks) + int(item.busy)
+                for key, item in self._queues.items()
+                if item.tasks or item.busy
+            }
+
+    def _next_ready(self) -> Tuple[Optional[str], Optional[float]]:
+        # Returns the account to serve now, or how long to wait for one.
+        now = self._clock()
+        wait: Optional[float] = None
+        best: Optional[str] = None
+        rested: List[str] = []
+        for key, item in self._queues.items():
+            if item.busy:
+                continue
+            if not item.tasks:
+                if item.next_at <= now:
+                    rested.append(key)
+                continue
+            if item.next_at <= now:
+                if best is None or item.next_at < self._queues[best].next_at:
+                    best = key
+            else:
+                wait = item.next_at - now if wait is None else min(wait, item.next_at - now)
+        # An empty account queue is dropped once its rest is over; dropping it
+        # earlier would let the account's next reply skip the interval.
+        for key in rested:
+            del self._queues[key]
+        if best is not None and self._global_next_at > now:
+            return None, self._global_next_at - now
+        return best, wait
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while True:
+                    key, wait = self._next_ready()
+                    if key is not None:
+                        break
+                    self._condition.wait(wait)
+                item = self._queues[key]
+                send, future, interval = item.tasks.popleft()
+                if not future.set_running_or_notify_cancel():
+                    # Nothing was sent, so the account does not rest and the next reply goes now.
+                    continue
+                item.busy = True
+                if self._global_interval:
+                    self._global_next_at = self._clock() + self._global_interval
+            try:
+                # A failed send still rests the account: Ozon may have seen the request.
+                try:
+                    future.set_result(send())
+                except Exception as exc:
+                    future.set_exception(exc)
+            finally:
+                with self._condition:
+                    item.busy = False
+                    item.next_at = self._clock() + interval
+                    self._condition.notify_all()
+
+
+_dispatcher: Optional[SendDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_send_dispatcher() -> SendDispatcher:
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = SendDispatcher()
+        return _dispatcher
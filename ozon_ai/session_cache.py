@@ -0,0 +1,182 @@
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+
+AUTH_MARKER_SUFFIX = ".relogin"
+TOKEN_COOKIE_NAMES = frozenset({"__Secure-access-token", "__Secure-refresh-token"})
+
+
+@dataclass(frozen=True)
+class SessionInfo:
+    path: Path
+    signature: Tuple[int, int]
+    company_id: Optional[str]
+    token_expires_at: Optional[float]
+    has_tokens: bool
+    relogin_marker: bool
+    cookies: Dict[str, str] = field(default_factory=dict, compare=False, repr=False)
+    storage_state: Dict[str, Any] = field(default_factory=dict, compare=False, repr=False)
+
+    @property
+    def needs_relogin(self) -> bool:
+        if self.relogin_marker or not self.has_tokens:
+            return True
+        return self.token_expires_at is not None and self.token_expires_at < time.time()
+
+    @property
+    def is_active(self) -> bool:
+        return not self.needs_relogin and self.company_id is not None
+
+
+_cache: Dict[str, SessionInfo] = {}
+_failed: Dict[str, Tuple[int, int]] = {}
+_lock = threading.Lock()
+
+
+def _auth_marker_path(session_path: Path) -> Path:
+    return session_path.with_suffix(session_path.suffix + AUTH_MARKER_SUFFIX)
+
+
+def _signature(session_path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        stat = session_path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _load_storage_state(session_path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(session_path.read_text(encoding="utf-8"))
+    except Exception:
+        logging.getLogger(__name__).exception("Failed to read session: %s", session_path)
+        return None
+
+
+def _extract_company_id(storage_state: Dict[str, Any]) -> Optional[str]:
+    cookies = storage_state.get("cookies") or []
+    for cookie in cookies:
+        if cookie.get("name") == "sc_company_id" and cookie.get("value"):
+            return str(cookie["value"])
+
+    origins = storage_state.get("origins") or []
+    for origin in origins:
+        if origin.get("origin") != "https://seller.ozon.ru":
+            continue
+        for item in origin.get("localStorage") or []:
+            if item.get("name") != "vuex":
+                continue
+            try:
+                payload = json.loads(item.get("value") or "{}")
+            except Exception:
+                continue
+            user = payload.get("user") or {}
+            content_id = user.get("contentId") or user.get("content_id")
+            if content_id:
+                return str(content_id)
+            company = payload.get("company") or {}
+            content_id = company.get("contentId") or company.get("content_id")
+            if content_id:
+                return str(content_id)
+    return None
+
+
+def _token_expiry(cookies: list) -> Tuple[bool, Optional[float]]:
+    found_token = False
+    earliest: Optional[float] = None
+    for cookie in cookies:
+        if cookie.get("name") not in TOKEN_COOKIE_NAMES:
+            continue
+        found_token = True
+        try:
+            expires_value = float(cookie.get("expires"))
+        except (TypeError, ValueError):
+            continue
+        if expires_value > 0 and (earliest is None or expires_value < earliest):
+            earliest = expires_value
+    return found_token, earliest
+
+
+def _build_session_info(
+    session_path: Path,
+    signature: Tuple[int, int],
+    storage_state: Dict[str, Any],
+    relogin_marker: bool,
+) -> SessionInfo:
+    cookies = [cookie for cookie in storage_state.get("cookies") or [] if isinstance(cookie, dict)]
+    has_tokens, token_expires_at = _token_expiry(cookies)
+    return SessionInfo(
+        path=session_path,
+        signature=signature,
+        company_id=_extract_company_id(storage_state),
+        token_expires_at=token_expires_at,
+        has_tokens=has_tokens,
+        relogin_marker=relogin_marker,
+        cookies={str(cookie.get("name")): str(cookie.get("value") or "") for cookie in cookies if cookie.get("name")},
+        storage_state=storage_state,
+    )
+
+
+def get_session_info(session_path: Path) -> Optional[SessionInfo]:
+    session_path = Path(session_path)
+    key = str(session_path)
+    signature = _signature(session_path)
+    if signature is None:
+        with _lock:
+            _cache.pop(key, None)
+            _failed.pop(key, None)
+        return None
+
+    # The marker is written and removed independently of the session file,
+    # possibly by another process, so it is checked on every lookup.
+    relogin_marker = _auth_marker_path(session_path).exists()
+    with _lock:
+        info = _cache.get(key)
+        if info is not None and info.signature == signature:
+            if info.relogin_marker != relogin_marker:
+                info = _cache[key] = replace(info, relogin_marker=relogin_marker)
+            return info
+        if _failed.get(key) == signature:
+            return None
+
+    storage_state = _load_storage_state(session_path)
+    with _lock:
+        if not isinstance(storage_state, dict) or not storage_state:
+            _cache.pop(key, None)
+            _failed[key] = signature
+            return None
+        info = _build_session_info(session_path, signature, storage_state, relogin_marker)
+        _cache[key] = info
+        _failed.pop(key, None)
+        return info
+
+
+def _set_cached_marker(session_path: Path, value: bool) -> None:
+    key = str(session_path)
+    with _lock:
+        info = _cache.get(key)
+        if info is not None and info.relogin_marker != value:
+            _cache[key] = replace(info, relogin_marker=value)
+
+
+def _mark_session_needs_relogin(session_path: Path, reason: str) -> None:
+    try:
+        _auth_marker_path(session_path).write_text(reason, encoding="utf-8")
+    except Exception:
+        logging.getLogger(__name__).exception("Failed to write relogin marker for %s", session_path)
+        return
+    _set_cached_marker(session_path, True)
+
+
+def _clear_session_needs_relogin(session_path: Path) -> None:
+    try:
+        _auth_marker_path(session_path).unlink(missing_ok=True)
+    except Exception:
+        logging.getLogger(__name__).exception("Failed to remove relogin marker for %s", session_path)
+        return
+    _set_cached_marker(session_path, False)
@@ -0,0 +1,203 @@
+import re
+import threading
+import zlib
+from array import array
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    from .db import Database
+
+
+SHINGLE_SIZE = 3
+NUM_BINS = 64
+BANDS = 16
+ROWS = NUM_BINS // BANDS
+DEFAULT_THRESHOLD = 0.7
+DEFAULT_CAPACITY = 10_000
+# Exact comparisons per lookup. Stock openers and closers put most of the
+# history in some shared bucket, and a real near-duplicate shares several
+# bands, so it ranks well inside this many candidates.
+MAX_CANDIDATES = 64
+_BIN_BITS = 6
+_EMPTY_OFFSET = 1 << (32 - _BIN_BITS)
+
+
+def normalize_text(text: str) -> str:
+    cleaned = text.lower().strip()
+    cleaned = re.sub(r"\s+", " ", cleaned)
+    cleaned = re.sub(r"[^\w\s]", "", cleaned, flags=re.UNICODE)
+    return cleaned
+
+
+def shingles(normalized: str) -> FrozenSet[int]:
+    # Character 3-grams hashed with crc32, which is stable across runs, so
+    # stored signatures stay comparable after a restart.
+    if not normalized:
+        return frozenset()
+    if len(normalized) < SHINGLE_SIZE:
+        return frozenset((zlib.crc32(normalized.encode("utf-8")),))
+    return frozenset(
+        zlib.crc32(normalized[i:i + SHINGLE_SIZE].encode("utf-8"))
+        for i in range(len(normalized) - SHINGLE_SIZE + 1)
+    )
+
+
+def signature(shingle_set: FrozenSet[int]) -> Tuple[int, ...]:
+    # One-permutation MinHash: each shingle hash is hashed once, its low bits
+    # pick a bin and the rest compete for that bin's minimum. Empty bins
+    # borrow from the next filled one, offset by the distance, so short
+    # replies still get a full-length signature.
+    bins: List[Optional[int]] = [None] * NUM_BINS
+    for value in shingle_set:
+        index = value & (NUM_BINS - 1)
+        rest = value >> _BIN_BITS
+        current = bins[index]
+        if current is None or rest < current:
+            bins[index] = rest
+    if all(value is None for value in bins):
+        return ()
+    result = []
+    for index in range(NUM_BINS):
+        distance = 0
+        value = bins[index]
+        while value is None:
+            distance += 1
+            value = bins[(index + distance) % NUM_BINS]
+        result.append(value + distance * _EMPTY_OFFSET)
+    return tuple(result)
+
+
+def jaccard(left: FrozenSet[int], right: FrozenSet[int]) -> float:
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+@dataclass(frozen=True)
+class ReplySignature:
+    text: str
+    signature: Tuple[int, ...]
+
+    def packed(self) -> bytes:
+        return array("I", self.signature).tobytes()
+
+    @classmethod
+    def unpack(cls, text: str, blob: bytes) -> Optional["ReplySignature"]:
+        values = array("I")
+        values.frombytes(blob)
+        if len(values) != NUM_BINS:
+            return None
+        return cls(text=text, signature=tuple(values))
+
+
+class _Entry:
+    __slots__ = ("text", "signature", "_shingles")
+
+    def __init__(self, text: str, signature: Tuple[int, ...], shingle_set: Optional[FrozenSet[int]]) -> None:
+        self.text = text
+        self.signature = signature
+        self._shingles = shingle_set
+
+    @property
+    def shingles(self) -> FrozenSet[int]:
+        # Entries loaded from the DB only carry the signature until a lookup
+        # actually needs the exact comparison.
+        if self._shingles is None:
+            self._shingles = shingles(self.text)
+        return self._shingles
+
+
+def _band_keys(sig: Tuple[int, ...]) -> List[Tuple[int, ...]]:
+    return [sig[band * ROWS:(band + 1) * ROWS] for band in range(BANDS)]
+
+
+class SimilarityIndex:
+    # Near-duplicate lookup over previously generated replies. LSH on the
+    # MinHash bands narrows the history down to a few candidates, which are
+    # then confirmed with the exact Jaccard similarity of their shingles.
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, capacity: int = DEFAULT_CAPACITY) -> None:
+        self.threshold = threshold
+        self.capacity = max(1, int(capacity))
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._bands: List[Dict[Tuple[int, ...], Set[int]]] = [{} for _ in range(BANDS)]
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, text: str) -> Optional[ReplySignature]:
+        normalized = normalize_text(text)
+        shingle_set = shingles(normalized)
+        if not shingle_set:
+            return None
+        entry = _Entry(normalized, signature(shingle_set), shingle_set)
+        with self._lock:
+            self._insert(entry)
+        return ReplySignature(text=normalized, signature=entry.signature)
+
+    def add_signatures(self, signatures: Iterable[ReplySignature]) -> None:
+        with self._lock:
+            for item in signatures:
+                self._insert(_Entry(item.text, item.signature, None))
+
+    def most_similar(self, text: str) -> float:
+        return self._best_score(text, stop_at=1.0)
+
+    def is_similar(self, text: str) -> bool:
+        return self._best_score(text, stop_at=self.threshold) >= self.threshold
+
+    def _best_score(self, text: str, stop_at: float) -> float:
+        shingle_set = shingles(normalize_text(text))
+        if not shingle_set:
+            return 1.0
+        keys = _band_keys(signature(shingle_set))
+        hits: Counter = Counter()
+        with self._lock:
+            for band, key in zip(self._bands, keys):
+                bucket = band.get(key)
+                if bucket:
+                    hits.update(bucket)
+            # Candidates sharing the most bands are the likeliest matches, so
+            # they are verified first and the scan stops at the first hit.
+            entries = [self._entries[entry_id] for entry_id, _ in hits.most_common(MAX_CANDIDATES)]
+        best = 0.0
+        for entry in entries:
+            best = max(best, jaccard(shingle_set, entry.shingles))
+            if best >= stop_at:
+                break
+        return best
+
+    def _insert(self, entry: _Entry) -> None:
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = entry
+        for band, key in zip(self._bands, _band_keys(entry.signature)):
+            band.setdefault(key, set()).add(entry_id)
+        while len(self._entries) > self.capacity:
+            old_id, old = self._entries.popitem(last=False)
+            for band, key in zip(self._bands, _band_keys(old.signature)):
+                bucket = band.get(key)
+                if bucket is not None:
+                    bucket.discard(old_id)
+                    if not bucket:
+                        del band[key]
+
+
+def load_similarity_index(
+    db: "Database",
+    threshold: float = DEFAULT_THRESHOLD,
+    capacity: int = DEFAULT_CAPACITY,
+) -> SimilarityIndex:
+    index = SimilarityIndex(threshold=threshold, capacity=capacity)
+    db.prune_reply_signatures(capacity)
+    rows = db.list_reply_signatures(capacity)
+    if rows:
+        index.add_signatures(item for item in (ReplySignature.unpack(text, blob) for text, blob in rows) if item)
+        return index
+    # First run: seed the index from replies already stored on reviews.
+    added = [index.add(text) for text in reversed(db.list_recent_ai_responses(limit=capacity))]
+    db.add_reply_signatures(item for item in added if item)
+    return index
@@ -2,7 +2,7 @@
 from pathlib import Path
 
 from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QColor
+from PyQt6.QtGui import QCloseEvent, QColor
 from PyQt6.QtWidgets import (
     QFrame,
     QGraphicsDropShadowEffect,
@@ -18,6 +18,7 @@ from .tabs.accounts import AccountsTab
 from .tabs.reviews import ReviewsTab
 from .tabs.examples import ExamplesTab
 from .tabs.settings import SettingsTab
+from .tabs.stats import StatsTab
 from .title_bar import TitleBar
 
 
@@ -60,16 +61,24 @@ class MainWindow(QMainWindow):
         self.reviews_tab = ReviewsTab(db)
         tabs.addTab(self.reviews_tab, "Отзывы")
         tabs.addTab(ExamplesTab(db), "Примеры для ИИ")
+        tabs.addTab(StatsTab(), "Статистика")
         tabs.addTab(SettingsTab(db), "Настройки")
         chrome_layout.addWidget(tabs)
 
         root_layout.addWidget(chrome)
         self.setCentralWidget(root)
         self._logger = logging.getLogger("reviews.poller")
-        self._reviews_poller = ReviewsPoller(Path(db.path), interval_ms=60_000, parent=self)
+        self._reviews_poller = ReviewsPoller(Path(db.path), parent=self)
         self._reviews_poller.synced.connect(self._on_reviews_synced)
+        self._reviews_poller.batches_changed.connect(self.reviews_tab.set_open_batches)
         self._reviews_poller.start(immediate=True)
 
+    def closeEvent(self, event: QCloseEvent) -> None:
+        self._reviews_poller.stop()
+        self.reviews_tab.shutdown()
+        self.accounts_tab.shutdown()
+        super().closeEvent(event)
+
     def _toggle_maximize(self) -> None:
         if self.isMaximized():
             self.showNormal()
@@ -77,7 +86,7 @@ class MainWindow(QMainWindow):
             self.showMaximized()
 
     def _on_reviews_synced(self, new_count: int) -> None:
+        # The review lists follow DB change events on their own.
         if new_count > 0:
             self._logger.info("Added %s new reviews", new_count)
-            self.reviews_tab.refresh()
         self.accounts_tab.refresh()
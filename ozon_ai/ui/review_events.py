@@ -0,0 +1,21 @@
+from typing import Optional
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from ..db import ReviewChanges, add_review_listener, remove_review_listener
+
+
+class ReviewChangeBridge(QObject):
+    # DB listeners run on whichever thread committed; re-emitting through a
+    # signal queues the change onto the thread this object lives in.
+    changed = pyqtSignal(object)
+
+    def __init__(self, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        add_review_listener(self._on_changes)
+
+    def close(self) -> None:
+        remove_review_listener(self._on_changes)
+
+    def _on_changes(self, changes: ReviewChanges) -> None:
+        self.changed.emit(changes)
@@ -130,6 +130,30 @@ QPushButton:pressed {
     background: #1C1E26;
 }
 
+#SendQueuePanel {
+    background: #232833;
+    border: 1px solid #343B48;
+    border-radius: 10px;
+}
+
+#SendFailures {
+    background: #1C1E26;
+    border: 1px solid #343B48;
+    border-radius: 8px;
+    color: #F08A8A;
+}
+
+QProgressBar {
+    background: #1C1E26;
+    border: none;
+    border-radius: 4px;
+}
+
+QProgressBar::chunk {
+    background: #2F6BFF;
+    border-radius: 4px;
+}
+
 #ExamplesTab {
     background: #1C1E26;
 }
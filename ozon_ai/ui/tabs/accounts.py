@@ -1,8 +1,10 @@
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional, Set
 
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import QObject, Qt, pyqtSignal
 from PyQt6.QtWidgets import (
     QDialog,
     QHBoxLayout,
@@ -25,11 +27,58 @@ OZON_LOGIN_URL = (
 )
 
 
+def _is_account_active(session_path: Optional[str]) -> bool:
+    if not session_path:
+        return False
+    try:
+        from ...session_cache import get_session_info
+
+        session_info = get_session_info(Path(session_path))
+        return bool(session_info and session_info.is_active)
+    except Exception:
+        logging.getLogger("ui.accounts").exception("Failed to check account session")
+        return False
+
+
+class AccountHealthChecker(QObject):
+    # Session files are read and parsed on a worker thread; results come back
+    # through the signal, which Qt queues onto the UI thread.
+    checked = pyqtSignal(int, bool)
+
+    def __init__(self, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="account-health")
+        self._lock = threading.Lock()
+        self._in_flight: Set[int] = set()
+
+    def check(self, account_id: int, session_path: Optional[str]) -> None:
+        with self._lock:
+            if account_id in self._in_flight:
+                return
+            self._in_flight.add(account_id)
+        self._executor.submit(self._run, account_id, session_path)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, account_id: int, session_path: Optional[str]) -> None:
+        try:
+            is_active = _is_account_active(session_path)
+        finally:
+            with self._lock:
+                self._in_flight.discard(account_id)
+        self.checked.emit(account_id, is_active)
+
+
 class AccountsTab(QWidget):
     def __init__(self, db: Database) -> None:
         super().__init__()
         self.db = db
         self._logger = logging.getLogger("ui.accounts")
+        self._health: Dict[int, bool] = {}
+        self._rows: Dict[int, Dict[str, object]] = {}
+        self._checker = AccountHealthChecker(self)
+        self._checker.checked.connect(self._on_health_checked)
         layout = QVBoxLayout(self)
 
         self.list_widget = QListWidget()
@@ -48,18 +97,29 @@ class AccountsTab(QWidget):
         self.refresh()
 
     def refresh(self) -> None:
-        self.list_widget.clear()
         accounts = self.db.list_accounts()
-        for account in accounts:
-            is_active = self._is_account_active(account["session_path"])
-            item = QListWidgetItem()
-            item.setData(Qt.ItemDataRole.UserRole, account["id"])
-            widget = self._build_account_widget(account["id"], account["name"], is_active)
-            item.setSizeHint(widget.sizeHint())
-            self.list_widget.addItem(item)
-            self.list_widget.setItemWidget(item, widget)
-
-    def _build_account_widget(self, account_id: int, name: str, is_active: bool) -> QWidget:
+        account_ids = [int(account["id"]) for account in accounts]
+        for account_id in list(self._rows):
+            if account_id not in account_ids:
+                row = self._rows.pop(account_id)
+                self.list_widget.takeItem(self.list_widget.row(row["item"]))
+                self._health.pop(account_id, None)
+
+        for position, account in enumerate(accounts):
+            account_id = int(account["id"])
+            row = self._rows.get(account_id)
+            if row is None:
+                row = self._add_row(account_id, account["name"], position)
+            elif row["name_label"].text() != account["name"]:
+                row["name_label"].setText(account["name"])
+            self._checker.check(account_id, account["session_path"])
+
+    def shutdown(self) -> None:
+        self._checker.shutdown()
+
+    def _add_row(self, account_id: int, name: str, position: int) -> Dict[str, object]:
+        item = QListWidgetItem()
+        item.setData(Qt.ItemDataRole.UserRole, account_id)
         widget = QWidget()
         layout = QHBoxLayout(widget)
         layout.setContentsMargins(6, 4, 6, 4)
@@ -68,34 +128,48 @@ class AccountsTab(QWidget):
         name_label = QLabel(name)
         layout.addWidget(name_label, 1)
 
-        status_label = QLabel("Активно" if is_active else "Перезайти")
-        status_label.setObjectName("StatusLabel" if is_active else "MetaText")
+        status_label = QLabel()
         layout.addWidget(status_label)
 
         relogin_button = QPushButton("Войти еще раз")
-        relogin_button.setVisible(not is_active)
         relogin_button.clicked.connect(lambda _, acc_id=account_id: self._relogin_account(acc_id))
         layout.addWidget(relogin_button)
-        return widget
-
-    def _is_account_active(self, session_path: Optional[str]) -> bool:
-        if not session_path:
-            return False
-        path = Path(session_path)
-        if not path.exists():
-            return False
-        try:
-            from ...ozon_reviews import _extract_company_id, _load_storage_state, _session_needs_relogin
-
-            storage_state = _load_storage_state(path)
-            if not storage_state:
-                return False
-            if _session_needs_relogin(path, storage_state):
-                return False
-            return _extract_company_id(storage_state) is not None
-        except Exception:
-            self._logger.exception("Failed to check account session")
-            return False
+
+        row: Dict[str, object] = {
+            "item": item,
+            "name_label": name_label,
+            "status_label": status_label,
+            "relogin_button": relogin_button,
+        }
+        self._rows[account_id] = row
+        self._apply_health(row, self._health.get(account_id))
+        item.setSizeHint(widget.sizeHint())
+        self.list_widget.insertItem(position, item)
+        self.list_widget.setItemWidget(item, widget)
+        return row
+
+    def _apply_health(self, row: Dict[str, object], is_active: Optional[bool]) -> None:
+        status_label = row["status_label"]
+        if is_active is None:
+            status_label.setText("Проверка...")
+            object_name = "MetaText"
+        else:
+            status_label.setText("Активно" if is_active else "Перезайти")
+            object_name = "StatusLabel" if is_active else "MetaText"
+        if status_label.objectName() != object_name:
+            status_label.setObjectName(object_name)
+            status_label.style().unpolish(status_label)
+            status_label.style().polish(status_label)
+        row["relogin_button"].setVisible(is_active is False)
+
+    def _on_health_checked(self, account_id: int, is_active: bool) -> None:
+        row = self._rows.get(account_id)
+        if row is None:
+            return
+        if self._health.get(account_id) == is_active:
+            return
+        self._health[account_id] = is_active
+        self._apply_health(row, is_active)
 
     def _add_account(self) -> None:
         dialog = AccountSessionDialog(
@@ -19,6 +19,7 @@ from PyQt6.QtWidgets import (
 )
 
 from ...db import Database
+from ...example_index import get_example_index
 
 
 class ExamplesTab(QWidget):
@@ -160,6 +161,7 @@ class ExamplesTab(QWidget):
             QMessageBox.warning(self, "Пустой ответ", "Заполните пример ответа.")
             return
         example_id = self.db.save_example(data, self._current_id)
+        get_example_index(self.db).upsert(dict(data, id=example_id))
         self._current_id = example_id
         self._refresh_list()
         QMessageBox.information(self, "Сохранено", "Пример сохранен.")
@@ -179,6 +181,7 @@ class ExamplesTab(QWidget):
             QMessageBox.warning(self, "Удаление", "Сначала выберите пример.")
             return
         self.db.delete_example(self._current_id)
+        get_example_index(self.db).remove(self._current_id)
         self._current_id = None
         self._refresh_list()
         self._clear_form()
@@ -1,16 +1,12 @@
 ﻿import logging
-import threading
-from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict
 
-from PyQt6.QtCore import Qt, QTimer
-from PyQt6.QtWidgets import QLabel, QScrollArea, QTabWidget, QVBoxLayout, QWidget, QMessageBox, QFrame
+from PyQt6.QtWidgets import QHBoxLayout, QLabel, QMessageBox, QPushButton, QTabWidget, QVBoxLayout, QWidget
 
-from ...db import Database
-from ...ozon_comments import send_review_comment
-from ...proxy import ProxyConfig
-from ..widgets.review_card import ReviewCard
+from ...db import Database, ReviewChanges
+from ..review_events import ReviewChangeBridge
 from ..widgets.review_list import ReviewList
+from ..widgets.send_queue import SendQueue, SendQueuePanel
 
 
 class ReviewsTab(QWidget):
@@ -18,101 +14,96 @@ class ReviewsTab(QWidget):
         super().__init__()
         self.db = db
         self._logger = logging.getLogger("ui.reviews")
+        self.send_queue = SendQueue(db, self)
         self.tabs = QTabWidget()
-        self.new_tab = self._build_tab()
-        self.done_tab = self._build_tab()
+        self.new_tab = self._build_tab("new", editable=True)
+        self.done_tab = self._build_tab("completed", editable=False)
         self.tabs.addTab(self.new_tab["container"], "Новые")
         self.tabs.addTab(self.done_tab["container"], "Завершенные")
+        self.send_panel = SendQueuePanel(self.send_queue)
+        self.batch_label = QLabel()
+        self.batch_label.setObjectName("MetaText")
+        self.batch_label.setVisible(False)
 
         layout = QVBoxLayout(self)
+        layout.addWidget(self.batch_label)
         layout.addWidget(self.tabs)
+        layout.addWidget(self.send_panel)
         self.refresh()
+        self._changes = ReviewChangeBridge(self)
+        self._changes.changed.connect(self._apply_changes)
 
-    def _build_tab(self) -> Dict[str, Any]:
+    def shutdown(self) -> None:
+        self._changes.close()
+
+    def _build_tab(self, status: str, editable: bool) -> Dict[str, Any]:
         container = QWidget()
         layout = QVBoxLayout(container)
-        scroll = QScrollArea()
-        scroll.setWidgetResizable(True)
-        scroll.setFrameShape(QFrame.Shape.NoFrame)
-        scroll.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
-        list_widget = ReviewList()
-        scroll.setWidget(list_widget)
-        layout.addWidget(scroll)
-        return {"container": container, "list": list_widget}
+        list_widget = ReviewList(self.db, status, editable=editable)
+        tab: Dict[str, Any] = {"container": container, "list": list_widget}
+        if editable:
+            list_widget.sent.connect(self._send_review)
+            tab["selection_label"] = QLabel()
+            tab["selection_label"].setObjectName("MetaText")
+            send_selected = QPushButton("Отправить выбранные")
+            send_selected.clicked.connect(self._send_selected)
+            send_all = QPushButton("Отправить все готовые")
+            send_all.clicked.connect(self._send_all)
+            tab["send_selected"] = send_selected
+            toolbar = QHBoxLayout()
+            toolbar.addWidget(tab["selection_label"], 1)
+            toolbar.addWidget(send_selected)
+            toolbar.addWidget(send_all)
+            layout.addLayout(toolbar)
+            list_widget.selectionModel().selectionChanged.connect(lambda *_: self._update_selection())
+        layout.addWidget(list_widget)
+        return tab
 
     def refresh(self) -> None:
-        self._populate(self.new_tab["list"], "new", editable=True)
-        self._populate(self.done_tab["list"], "completed", editable=False)
+        self.new_tab["list"].reload()
+        self.done_tab["list"].reload()
+        self._update_selection()
 
-    def _populate(self, list_widget: ReviewList, status: str, editable: bool) -> None:
-        list_widget.clear()
-        reviews = self.db.list_reviews(status)
-        if not reviews:
-            empty = QLabel("Нет отзывов")
-            empty.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            list_widget.add_card(empty)
-            list_widget.finalize()
-            return
-        for review in reviews:
-            card = ReviewCard(review, editable=editable)
-            if editable:
-                card.sent.connect(self._send_review)
-            list_widget.add_card(card)
-        list_widget.finalize()
+    def set_open_batches(self, count: int) -> None:
+        # Reviews in a batch get their replies only once OpenAI finishes it, which can take up to a day.
+        self.batch_label.setText(f"Пакетная генерация в процессе: пакетов в обработке OpenAI — {count}")
+        self.batch_label.setVisible(count > 0)
 
-    def _send_review(self, uuid: str, response: str) -> None:
-        review = self.db.get_review(uuid)
-        if not review:
-            QMessageBox.warning(self, "Ошибка", "Не удалось найти отзыв для отправки.")
-            return
-        session_path = self._resolve_session_path(review)
-        if not session_path or not session_path.exists():
-            QMessageBox.warning(self, "Ошибка", "Не найден файл сессии для отправки ответа.")
+    def _apply_changes(self, changes: ReviewChanges) -> None:
+        uuids = list(changes.uuids)
+        if not uuids:
             return
+        reviews = self.db.get_reviews(uuids)
+        for tab in (self.new_tab, self.done_tab):
+            tab["list"].review_model.apply_reviews(uuids, reviews)
+        self._update_selection()
 
-        send_interval = int(self.db.get_setting("send_interval") or 5)
-        try:
-            proxy_config = ProxyConfig.from_db(self.db)
-            proxy_config.validate()
-        except ValueError as exc:
-            QMessageBox.warning(self, "Ошибка прокси", str(exc))
-            return
+    def _update_selection(self) -> None:
+        count = len(self.new_tab["list"].selectionModel().selectedRows())
+        self.new_tab["selection_label"].setText(
+            f"Выбрано: {count}" if count else "Ctrl/Shift + клик — выбрать несколько отзывов"
+        )
+        self.new_tab["send_selected"].setEnabled(bool(count))
 
-        def worker() -> None:
-            ok = False
-            try:
-                ok = send_review_comment(
-                    session_path,
-                    uuid,
-                    response,
-                    throttle_interval=send_interval,
-                    proxy_config=proxy_config,
-                )
-            except Exception:
-                self._logger.exception("Failed to send review response")
-
-            def finish() -> None:
-                if ok:
-                    self.db.update_review_status(uuid, "completed", response)
-                    QMessageBox.information(self, "Отправлено", "Ответ отправлен. Отзыв перемещен в завершенные.")
-                    self.refresh()
-                else:
-                    QMessageBox.warning(self, "Ошибка", "Не удалось отправить ответ. Проверьте сессию.")
-
-            QTimer.singleShot(0, finish)
+    def _send_review(self, uuid: str, response: str) -> None:
+        self.send_queue.enqueue([(uuid, response)])
 
-        threading.Thread(target=worker, daemon=True).start()
+    def _send_selected(self) -> None:
+        drafts = self.new_tab["list"].selected_drafts()
+        ready = [(uuid, text) for uuid, text in drafts if text]
+        if len(ready) < len(drafts):
+            self._logger.info("Skipped %s selected reviews without a reply", len(drafts) - len(ready))
+        self.send_queue.enqueue(ready)
 
-    def _resolve_session_path(self, review: Dict[str, Any]) -> Optional[Path]:
-        account_id = review.get("account_id")
-        if account_id:
-            try:
-                account = self.db.get_account(int(account_id))
-            except Exception:
-                account = None
-            if account and account["session_path"]:
-                return Path(account["session_path"])
-        accounts = self.db.list_accounts()
-        if len(accounts) == 1 and accounts[0]["session_path"]:
-            return Path(accounts[0]["session_path"])
-        return None
+    def _send_all(self) -> None:
+        drafts = self.db.list_review_drafts("new")
+        if not drafts:
+            QMessageBox.information(self, "Нет ответов", "Нет новых отзывов с готовым ответом.")
+            return
+        answer = QMessageBox.question(
+            self,
+            "Отправка ответов",
+            f"Отправить {len(drafts)} ответов на Ozon?",
+        )
+        if answer == QMessageBox.StandardButton.Yes:
+            self.send_queue.enqueue(drafts)
@@ -49,12 +49,59 @@ class SettingsTab(QWidget):
         self.max_interval.setRange(1, 3600)
         self.max_interval.setSuffix(" сек")
 
+        self.human_delay_enabled = QCheckBox("Случайная пауза перед автоотправкой (мин./макс. интервал)")
+
         self.auto_send_enabled = QCheckBox("Включить автоотправку (только 4-5 звезд)")
 
+        self.reply_cache_enabled = QCheckBox("Повторно использовать ответы для отзывов без текста")
+
         self.send_interval = QSpinBox()
         self.send_interval.setRange(0, 3600)
         self.send_interval.setSuffix(" сек")
 
+        self.send_global_limit = QSpinBox()
+        self.send_global_limit.setRange(0, 10_000)
+        self.send_global_limit.setSuffix(" в мин")
+        self.send_global_limit.setSpecialValueText("Без лимита")
+
+        self.fetch_workers = QSpinBox()
+        self.fetch_workers.setRange(1, 32)
+
+        self.generate_workers = QSpinBox()
+        self.generate_workers.setRange(1, 16)
+
+        self.send_workers = QSpinBox()
+        self.send_workers.setRange(1, 16)
+
+        self.openai_concurrency = QSpinBox()
+        self.openai_concurrency.setRange(1, 32)
+
+        self.openai_rpm = QSpinBox()
+        self.openai_rpm.setRange(1, 100_000)
+        self.openai_rpm.setSuffix(" в мин")
+
+        self.openai_tpm = QSpinBox()
+        self.openai_tpm.setRange(1_000, 100_000_000)
+        self.openai_tpm.setSingleStep(10_000)
+        self.openai_tpm.setSuffix(" в мин")
+
+        # Above this many reviews waiting for a reply, the pipeline hands that
+        # backlog to the Batch API; 0 keeps it all live.
+        self.batch_threshold = QSpinBox()
+        self.batch_threshold.setRange(0, 1_000_000)
+        self.batch_threshold.setSingleStep(100)
+        self.batch_threshold.setSuffix(" отзывов")
+        self.batch_threshold.setSpecialValueText("Выключено")
+
+        # 0 keeps the local /metrics endpoint off; the Stats tab works either way.
+        self.metrics_port = QSpinBox()
+        self.metrics_port.setRange(0, 65535)
+        self.metrics_port.setSpecialValueText("Выключено")
+
+        self.workers_hint = QLabel("Количество потоков и порт метрик применяются после перезапуска приложения.")
+        self.workers_hint.setWordWrap(True)
+        self.workers_hint.setObjectName("MetaText")
+
         self.proxy_enabled = QCheckBox("Включить прокси")
         self.proxy_enabled.toggled.connect(self._update_proxy_fields)
 
@@ -96,8 +143,20 @@ class SettingsTab(QWidget):
         form.addRow("Тест OpenAI:", openai_test_row)
         form.addRow("Минимальный интервал:", self.min_interval)
         form.addRow("Максимальный интервал:", self.max_interval)
+        form.addRow("", self.human_delay_enabled)
         form.addRow("Автоотправка:", self.auto_send_enabled)
-        form.addRow("Интервал отправки:", self.send_interval)
+        form.addRow("Интервал отправки (на аккаунт):", self.send_interval)
+        form.addRow("Общий лимит отправки:", self.send_global_limit)
+        form.addRow("Кэш ответов:", self.reply_cache_enabled)
+        form.addRow("Аккаунтов параллельно:", self.fetch_workers)
+        form.addRow("Потоков генерации:", self.generate_workers)
+        form.addRow("Потоков отправки:", self.send_workers)
+        form.addRow("Запросов к OpenAI одновременно:", self.openai_concurrency)
+        form.addRow("Лимит запросов OpenAI:", self.openai_rpm)
+        form.addRow("Лимит токенов OpenAI:", self.openai_tpm)
+        form.addRow("Пакетная генерация от:", self.batch_threshold)
+        form.addRow("Порт метрик (/metrics):", self.metrics_port)
+        form.addRow("", self.workers_hint)
         form.addRow("Прокси:", proxy_toggle_row)
         form.addRow("", self.proxy_hint)
         form.addRow("Тип прокси:", self.proxy_type)
@@ -120,6 +179,17 @@ class SettingsTab(QWidget):
         min_interval = int(self.db.get_setting("min_interval") or 10)
         max_interval = int(self.db.get_setting("max_interval") or 30)
         send_interval = int(self.db.get_setting("send_interval") or 5)
+        send_global_limit = int(self.db.get_setting("send_global_limit") or 0)
+        fetch_workers = int(self.db.get_setting("fetch_workers") or 4)
+        generate_workers = int(self.db.get_setting("generate_workers") or 2)
+        send_workers = int(self.db.get_setting("send_workers") or 1)
+        openai_concurrency = int(self.db.get_setting("openai_concurrency") or 4)
+        openai_rpm = int(self.db.get_setting("openai_rpm") or 500)
+        openai_tpm = int(self.db.get_setting("openai_tpm") or 200000)
+        batch_threshold = int(self.db.get_setting("batch_threshold") or 0)
+        metrics_port = int(self.db.get_setting("metrics_port") or 0)
+        human_delay_enabled = (self.db.get_setting("human_delay_enabled") or "1").lower() in {"1", "true", "yes", "on"}
+        reply_cache_enabled = (self.db.get_setting("reply_cache_enabled") or "1").lower() in {"1", "true", "yes", "on"}
         auto_send_enabled = (self.db.get_setting("auto_send_enabled") or "0").lower() in {"1", "true", "yes", "on"}
         proxy_config = ProxyConfig.from_db(self.db)
 
@@ -127,6 +197,17 @@ class SettingsTab(QWidget):
         self.min_interval.setValue(min_interval)
         self.max_interval.setValue(max_interval)
         self.send_interval.setValue(send_interval)
+        self.send_global_limit.setValue(send_global_limit)
+        self.fetch_workers.setValue(fetch_workers)
+        self.generate_workers.setValue(generate_workers)
+        self.send_workers.setValue(send_workers)
+        self.openai_concurrency.setValue(openai_concurrency)
+        self.openai_rpm.setValue(openai_rpm)
+        self.openai_tpm.setValue(openai_tpm)
+        self.batch_threshold.setValue(batch_threshold)
+        self.metrics_port.setValue(metrics_port)
+        self.human_delay_enabled.setChecked(human_delay_enabled)
+        self.reply_cache_enabled.setChecked(reply_cache_enabled)
         self.auto_send_enabled.setChecked(auto_send_enabled)
         self.proxy_enabled.setChecked(proxy_config.enabled)
 
@@ -226,6 +307,17 @@ class SettingsTab(QWidget):
         self.db.set_setting("max_interval", str(max_val))
         self.db.set_setting("auto_send_enabled", "1" if self.auto_send_enabled.isChecked() else "0")
         self.db.set_setting("send_interval", str(self.send_interval.value()))
+        self.db.set_setting("send_global_limit", str(self.send_global_limit.value()))
+        self.db.set_setting("fetch_workers", str(self.fetch_workers.value()))
+        self.db.set_setting("generate_workers", str(self.generate_workers.value()))
+        self.db.set_setting("send_workers", str(self.send_workers.value()))
+        self.db.set_setting("openai_concurrency", str(self.openai_concurrency.value()))
+        self.db.set_setting("openai_rpm", str(self.openai_rpm.value()))
+        self.db.set_setting("openai_tpm", str(self.openai_tpm.value()))
+        self.db.set_setting("batch_threshold", str(self.batch_threshold.value()))
+        self.db.set_setting("metrics_port", str(self.metrics_port.value()))
+        self.db.set_setting("human_delay_enabled", "1" if self.human_delay_enabled.isChecked() else "0")
+        self.db.set_setting("reply_cache_enabled", "1" if self.reply_cache_enabled.isChecked() else "0")
         self.db.set_setting("proxy_enabled", "1" if proxy_config.enabled else "0")
         self.db.set_setting("proxy_type", proxy_config.proxy_type)
         self.db.set_setting("proxy_host", proxy_config.host)
@@ -0,0 +1,185 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtGui import QHideEvent, QShowEvent
+from PyQt6.QtWidgets import (
+    QAbstractItemView,
+    QFormLayout,
+    QHBoxLayout,
+    QHeaderView,
+    QLabel,
+    QPushButton,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+    QWidget,
+)
+
+from ...metrics import REGISTRY, Counter, Histogram, HistogramSnapshot, metrics_url
+
+
+REFRESH_MS = 2_000
+
+# Summary rows: key used by _refresh_summary and the form label.
+_SUMMARY_ROWS: Tuple[Tuple[str, str], ...] = (
+    ("fetched", "Получено отзывов:"),
+    ("fetch_latency", "Опрос аккаунта (p50 / p99):"),
+    ("pages", "Страниц за опрос (в среднем):"),
+    ("openai", "Запросы к OpenAI:"),
+    ("openai_latency", "Ответ OpenAI (p50 / p99):"),
+    ("tokens", "Токены OpenAI (вход / выход):"),
+    ("similar", "Повторы из-за похожих ответов:"),
+    ("sends", "Отправлено ответов:"),
+    ("send_latency", "Отправка (p50 / p99):"),
+    ("db", "Запись в БД (p50 / p99):"),
+    ("queues", "Очереди:"),
+)
+
+
+def _counter(name: str) -> Optional[Counter]:
+    metric = REGISTRY.get(name)
+    return metric if isinstance(metric, Counter) else None
+
+
+def _total(name: str, **labels: Any) -> int:
+    metric = _counter(name)
+    return int(metric.total(**labels)) if metric is not None else 0
+
+
+def _snapshot(name: str) -> Optional[HistogramSnapshot]:
+    metric = REGISTRY.get(name)
+    return metric.merged() if isinstance(metric, Histogram) else None
+
+
+def _seconds(value: Optional[float]) -> str:
+    if value is None:
+        return "—"
+    if value < 1:
+        return f"{value * 1000:.0f} мс"
+    return f"{value:.1f} с"
+
+
+def _latency(name: str) -> str:
+    snapshot = _snapshot(name)
+    if snapshot is None or not snapshot.count:
+        return "нет данных"
+    return f"{_seconds(snapshot.quantile(0.5))} / {_seconds(snapshot.quantile(0.99))} ({snapshot.count})"
+
+
+def _describe(snapshot: HistogramSnapshot) -> str:
+    if not snapshot.count:
+        return "n=0"
+    return (
+        f"n={snapshot.count}  среднее {snapshot.mean:.3g}  "
+        f"p50 {snapshot.quantile(0.5):.3g}  p99 {snapshot.quantile(0.99):.3g}"
+    )
+
+
+class StatsTab(QWidget):
+    # Read-only view of the metrics registry, refreshed while the tab is visible.
+    def __init__(self) -> None:
+        super().__init__()
+        self.setObjectName("StatsTab")
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 10, 0, 0)
+        layout.setSpacing(10)
+
+        header = QHBoxLayout()
+        self.endpoint_label = QLabel()
+        self.endpoint_label.setObjectName("MetaText")
+        self.endpoint_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+        header.addWidget(self.endpoint_label)
+        header.addStretch(1)
+        refresh_button = QPushButton("Обновить")
+        refresh_button.clicked.connect(self.refresh)
+        header.addWidget(refresh_button)
+        layout.addLayout(header)
+
+        form = QFormLayout()
+        form.setLabelAlignment(Qt.AlignmentFlag.AlignRight)
+        self._summary: Dict[str, QLabel] = {}
+        for key, label in _SUMMARY_ROWS:
+            value = QLabel("нет данных")
+            value.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+            self._summary[key] = value
+            form.addRow(label, value)
+        layout.addLayout(form)
+
+        self.table = QTableWidget(0, 3)
+        self.table.setHorizontalHeaderLabels(["Метрика", "Метки", "Значение"])
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.verticalHeader().setVisible(False)
+        table_header = self.table.horizontalHeader()
+        table_header.setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents)
+        table_header.setSectionResizeMode(1, QHeaderView.ResizeMode.ResizeToContents)
+        table_header.setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.table, 1)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(REFRESH_MS)
+        self._timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event: QShowEvent) -> None:
+        super().showEvent(event)
+        self.refresh()
+        self._timer.start()
+
+    def hideEvent(self, event: QHideEvent) -> None:
+        self._timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self) -> None:
+        url = metrics_url()
+        self.endpoint_label.setText(f"Метрики для мониторинга: {url}" if url else "HTTP-метрики выключены")
+        self._refresh_summary()
+        self._refresh_table()
+
+    def _refresh_summary(self) -> None:
+        values = self._summary
+        values["fetched"].setText(str(_total("ozonai_reviews_fetched_total")))
+        values["fetch_latency"].setText(_latency("ozonai_fetch_seconds"))
+        pages = _snapshot("ozonai_fetch_pages")
+        values["pages"].setText(f"{pages.mean:.1f}" if pages is not None and pages.mean is not None else "нет данных")
+
+        requests = _snapshot("ozonai_openai_request_seconds")
+        values["openai"].setText(
+            f"{requests.count if requests is not None else 0}, ошибок {_total('ozonai_openai_errors_total')}"
+        )
+        values["openai_latency"].setText(_latency("ozonai_openai_request_seconds"))
+        tokens_in = _total("ozonai_openai_tokens_total", kind="input")
+        values["tokens"].setText(f"{tokens_in} / {_total('ozonai_openai_tokens_total', kind='output')}")
+        values["similar"].setText(
+            f"{_total('ozonai_generation_attempts_total', outcome='similar')}, "
+            f"пустых {_total('ozonai_generation_attempts_total', outcome='empty')}"
+        )
+
+        sent = _total("ozonai_sends_total", result="ok")
+        attempts = _total("ozonai_sends_total")
+        share = f" ({sent * 100 / attempts:.0f}% успешно)" if attempts else ""
+        values["sends"].setText(f"{sent} из {attempts}{share}")
+        values["send_latency"].setText(_latency("ozonai_send_seconds"))
+        values["db"].setText(_latency("ozonai_db_commit_seconds"))
+
+        depths = _counter("ozonai_queue_depth")
+        pending = _counter("ozonai_send_pending")
+        parts = [f"{key[0]}: {int(value)}" for key, value in sorted((depths.samples() if depths else {}).items())]
+        parts.append(f"отправка по аккаунтам: {int(pending.total()) if pending else 0}")
+        values["queues"].setText(", ".join(parts))
+
+    def _refresh_table(self) -> None:
+        rows: List[Tuple[str, str, str]] = []
+        for metric in REGISTRY.metrics():
+            for key, value in sorted(metric.samples().items()):
+                labels = ", ".join(f"{name}={part}" for name, part in zip(metric.label_names, key))
+                text = _describe(value) if isinstance(value, HistogramSnapshot) else f"{value:g}"
+                rows.append((metric.name, labels, text))
+        self.table.setRowCount(len(rows))
+        for row, cells in enumerate(rows):
+            for column, text in enumerate(cells):
+                item = self.table.item(row, column)
+                if item is None:
+                    self.table.setItem(row, column, QTableWidgetItem(text))
+                elif item.text() != text:
+                    item.setText(text)
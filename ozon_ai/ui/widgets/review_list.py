@@ -1,23 +1,387 @@
-﻿from PyQt6.QtWidgets import QVBoxLayout, QWidget
+﻿from typing import Any, Dict, List, Optional, Sequence, Tuple
 
+from PyQt6.QtCore import (
+    QAbstractListModel,
+    QModelIndex,
+    QObject,
+    QPersistentModelIndex,
+    QRect,
+    QRectF,
+    QSize,
+    Qt,
+    pyqtSignal,
+)
+from PyQt6.QtGui import QColor, QFont, QFontMetrics, QPainter, QPen, QTextLayout
+from PyQt6.QtWidgets import (
+    QAbstractItemView,
+    QListView,
+    QStyle,
+    QStyledItemDelegate,
+    QStyleOptionViewItem,
+    QWidget,
+)
 
-class ReviewList(QWidget):
-    def __init__(self) -> None:
-        super().__init__()
+from ...db import Database
+from .review_card import ReviewCard
+
+
+REVIEW_ROLE = Qt.ItemDataRole.UserRole + 1
+DEFAULT_PAGE_SIZE = 100
+
+_CARD_BACKGROUND = QColor("#232833")
+_CARD_BORDER = QColor("#343B48")
+_CARD_SELECTED_BORDER = QColor("#4D80FF")
+_BADGE_BACKGROUND = QColor("#2F6BFF")
+_TEXT_COLOR = QColor("#E9EAF0")
+_META_COLOR = QColor("#B6BBC6")
+_OUTER_MARGIN_X = 10
+_OUTER_MARGIN_Y = 6
+_PADDING_X = 14
+_PADDING_Y = 12
+_SPACING = 8
+_TEXT_LINES = 3
+
+
+def _sort_key(review: Dict[str, Any]) -> Tuple[bool, str, str]:
+    # Mirrors ORDER BY published_at DESC, uuid DESC, where NULL dates sort last.
+    published_at = review.get("published_at")
+    return published_at is not None, published_at or "", review.get("uuid") or ""
+
+
+class ReviewListModel(QAbstractListModel):
+    # Rows are loaded a page at a time through keyset pagination as the view
+    # scrolls, so only reviews the user has scrolled to are ever read.
+    def __init__(
+        self,
+        db: Database,
+        status: str,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        parent: Optional[QObject] = None,
+    ) -> None:
+        super().__init__(parent)
+        self.db = db
+        self.status = status
+        self.page_size = page_size
+        self._rows: List[Dict[str, Any]] = []
+        self._exhausted = False
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid() or not 0 <= index.row() < len(self._rows):
+            return None
+        review = self._rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return review.get("product_title") or "Без названия"
+        if role == REVIEW_ROLE:
+            return review
+        return None
+
+    def canFetchMore(self, parent: QModelIndex = QModelIndex()) -> bool:
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent: QModelIndex = QModelIndex()) -> None:
+        if parent.isValid() or self._exhausted:
+            return
+        before = None
+        if self._rows:
+            last = self._rows[-1]
+            before = (last.get("published_at"), last["uuid"])
+        page = self.db.list_reviews_page(self.status, limit=self.page_size, before=before)
+        if len(page) < self.page_size:
+            self._exhausted = True
+        if not page:
+            return
+        start = len(self._rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(page) - 1)
+        self._rows.extend(page)
+        self.endInsertRows()
+
+    def reload(self) -> None:
+        self.beginResetModel()
+        self._rows = []
+        self._exhausted = False
+        self.endResetModel()
+        self.fetchMore()
+
+    def review(self, row: int) -> Optional[Dict[str, Any]]:
+        if 0 <= row < len(self._rows):
+            return self._rows[row]
+        return None
+
+    def apply_reviews(self, uuids: Sequence[str], reviews: Dict[str, Dict[str, Any]]) -> None:
+        # Applies changed rows in place: rows that left this status are removed,
+        # rows still here are updated, and new rows are inserted at their sort
+        # position if it falls inside the pages already loaded.
+        def belongs(uuid: str) -> bool:
+            review = reviews.get(uuid)
+            return review is not None and review.get("status") == self.status
+
+        rows_by_uuid = {row["uuid"]: position for position, row in enumerate(self._rows)}
+        removed = sorted(
+            (rows_by_uuid[uuid] for uuid in uuids if uuid in rows_by_uuid and not belongs(uuid)),
+            reverse=True,
+        )
+        for position in removed:
+            self.beginRemoveRows(QModelIndex(), position, position)
+            del self._rows[position]
+            self.endRemoveRows()
+        if removed:
+            rows_by_uuid = {row["uuid"]: position for position, row in enumerate(self._rows)}
+
+        inserted: List[Dict[str, Any]] = []
+        for uuid in dict.fromkeys(uuids):
+            if not belongs(uuid):
+                continue
+            position = rows_by_uuid.get(uuid)
+            if position is None:
+                inserted.append(reviews[uuid])
+                continue
+            self._rows[position] = reviews[uuid]
+            changed = self.index(position)
+            self.dataChanged.emit(changed, changed)
+
+        for review in sorted(inserted, key=_sort_key, reverse=True):
+            position = self._insert_position(_sort_key(review))
+            if position == len(self._rows) and not self._exhausted:
+                continue
+            self.beginInsertRows(QModelIndex(), position, position)
+            self._rows.insert(position, review)
+            self.endInsertRows()
+
+    def _insert_position(self, key: Tuple[bool, str, str]) -> int:
+        low, high = 0, len(self._rows)
+        while low < high:
+            middle = (low + high) // 2
+            if _sort_key(self._rows[middle]) > key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+
+def _clip_lines(text: str, font: QFont, width: int, max_lines: int) -> List[str]:
+    metrics = QFontMetrics(font)
+    layout = QTextLayout(text, font)
+    layout.beginLayout()
+    starts: List[int] = []
+    lines: List[str] = []
+    while len(lines) < max_lines:
+        line = layout.createLine()
+        if not line.isValid():
+            break
+        line.setLineWidth(width)
+        starts.append(line.textStart())
+        lines.append(text[line.textStart():line.textStart() + line.textLength()].rstrip("\n"))
+    truncated = layout.createLine().isValid()
+    layout.endLayout()
+    if truncated and lines:
+        rest = text[starts[-1]:].replace("\n", " ")
+        lines[-1] = metrics.elidedText(rest, Qt.TextElideMode.ElideRight, width)
+    return lines
+
+
+class ReviewDelegate(QStyledItemDelegate):
+    # Rows are painted as cards; only the current row gets a real ReviewCard
+    # as its editor, so the widget count stays at one however long the list is.
+    sent = pyqtSignal(str, str)
+
+    def __init__(self, editable: bool, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.editable = editable
+        self._open_uuid: Optional[str] = None
+        self._open_height = 0
+
+    def set_open(self, uuid: Optional[str]) -> None:
+        self._open_uuid = uuid
+        self._open_height = 0
+
+    def _fonts(self, option: QStyleOptionViewItem) -> Dict[str, QFont]:
+        base = QFont(option.font)
+        title = QFont(base)
+        title.setBold(True)
+        return {"base": base, "title": title}
+
+    def _collapsed_height(self, option: QStyleOptionViewItem) -> int:
+        fonts = self._fonts(option)
+        title_height = QFontMetrics(fonts["title"]).height()
+        line_height = QFontMetrics(fonts["base"]).lineSpacing()
+        content = title_height + line_height * (1 + _TEXT_LINES + 1 + _TEXT_LINES) + _SPACING * 4
+        return content + 2 * _PADDING_Y + 2 * _OUTER_MARGIN_Y
+
+    def sizeHint(self, option: QStyleOptionViewItem, index: QModelIndex) -> QSize:
+        review = index.data(REVIEW_ROLE) or {}
+        if self._open_height and review.get("uuid") == self._open_uuid:
+            return QSize(option.rect.width(), self._open_height)
+        return QSize(option.rect.width(), self._collapsed_height(option))
+
+    def paint(self, painter: QPainter, option: QStyleOptionViewItem, index: QModelIndex) -> None:
+        review = index.data(REVIEW_ROLE)
+        if not review:
+            return
+        fonts = self._fonts(option)
+        card = option.rect.adjusted(_OUTER_MARGIN_X, _OUTER_MARGIN_Y, -_OUTER_MARGIN_X, -_OUTER_MARGIN_Y)
+        selected = bool(option.state & QStyle.StateFlag.State_Selected)
+
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setPen(QPen(_CARD_SELECTED_BORDER if selected else _CARD_BORDER, 1))
+        painter.setBrush(_CARD_BACKGROUND)
+        painter.drawRoundedRect(QRectF(card).adjusted(0.5, 0.5, -0.5, -0.5), 14, 14)
+
+        inner = card.adjusted(_PADDING_X, _PADDING_Y, -_PADDING_X, -_PADDING_Y)
+        width = inner.width()
+        title_metrics = QFontMetrics(fonts["title"])
+        base_metrics = QFontMetrics(fonts["base"])
+        line_height = base_metrics.lineSpacing()
+        y = inner.top()
+
+        rating = str(review.get("rating") if review.get("rating") is not None else "-")
+        badge_width = max(24, base_metrics.horizontalAdvance(rating)) + 16
+        badge = QRect(inner.right() - badge_width + 1, y, badge_width, title_metrics.height())
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(_BADGE_BACKGROUND)
+        painter.drawRoundedRect(QRectF(badge), 10, 10)
+        painter.setPen(_TEXT_COLOR)
+        painter.setFont(fonts["base"])
+        painter.drawText(badge, Qt.AlignmentFlag.AlignCenter, rating)
+
+        title = review.get("product_title") or "Без названия"
+        painter.setFont(fonts["title"])
+        title_width = width - badge_width - _SPACING
+        painter.drawText(
+            QRect(inner.left(), y, title_width, title_metrics.height()),
+            Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter,
+            title_metrics.elidedText(title, Qt.TextElideMode.ElideRight, title_width),
+        )
+        y += title_metrics.height() + _SPACING
+
+        meta_parts = [
+            f"SKU: {review.get('sku')}",
+            f"Бренд: {review.get('brand_name')}",
+            f"Дата: {review.get('published_at')}",
+        ]
+        painter.setFont(fonts["base"])
+        painter.setPen(_META_COLOR)
+        painter.drawText(
+            QRect(inner.left(), y, width, line_height),
+            Qt.AlignmentFlag.AlignLeft,
+            base_metrics.elidedText(" | ".join(meta_parts), Qt.TextElideMode.ElideRight, width),
+        )
+        y += line_height + _SPACING
+
+        painter.setPen(_TEXT_COLOR)
+        text = review.get("text") or "(Нет текста отзыва)"
+        for line in _clip_lines(f"Отзыв: {text}", fonts["base"], width, _TEXT_LINES):
+            painter.drawText(QRect(inner.left(), y, width, line_height), Qt.AlignmentFlag.AlignLeft, line)
+            y += line_height
+        y = inner.top() + title_metrics.height() + line_height * (1 + _TEXT_LINES) + _SPACING * 3
+
+        response = review.get("ai_response") or ""
+        if not self.editable:
+            response = review.get("user_response") or response
+        painter.setPen(_META_COLOR)
+        painter.drawText(QRect(inner.left(), y, width, line_height), Qt.AlignmentFlag.AlignLeft, "Ответ ИИ:")
+        y += line_height + _SPACING
+        painter.setPen(_TEXT_COLOR)
+        for line in _clip_lines(response or "—", fonts["base"], width, _TEXT_LINES):
+            painter.drawText(QRect(inner.left(), y, width, line_height), Qt.AlignmentFlag.AlignLeft, line)
+            y += line_height
+        painter.restore()
+
+    def createEditor(self, parent: QWidget, option: QStyleOptionViewItem, index: QModelIndex) -> QWidget:
+        review = index.data(REVIEW_ROLE) or {}
+        card = ReviewCard(review, editable=self.editable)
+        card.setParent(parent)
+        if self.editable:
+            card.sent.connect(self.sent)
+        width = max(1, option.rect.width() - 2 * _OUTER_MARGIN_X)
+        layout = card.layout()
+        if layout is not None and layout.hasHeightForWidth():
+            height = layout.totalHeightForWidth(width)
+        else:
+            height = card.sizeHint().height()
+        self._open_uuid = review.get("uuid")
+        self._open_height = height + 2 * _OUTER_MARGIN_Y
+        self.sizeHintChanged.emit(index)
+        return card
+
+    def updateEditorGeometry(self, editor: QWidget, option: QStyleOptionViewItem, index: QModelIndex) -> None:
+        editor.setGeometry(option.rect.adjusted(_OUTER_MARGIN_X, _OUTER_MARGIN_Y, -_OUTER_MARGIN_X, -_OUTER_MARGIN_Y))
+
+    def setEditorData(self, editor: QWidget, index: QModelIndex) -> None:
+        # The card is built from the review in createEditor; re-applying the
+        # row here would discard a reply the user is still editing.
+        return
+
+    def setModelData(self, editor: QWidget, model: QAbstractListModel, index: QModelIndex) -> None:
+        return
+
+
+class ReviewList(QListView):
+    sent = pyqtSignal(str, str)
+
+    def __init__(self, db: Database, status: str, editable: bool, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
         self.setObjectName("ReviewList")
-        self.layout = QVBoxLayout(self)
-        self.layout.setContentsMargins(10, 10, 10, 10)
-        self.layout.setSpacing(12)
-
-    def clear(self) -> None:
-        while self.layout.count():
-            item = self.layout.takeAt(0)
-            widget = item.widget()
-            if widget is not None:
-                widget.deleteLater()
-
-    def add_card(self, card: QWidget) -> None:
-        self.layout.addWidget(card)
-
-    def finalize(self) -> None:
-        self.layout.addStretch(1)
+        self.review_model = ReviewListModel(db, status, parent=self)
+        self.delegate = ReviewDelegate(editable, parent=self)
+        self.delegate.sent.connect(self.sent)
+        self.setModel(self.review_model)
+        self.setItemDelegate(self.delegate)
+        self.setFrameShape(QListView.Shape.NoFrame)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        # Ctrl/Shift-click picks several reviews for a bulk send; the current
+        # row still gets the editor.
+        self.setSelectionMode(
+            QAbstractItemView.SelectionMode.ExtendedSelection if editable
+            else QAbstractItemView.SelectionMode.SingleSelection
+        )
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setResizeMode(QListView.ResizeMode.Adjust)
+        self._editor_index: Optional[QPersistentModelIndex] = None
+        self.selectionModel().currentChanged.connect(self._open_editor)
+
+    def reload(self) -> None:
+        self._close_editor()
+        self.review_model.reload()
+
+    def selected_drafts(self) -> List[Tuple[str, str]]:
+        # The open card may hold an edited, unsaved reply; it wins over the stored one.
+        drafts = []
+        for index in sorted(self.selectionModel().selectedIndexes(), key=lambda item: item.row()):
+            review = self.review_model.review(index.row())
+            if not review:
+                continue
+            text = review.get("ai_response") or ""
+            editor = self.indexWidget(index)
+            if isinstance(editor, ReviewCard):
+                text = editor.response_edit.toPlainText()
+            drafts.append((review["uuid"], text.strip()))
+        return drafts
+
+    def _open_editor(self, current: QModelIndex, previous: QModelIndex) -> None:
+        self._close_editor()
+        if not current.isValid():
+            return
+        self._editor_index = QPersistentModelIndex(current)
+        self.openPersistentEditor(current)
+        self.scrollTo(current)
+
+    def _close_editor(self) -> None:
+        index, self._editor_index = self._editor_index, None
+        self.delegate.set_open(None)
+        if index is None or not index.isValid():
+            return
+        model_index = QModelIndex(index)
+        self.closePersistentEditor(model_index)
+        self.delegate.sizeHintChanged.emit(model_index)
+
+    def paintEvent(self, event) -> None:
+        super().paintEvent(event)
+        if self.review_model.rowCount() == 0:
+            painter = QPainter(self.viewport())
+            painter.setPen(_META_COLOR)
+            painter.drawText(self.viewport().rect(), Qt.AlignmentFlag.AlignCenter, "Нет отзывов")
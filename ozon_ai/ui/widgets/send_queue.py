@@ -0,0 +1,239 @@
+import logging
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Sequence, Set, Tuple
+
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtWidgets import (
+    QFrame,
+    QHBoxLayout,
+    QLabel,
+    QListWidget,
+    QProgressBar,
+    QPushButton,
+    QVBoxLayout,
+    QWidget,
+)
+
+from ...db import JOB_BATCHED, JOB_DONE, JOB_PENDING_GENERATION, Database
+from ...ozon_comments import set_send_ceiling, submit_review_comment
+from ...pipeline import PipelineSettings
+
+
+MAX_IN_FLIGHT = 4
+
+
+@dataclass(frozen=True)
+class QueuedSend:
+    uuid: str
+    text: str
+    title: str
+
+
+class SendQueue(QObject):
+    # Manual replies, single or bulk, go through one queue on the UI thread.
+    # At most MAX_IN_FLIGHT of them are handed to the per-account dispatcher
+    # at a time; the rest wait here, so cancelling drops them before they go.
+    changed = pyqtSignal()
+    _finished = pyqtSignal(object, bool, str)
+
+    def __init__(self, db: Database, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.db = db
+        self._logger = logging.getLogger("ui.send_queue")
+        self._pending: Deque[QueuedSend] = deque()
+        self._queued: Set[str] = set()
+        # Job state of each in-flight reply before it was claimed, restored if the send fails.
+        self._claimed: Dict[str, Optional[str]] = {}
+        self._in_flight = 0
+        self._settings: Optional[PipelineSettings] = None
+        self.total = 0
+        self.sent = 0
+        self.failures: List[Tuple[QueuedSend, str]] = []
+        self._finished.connect(self._on_finished)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending) + self._in_flight
+
+    def is_queued(self, uuid: str) -> bool:
+        return uuid in self._queued
+
+    def enqueue(self, drafts: Sequence[Tuple[str, str]]) -> int:
+        # Returns how many replies were queued; duplicates and empty drafts are skipped.
+        items = []
+        reviews = self.db.get_reviews([uuid for uuid, _ in drafts])
+        for uuid, text in drafts:
+            text = (text or "").strip()
+            review = reviews.get(uuid)
+            if not text or uuid in self._queued or not review or review.get("status") != "new":
+                continue
+            items.append(QueuedSend(uuid, text, review.get("product_title") or "Без названия"))
+        if not items:
+            return 0
+        if not self.pending:
+            self.total = self.sent = 0
+            self.failures = []
+        try:
+            self._settings = PipelineSettings.from_db(self.db)
+        except ValueError as exc:
+            self.total += len(items)
+            for item in items:
+                self._fail(item, f"Ошибка прокси: {exc}")
+            self.changed.emit()
+            return 0
+        set_send_ceiling(self._settings.send_global_limit)
+        self.total += len(items)
+        for item in items:
+            self._queued.add(item.uuid)
+            self._pending.append(item)
+        self._pump()
+        self.changed.emit()
+        return len(items)
+
+    def retry_failed(self) -> int:
+        failures, self.failures = self.failures, []
+        self.total -= len(failures)
+        return self.enqueue([(item.uuid, item.text) for item, _ in failures])
+
+    def cancel(self) -> None:
+        # Replies already with the dispatcher cannot be recalled; they finish normally.
+        while self._pending:
+            item = self._pending.popleft()
+            self._queued.discard(item.uuid)
+            self.total -= 1
+        self.changed.emit()
+
+    def _pump(self) -> None:
+        settings = self._settings
+        while self._pending and self._in_flight < MAX_IN_FLIGHT and settings is not None:
+            item = self._pending.popleft()
+            review = self.db.get_review(item.uuid)
+            session_path = self._resolve_session_path(review) if review else None
+            if not session_path or not session_path.exists():
+                self._fail(item, "Не найден файл сессии")
+                continue
+            claimed, previous = self.db.claim_job_for_manual_send(item.uuid)
+            if not claimed:
+                self._fail(item, "Ответ уже генерируется или отправляется автоматически")
+                continue
+            self._claimed[item.uuid] = previous
+            self._in_flight += 1
+            human_delay = (settings.min_interval, settings.max_interval) if settings.human_delay_enabled else (0, 0)
+            future = submit_review_comment(
+                session_path,
+                item.uuid,
+                item.text,
+                interval=settings.send_interval,
+                human_delay=human_delay,
+                proxy_config=settings.proxy_config,
+            )
+            # Done-callbacks run on a dispatcher thread; the signal queues
+            # the result back onto the thread this object lives in.
+            future.add_done_callback(lambda done, item=item: self._finished.emit(item, *self._result(done)))
+
+    def _result(self, future: Future) -> Tuple[bool, str]:
+        try:
+            return bool(future.result()), ""
+        except Exception as exc:
+            self._logger.exception("Failed to send review response")
+            return False, str(exc)
+
+    def _on_finished(self, item: QueuedSend, ok: bool, error: str) -> None:
+        self._in_flight -= 1
+        previous = self._claimed.pop(item.uuid, None)
+        if ok:
+            self._queued.discard(item.uuid)
+            self.sent += 1
+            with self.db.transaction():
+                self.db.update_review_status(item.uuid, "completed", item.text)
+                self.db.update_job(item.uuid, state=JOB_DONE, last_error=None)
+        else:
+            if previous is not None:
+                # A batch has already let go of the job, so it goes back to live generation.
+                self.db.update_job(item.uuid, state=JOB_PENDING_GENERATION if previous == JOB_BATCHED else previous)
+            self._fail(item, error or "Ozon не принял ответ, проверьте сессию")
+        self._pump()
+        self.changed.emit()
+
+    def _fail(self, item: QueuedSend, reason: str) -> None:
+        self._queued.discard(item.uuid)
+        self.failures.append((item, reason))
+
+    def _resolve_session_path(self, review: Dict[str, Any]) -> Optional[Path]:
+        account_id = review.get("account_id")
+        if account_id:
+            try:
+                account = self.db.get_account(int(account_id))
+            except Exception:
+                account = None
+            if account and account["session_path"]:
+                return Path(account["session_path"])
+        accounts = self.db.list_accounts()
+        if len(accounts) == 1 and accounts[0]["session_path"]:
+            return Path(accounts[0]["session_path"])
+        return None
+
+
+class SendQueuePanel(QFrame):
+    # Non-modal progress for SendQueue: shown while anything is queued or
+    # failed, hidden again once the queue is empty and the user closes it.
+    def __init__(self, queue: SendQueue, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
+        self.setObjectName("SendQueuePanel")
+        self.queue = queue
+        self.summary_label = QLabel()
+        self.progress = QProgressBar()
+        self.progress.setTextVisible(False)
+        self.progress.setMaximumHeight(8)
+        self.failures_list = QListWidget()
+        self.failures_list.setObjectName("SendFailures")
+        self.failures_list.setMaximumHeight(120)
+        self.retry_button = QPushButton("Повторить ошибки")
+        self.retry_button.clicked.connect(self.queue.retry_failed)
+        self.cancel_button = QPushButton("Отменить")
+        self.cancel_button.clicked.connect(self.queue.cancel)
+        self.close_button = QPushButton("Скрыть")
+        self.close_button.clicked.connect(self.hide)
+
+        header = QHBoxLayout()
+        header.addWidget(self.summary_label, 1)
+        header.addWidget(self.retry_button)
+        header.addWidget(self.cancel_button)
+        header.addWidget(self.close_button)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(12, 10, 12, 10)
+        layout.addLayout(header)
+        layout.addWidget(self.progress)
+        layout.addWidget(self.failures_list)
+
+        self.queue.changed.connect(self._update)
+        self.hide()
+
+    def _update(self) -> None:
+        queue = self.queue
+        if not queue.total:
+            self.hide()
+            return
+        failed = len(queue.failures)
+        if self.failures_list.count() > failed:
+            self.failures_list.clear()
+        if self.failures_list.count() < failed:
+            shown = self.failures_list.count()
+            self.failures_list.addItems([f"{item.title}: {reason}" for item, reason in queue.failures[shown:]])
+            self.failures_list.scrollToBottom()
+        parts = [f"Отправлено {queue.sent} из {queue.total}"]
+        if queue.pending:
+            parts.append(f"в очереди {queue.pending}")
+        if failed:
+            parts.append(f"ошибок {failed}")
+        self.summary_label.setText(" · ".join(parts))
+        self.progress.setMaximum(queue.total)
+        self.progress.setValue(queue.sent + failed)
+        self.failures_list.setVisible(bool(failed))
+        self.retry_button.setVisible(bool(failed) and not queue.pending)
+        self.cancel_button.setVisible(bool(queue.pending))
+        self.close_button.setVisible(not queue.pending)
+        self.show()
@@ -0,0 +1,63 @@
+import threading
+from typing import List
+
+from ozon_ai.db import Database
+
+
+def _review(uuid: str) -> dict:
+    return {"uuid": uuid, "text": "ok", "rating": 5, "published_at": "2026-01-01T00:00:00Z", "product": {}}
+
+
+def test_transaction_waits_for_concurrent_writer(tmp_path):
+    # A unit of work that reads before it writes must not fail when another
+    # connection writes in between; the other writer has to wait instead.
+    path = str(tmp_path / "reviews.db")
+    db = Database(path)
+    db.ensure_schema()
+    db.upsert_review(_review("a"))
+    db.upsert_review(_review("b"))
+
+    read_done = threading.Event()
+    errors: List[BaseException] = []
+
+    def write_from_other_connection() -> None:
+        other = Database(path)
+        read_done.wait(5)
+        try:
+            other.update_review_status("b", "completed", "Спасибо!")
+        except BaseException as exc:
+            errors.append(exc)
+        finally:
+            other.close()
+
+    writer = threading.Thread(target=write_from_other_connection)
+    writer.start()
+    try:
+        with db.transaction():
+            assert db.get_review("a")["status"] == "new"
+            read_done.set()
+            # Give the other connection time to try its write before ours.
+            writer.join(0.3)
+            db.update_review_status("a", "completed", "Спасибо!")
+    finally:
+        writer.join(10)
+
+    assert not errors
+    assert db.get_review("a")["status"] == "completed"
+    assert db.get_review("b")["status"] == "completed"
+    db.close()
+
+
+def test_thread_connection_closed_when_thread_exits(tmp_path):
+    db = Database(str(tmp_path / "reviews.db"))
+    db.ensure_schema()
+    try:
+        workers = [threading.Thread(target=db.list_accounts) for _ in range(8)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert len(db._connections) == 1
+        db.list_accounts()
+    finally:
+        db.close()
@@ -0,0 +1,185 @@
+import json
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import pytest
+
+from ozon_ai import ai_batch as ai_batch_module
+from ozon_ai import pipeline as pipeline_module
+from ozon_ai.ai_batch import BatchGenerator
+from ozon_ai.db import JOB_BATCHED, JOB_DONE, JOB_PENDING_GENERATION, JOB_PENDING_SEND, JOB_SENDING, Database
+from ozon_ai.ozon_reviews import ReviewFetch
+from ozon_ai.pipeline import GenerationTask, PipelineSettings, ReviewPipeline
+
+
+def _review(uuid: str) -> Dict[str, Any]:
+    return {
+        "uuid": uuid,
+        "text": "Качество хорошее, доставка быстрая",
+        "rating": 5,
+        "published_at": "2026-01-01T00:00:00Z",
+        "product": {"title": "Кружка"},
+    }
+
+
+class _BatchApi:
+    # Stands in for the OpenAI files/batches endpoints and records what was uploaded.
+    def __init__(self) -> None:
+        self.uploads: List[bytes] = []
+        self.status = "in_progress"
+
+    def request(self, method: str, path: str, api_key: str, **kwargs: Any) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        if path == "files":
+            self.uploads.append(kwargs["files"]["file"][1])
+            return {"id": f"file-{len(self.uploads)}"}, {}
+        if path == "batches":
+            return {"id": f"batch-{len(self.uploads)}", "status": "validating"}, {}
+        if method == "GET" and path.startswith("batches/"):
+            return {"id": path.split("/", 1)[1], "status": self.status, "output_file_id": "output-1"}, {}
+        raise AssertionError(f"unexpected request {method} {path}")
+
+    def download(self, path: str, api_key: str, **kwargs: Any) -> str:
+        # Answers every request of the last upload.
+        lines = []
+        for line in self.uploads[-1].decode("utf-8").splitlines():
+            body = {"output": [{"type": "message", "content": [{"type": "output_text", "text": "Спасибо за отзыв!"}]}]}
+            result = {"status_code": 200, "body": body}
+            lines.append(json.dumps({"custom_id": json.loads(line)["custom_id"], "response": result}))
+        return "\n".join(lines)
+
+
+class _LiveGeneration:
+    def __init__(self, block: bool = False) -> None:
+        self.calls = 0
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        if not block:
+            self.release.set()
+
+    def __call__(self, review: Dict[str, Any], **kwargs: Any) -> str:
+        self.calls += 1
+        self.entered.set()
+        self.release.wait(10)
+        return "Спасибо, что выбрали нас!"
+
+
+@pytest.fixture
+def db_path(tmp_path: Path) -> Path:
+    path = tmp_path / "reviews.db"
+    db = Database(str(path))
+    db.ensure_schema()
+    db.set_setting("openai_api_key", "test-key")
+    db.upsert_reviews([_review("r1")], account_id=1)
+    db.add_generation_jobs([_review("r1")], 1)
+    db.close()
+    return path
+
+
+def _queue_live(pipeline: ReviewPipeline, review: Dict[str, Any]) -> None:
+    # What _on_fetched and _resume_jobs do once a job is picked up.
+    assert pipeline._claim_job(review["uuid"])
+    pipeline._begin()
+    pipeline._generate_queue.put(GenerationTask(account_id=1, session_file=Path("session.json"), review=review))
+
+
+def _job_state(db_path: Path, uuid: str) -> str:
+    db = Database(str(db_path))
+    try:
+        return db.get_job(uuid)["state"]
+    finally:
+        db.close()
+
+
+def test_batched_job_is_not_generated_live(db_path, monkeypatch):
+    live = _LiveGeneration()
+    monkeypatch.setattr(pipeline_module, "generate_ai_response", live)
+    api = _BatchApi()
+    pipeline = ReviewPipeline(db_path)
+    pipeline.start()
+    try:
+        assert BatchGenerator(db_path, client=api).submit() == "batch-1"
+        _queue_live(pipeline, _review("r1"))
+        assert pipeline.wait_idle(10)
+    finally:
+        pipeline.stop()
+
+    assert b'"custom_id": "r1"' in api.uploads[0]
+    assert live.calls == 0
+    assert _job_state(db_path, "r1") == JOB_BATCHED
+
+
+def test_job_generating_live_is_not_batched(db_path, monkeypatch):
+    live = _LiveGeneration(block=True)
+    monkeypatch.setattr(pipeline_module, "generate_ai_response", live)
+    api = _BatchApi()
+    pipeline = ReviewPipeline(db_path)
+    pipeline.start()
+    try:
+        _queue_live(pipeline, _review("r1"))
+        assert live.entered.wait(10)
+        assert BatchGenerator(db_path, client=api).submit() is None
+        live.release.set()
+        assert pipeline.wait_idle(10)
+    finally:
+        pipeline.stop()
+
+    assert api.uploads == []
+    assert live.calls == 1
+    assert _job_state(db_path, "r1") == JOB_DONE
+
+
+def test_backlog_above_threshold_defers_live_generation(db_path):
+    db = Database(str(db_path))
+    try:
+        db.add_generation_jobs([_review("r2"), _review("r3")], 1)
+        assert db.count_jobs(JOB_PENDING_GENERATION) == 3
+        pipeline = ReviewPipeline(db_path)
+        db.set_setting("batch_threshold", "5")
+        assert not pipeline._generation_deferred(db, PipelineSettings.from_db(db))
+        db.set_setting("batch_threshold", "2")
+        assert pipeline._generation_deferred(db, PipelineSettings.from_db(db))
+    finally:
+        db.close()
+
+
+def test_open_batch_leaves_fresh_reviews_live(db_path, monkeypatch):
+    live = _LiveGeneration()
+    monkeypatch.setattr(pipeline_module, "generate_ai_response", live)
+    api = _BatchApi()
+    monkeypatch.setattr(ai_batch_module, "get_openai_client", lambda *args, **kwargs: api)
+    assert BatchGenerator(db_path).submit() == "batch-1"
+    pipeline = ReviewPipeline(db_path)
+    pipeline.start()
+    try:
+        fetched: Future = Future()
+        fetched.set_result(ReviewFetch(reviews=[_review("r2")], complete=True))
+        pipeline._begin()
+        pipeline._on_fetched(1, Path("session.json"), None, fetched)
+        assert pipeline.wait_idle(10)
+        assert live.calls == 1
+
+        # The tick refreshes open batches and ingests the ones OpenAI has finished.
+        api.status = "completed"
+        pipeline._begin()
+        pipeline._run_batches(submit=False)
+        assert pipeline.open_batches == 0
+    finally:
+        pipeline.stop()
+
+    assert live.calls == 1
+    assert _job_state(db_path, "r1") == JOB_DONE
+    assert _job_state(db_path, "r2") == JOB_DONE
+
+
+def test_manual_send_takes_over_pending_send_job(db_path):
+    db = Database(str(db_path))
+    try:
+        db.update_job("r1", state=JOB_PENDING_SEND, ai_response="Спасибо!")
+        assert db.claim_job_for_manual_send("r1") == (True, JOB_PENDING_SEND)
+        # The pipeline's own send of the same job is skipped, and a second manual send is refused.
+        assert not ReviewPipeline(db_path)._claim_send(db, "r1")
+        assert db.claim_job_for_manual_send("r1") == (False, JOB_SENDING)
+    finally:
+        db.close()
@@ -0,0 +1,29 @@
+import threading
+import time
+
+from ozon_ai.send_dispatcher import SendDispatcher
+
+
+def test_cancelled_reply_does_not_rest_the_account():
+    dispatcher = SendDispatcher(workers=1)
+    release = threading.Event()
+    first = dispatcher.submit("company", lambda: release.wait(5), interval=0.1)
+    cancelled = dispatcher.submit("company", lambda: True, interval=30)
+    last = dispatcher.submit("company", time.monotonic, interval=0.1)
+    assert cancelled.cancel()
+
+    started = time.monotonic()
+    release.set()
+    assert first.result(5)
+    assert last.result(5) - started < 5
+
+
+def test_empty_account_queue_is_dropped_after_its_rest():
+    dispatcher = SendDispatcher(workers=1)
+    assert dispatcher.submit("company", lambda: True, interval=0.05).result(5)
+    time.sleep(0.1)
+    assert dispatcher.submit("other", lambda: True).result(5)
+    time.sleep(0.05)
+    with dispatcher._condition:
+        dispatcher._next_ready()
+        assert list(dispatcher._queues) == []
@@ -0,0 +1,39 @@
+import json
+
+from ozon_ai.session_cache import _auth_marker_path, _clear_session_needs_relogin, get_session_info
+
+
+def _write_session(path):
+    state = {
+        "cookies": [
+            {"name": "sc_company_id", "value": "42"},
+            {"name": "__Secure-access-token", "value": "token", "expires": 4_000_000_000},
+        ]
+    }
+    path.write_text(json.dumps(state), encoding="utf-8")
+
+
+def test_relogin_marker_changes_are_seen_without_session_change(tmp_path):
+    session = tmp_path / "session.json"
+    _write_session(session)
+    assert get_session_info(session).is_active
+
+    # Written by another process; the session file itself is untouched.
+    _auth_marker_path(session).write_text("status=401", encoding="utf-8")
+    assert get_session_info(session).needs_relogin
+
+    _auth_marker_path(session).unlink()
+    assert get_session_info(session).is_active
+
+
+def test_clear_removes_marker_the_cache_has_not_seen(tmp_path):
+    session = tmp_path / "session.json"
+    _write_session(session)
+    assert get_session_info(session).is_active
+    marker = _auth_marker_path(session)
+    marker.write_text("status=401", encoding="utf-8")
+
+    _clear_session_needs_relogin(session)
+
+    assert not marker.exists()
+    assert get_session_info(session).is_active